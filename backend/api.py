@@ -11,17 +11,27 @@ import json
 import uuid
 import subprocess
 import shutil
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, List, Optional
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
 
 # Import the existing pipeline functions
 from mvp import *  # Import all functions from existing mvp.py
+from checkpoint_store import get_checkpoint_store
+from config import CHECKPOINT_RESUME_ON_STARTUP, PROGRESS_UPDATE_INTERVAL_S
+from config import JOB_WORKERS, JOB_VISIBILITY_TIMEOUT_S, JOB_QUEUE_POLL_S, JOB_SHUTDOWN_TIMEOUT_S
+from config import COALESCE_WINDOW_S, API_RUN_WORKERS
+from job_queue import get_job_queue
+from pipeline_engine import PipelineJob
 
 def ensure_chrome_installed():
     """Ensure Chrome and ChromeDriver are installed"""
@@ -80,24 +90,52 @@ class SearchRequest(BaseModel):
     recipient_email: Optional[str] = None
     user_prompt: Optional[str] = None
     system_prompt: Optional[str] = None
+    qualified_target: Optional[int] = None  # Quota mode: stop once this many candidates qualified
+    max_downloads: Optional[int] = None  # Hard cap on CV downloads in quota mode
+    hard_criteria: Optional[Dict] = None  # Deterministic rules checked before LLM evaluation
+    shortlist_size: Optional[int] = None  # Planning: size target_candidates to reach this many qualified
+    shortlist_confidence: Optional[float] = 0.8  # Planning: probability of reaching shortlist_size
+    priority: Optional[int] = 0  # Queue priority, higher runs first
+    max_wall_time_s: Optional[int] = None  # Budgets - the job stops with partial results once one is used up
+    max_llm_tokens: Optional[int] = None
+    max_page_loads: Optional[int] = None  # CV pages loaded in the browser
+
+class ReplayRequest(BaseModel):
+    user_prompt: str
+    system_prompt: Optional[str] = None
+    hard_criteria: Optional[Dict] = None
+    limit: Optional[int] = None  # Replay only the first N stored CVs
 
 class SearchResponse(BaseModel):
     job_id: str
     status: str
     message: str
+    plan: Optional[Dict] = None
 
 class JobStatus(BaseModel):
     job_id: str
     status: str
     progress: Optional[str] = None
+    stage_progress: Optional[Dict] = None  # Per-stage done/total/failed, throughput and ETA
+    queue_position: Optional[int] = None  # Jobs ahead of this one while it is queued
     candidates_found: Optional[int] = 0
     results: Optional[Dict] = None
+    llm_usage: Optional[Dict] = None
+    plan: Optional[Dict] = None
     error: Optional[str] = None
+    coalesced_with: Optional[str] = None  # Job whose results this identical search receives
     created_at: datetime
     completed_at: Optional[datetime] = None
 
 # --- Global Job Storage (In-Memory for MVP) ---
 jobs: Dict[str, JobStatus] = {}
+pipeline_jobs: Dict[str, PipelineJob] = {}  # Running pipelines by job id (live progress)
+search_publishers: Dict[str, object] = {}  # Candidate publishers of running Supabase searches by job id
+
+# Queue workers - each runs one pipeline at a time on the dedicated pipeline pool
+pipeline_executor = ThreadPoolExecutor(max_workers=max(1, JOB_WORKERS), thread_name_prefix="pipeline")
+worker_tasks: List[asyncio.Task] = []
+workers_stopping = threading.Event()  # Set on shutdown - no new jobs are claimed
 
 # --- FastAPI App Setup ---
 
@@ -105,9 +143,14 @@ jobs: Dict[str, JobStatus] = {}
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 MatchTrex API starting up...")
+    if API_RUN_WORKERS:
+        resume_from_checkpoints()
+        start_queue_workers()
+    else:
+        print("👷 API_RUN_WORKERS is off - jobs are run by worker.py processes")
     yield
-    # Shutdown
     print("⭐ MatchTrex API shutting down...")
+    await stop_queue_workers()
 
 app = FastAPI(
     title="MatchTrex CV Scraping API",
@@ -136,8 +179,12 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "POST /api/jobs": "Create new search job",
+            "POST /api/jobs/estimate": "Estimate duration, LLM cost and yield of a search",
+            "POST /api/jobs/{job_id}/replay": "Re-evaluate a job's stored CVs with new prompts",
+            "POST /api/jobs/resume-from-supabase": "Resume an interrupted search from its checkpoint",
             "GET /api/jobs/{job_id}": "Get job status",
-            "GET /api/jobs": "List all jobs",
+            "DELETE /api/jobs/{job_id}": "Cancel a queued or running job (keeps partial results)",
+            "GET /api/jobs": "List all jobs and queue counts",
             "GET /health": "Health check"
         }
     }
@@ -324,81 +371,498 @@ async def send_test_email():
             detail=f"Failed to send test email: {str(e)}"
         )
 
+def plan_search(search: Dict) -> Dict:
+    """Candidate pull needed to reach the requested shortlist, from historical accept rates"""
+    from supabase_client import load_completed_search_results
+    from yield_estimator import plan_candidate_pull
+
+    return plan_candidate_pull(
+        int(search['shortlist_size']),
+        float(search.get('shortlist_confidence') or 0.8),
+        search.get('search_keywords') or "",
+        search.get('location') or "",
+        search.get('user_prompt') or "",
+        load_completed_search_results()
+    )
+
+def estimate_search(request: SearchRequest) -> Dict:
+    """
+    Pre-flight estimate: Indeed match count probe + historical per-CV timings, tokens and accept rates.
+    Flags searches over the configured wall time or cost limits as oversized.
+    """
+    from supabase_client import load_completed_search_results
+    from yield_estimator import collect_observations, estimate_accept_rate, plan_candidate_pull
+    from job_estimator import estimate_job
+    from config import ESTIMATE_MAX_WALL_TIME_S, ESTIMATE_MAX_COST_EUR
+
+    match_count = probe_match_count(
+        request.search_keywords,
+        request.location or "",
+        request.max_radius or 25,
+        request.resume_last_updated_days or 30
+    )
+    completed_results = load_completed_search_results()
+
+    # Downloads the job would attempt: quota cap, yield plan or the explicit target
+    target = request.target_candidates or 100
+    plan = None
+    if request.qualified_target:
+        target = get_quota_settings(request.model_dump())[1]
+    elif request.shortlist_size:
+        plan = plan_candidate_pull(
+            request.shortlist_size, request.shortlist_confidence or 0.8, request.search_keywords,
+            request.location or "", request.user_prompt or "", completed_results
+        )
+        if 'target_candidates' not in request.model_fields_set:
+            target = plan['profiles_to_pull']
+
+    rate = estimate_accept_rate(request.search_keywords, request.location or "", request.user_prompt or "",
+                                collect_observations(completed_results))
+    estimate = estimate_job(match_count, target, rate['accept_rate'])
+    estimate['accept_rate_level'] = rate['level']
+    estimate['plan'] = plan
+
+    warnings = []
+    if match_count is None:
+        warnings.append("Indeed match count probe failed; assuming enough profiles are available")
+    elif match_count < target:
+        warnings.append(f"Only {match_count} profiles match, fewer than the {target} planned downloads")
+    if estimate['expected_wall_time_s'] > ESTIMATE_MAX_WALL_TIME_S:
+        warnings.append(f"Expected wall time exceeds {ESTIMATE_MAX_WALL_TIME_S}s")
+    if estimate['expected_llm_cost_eur'] > ESTIMATE_MAX_COST_EUR:
+        warnings.append(f"Expected LLM cost exceeds {ESTIMATE_MAX_COST_EUR} EUR")
+    estimate['oversized'] = (estimate['expected_wall_time_s'] > ESTIMATE_MAX_WALL_TIME_S
+                             or estimate['expected_llm_cost_eur'] > ESTIMATE_MAX_COST_EUR)
+    estimate['warnings'] = warnings
+    return estimate
+
+@app.post("/api/jobs/estimate")
+async def estimate_search_job(request: SearchRequest):
+    """Estimate wall time, LLM tokens/cost and candidate yield of a search before starting it"""
+    try:
+        return await asyncio.get_event_loop().run_in_executor(None, estimate_search, request)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Estimate failed: {str(e)}")
+
 @app.post("/api/jobs", response_model=SearchResponse)
-async def create_search_job(request: SearchRequest, background_tasks: BackgroundTasks):
-    """Create a new CV search job"""
+async def create_search_job(request: SearchRequest):
+    """Create a new CV search job (queued for the pipeline workers)"""
 
     # Generate unique job ID
     job_id = str(uuid.uuid4())
 
+    # Size the pull from historical yield if a shortlist size was requested
+    plan = None
+    if request.shortlist_size:
+        plan = await asyncio.get_event_loop().run_in_executor(None, plan_search, request.model_dump())
+        print(f"📐 Yield plan for job {job_id}: {plan}")
+        if 'target_candidates' not in request.model_fields_set:
+            request.target_candidates = plan['profiles_to_pull']
+
     # Create job entry
     job_status = JobStatus(
         job_id=job_id,
         status="pending",
-        progress="Initializing search...",
+        progress="Queued...",
+        plan=plan,
         created_at=datetime.now()
     )
 
     jobs[job_id] = job_status
 
-    # Start background processing
-    background_tasks.add_task(process_search_job, job_id, request)
+    # Queue for the pipeline workers
+    # ref is the id its checkpoint and stored CVs are kept under
+    get_job_queue().enqueue(job_id, "search", request.model_dump(), request.priority or 0, ref=job_id)
 
     return SearchResponse(
         job_id=job_id,
         status="pending",
-        message="Search job created successfully"
+        message="Search job queued successfully",
+        plan=plan
     )
 
 @app.get("/api/jobs/{job_id}", response_model=JobStatus)
 async def get_job_status(job_id: str):
     """Get status of a specific job"""
-
-    if job_id not in jobs:
+    status = current_job_status(job_id)
+    if not status:
         raise HTTPException(status_code=404, detail="Job not found")
+    return status
 
+def current_job_status(job_id: str) -> Optional[JobStatus]:
+    """
+    Status of a job run by this process, or else as reported to the queue by the worker running it
+    (also jobs queued before a restart); None if the job is unknown
+    """
+    if job_id not in jobs or jobs[job_id].status == "pending":
+        queued = get_job_queue().get(job_id)
+        if not queued:
+            return jobs.get(job_id)
+        return queued_job_status(queued)
+
+    # A coalesced job shows the progress of the run it follows
+    running_id = jobs[job_id].coalesced_with if jobs[job_id].status == "coalesced" else job_id
+    if running_id in pipeline_jobs:
+        jobs[job_id].stage_progress = pipeline_jobs[running_id].progress.snapshot()
+    jobs[job_id].queue_position = get_job_queue().position(job_id)
     return jobs[job_id]
 
+def queued_job_status(queued: Dict) -> JobStatus:
+    """A job's status from its queue entry and the last report of its worker"""
+    job_id = queued['job_id']
+    status = JobStatus(**dict(queued['report'] or {}, job_id=job_id, created_at=queued['created_at'],
+                              status=(queued['report'] or {}).get('status') or queued['status']))
+    if queued['status'] == "queued":
+        status.status = "pending"
+        status.progress = "Queued..."
+        status.queue_position = get_job_queue().position(job_id)
+    elif queued['status'] in ("failed", "cancelled") and status.status not in ("failed", "cancelled"):
+        # Ended without a final report (e.g. its worker was lost too often)
+        status.status = queued['status']
+        status.error = queued['error']
+    if job_id in jobs and jobs[job_id].plan:
+        status.plan = jobs[job_id].plan
+    return status
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job. A running pipeline stops all stages, closes its browsers and
+    aborts in-flight LLM calls; the candidates qualified so far are kept as its results.
+    """
+    queue = get_job_queue()
+    queued = queue.get(job_id)
+    if job_id not in jobs and not queued:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if queue.cancel(job_id):
+        # Never started - nothing to stop
+        if queued['leader_id'] in search_publishers:
+            search_publishers[queued['leader_id']].detach(queued['ref'])
+        if job_id in jobs:
+            jobs[job_id].status = "cancelled"
+            jobs[job_id].progress = "Cancelled before it started"
+            jobs[job_id].completed_at = datetime.now()
+        if queued['kind'] == "supabase_search":
+            from supabase_client import update_search_status
+            update_search_status(queued['ref'], 'cancelled', 'Cancelled before it started')
+        return {"job_id": job_id, "status": "cancelled", "message": "Queued job cancelled"}
+
+    if job_id in pipeline_jobs:
+        print(f"🛑 Cancelling job {job_id}")
+        jobs[job_id].progress = "Cancelling..."
+        await asyncio.get_event_loop().run_in_executor(None, pipeline_jobs[job_id].cancel)
+        return {"job_id": job_id, "status": "cancelling",
+                "message": "Job is stopping; partial results are kept"}
+
+    if queue.request_cancel(job_id):
+        # Running in another process - its worker picks the request up
+        print(f"🛑 Requested cancellation of job {job_id}")
+        return {"job_id": job_id, "status": "cancelling",
+                "message": "Job is stopping; partial results are kept"}
+
+    status = jobs[job_id].status if job_id in jobs else queued['status']
+    raise HTTPException(status_code=409, detail=f"Job cannot be cancelled (status: {status})")
+
+def stored_cvs_job_id(job_id: str) -> str:
+    """
+    Id the pipeline stored a job's CVs under: the Supabase search id for Supabase searches,
+    the API job id otherwise. A coalesced job uses the CVs of the job it followed.
+    """
+    queue = get_job_queue()
+    queued = queue.get(job_id)
+    if queued and queued.get('leader_id'):
+        queued = queue.get(queued['leader_id']) or queued
+    if not queued:
+        return job_id
+    return queued.get('ref') or queued['job_id']
+
+@app.post("/api/jobs/{job_id}/replay")
+async def replay_search_job(job_id: str, request: ReplayRequest):
+    """Re-evaluate a finished job's stored CVs with new prompts (no search or downloads)"""
+    from replay import replay_job
+    try:
+        return await asyncio.get_event_loop().run_in_executor(
+            None, replay_job, stored_cvs_job_id(job_id), request.system_prompt or "", request.user_prompt,
+            request.hard_criteria, None, request.limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Replay failed: {str(e)}")
+
 @app.get("/api/jobs")
 async def list_jobs():
     """List all jobs (for debugging/admin)"""
 
     return {
-        "jobs": list(jobs.values()),
-        "total": len(jobs)
+        "jobs": [current_job_status(job_id) for job_id in list(jobs)],
+        "total": len(jobs),
+        "queue": get_job_queue().counts()
     }
 
 @app.post("/api/jobs/start-from-supabase")
-async def start_job_from_supabase(request: dict, background_tasks: BackgroundTasks):
+async def start_job_from_supabase(request: dict):
     """Start processing a search job from Supabase ID"""
     search_id = request.get('search_id')
     if not search_id:
         raise HTTPException(status_code=400, detail="search_id required")
 
+    # Starting the same search twice (e.g. a double submit) returns the job already working on it
+    active = get_job_queue().active_for(search_id)
+    if active:
+        job_id = active[0]['job_id']
+        print(f"🔗 Search {search_id} already has backend job {job_id}")
+        return {"job_id": job_id, "status": "started", "message": f"Search {search_id} is already being processed"}
+
     # Generate job ID for tracking
     job_id = str(uuid.uuid4())
 
     print(f"🎯 Starting backend job {job_id} for Supabase search {search_id}")
 
-    # For now, we'll create a placeholder job entry
     job_status = JobStatus(
         job_id=job_id,
         status="pending",
-        progress=f"Starting processing for search {search_id}...",
+        progress=f"Queued processing for search {search_id}...",
         created_at=datetime.now()
     )
 
     jobs[job_id] = job_status
 
-    # Start background processing (Phase 2 will implement the actual processing)
-    background_tasks.add_task(process_search_from_supabase_placeholder, job_id, search_id)
+    # Queue for the pipeline workers (a shortlist size sizes the pull when the job runs)
+    payload = {'search_id': search_id, 'resume': False}
+    if request.get('shortlist_size'):
+        payload['shortlist_size'] = int(request['shortlist_size'])
+        payload['shortlist_confidence'] = float(request.get('shortlist_confidence') or 0.8)
+    get_job_queue().enqueue(job_id, "supabase_search", payload, int(request.get('priority') or 0), ref=search_id)
+
+    return {"job_id": job_id, "status": "started", "message": f"Backend processing queued for search {search_id}"}
+
+@app.post("/api/jobs/resume-from-supabase")
+async def resume_job_from_supabase(request: dict):
+    """Resume an interrupted or failed Supabase search from its last checkpoint"""
+    search_id = request.get('search_id')
+    if not search_id:
+        raise HTTPException(status_code=400, detail="search_id required")
+
+    # Checkpoints are kept by the workers; a thin API cannot check them
+    store = get_checkpoint_store()
+    if API_RUN_WORKERS and (not store or not store.get_job(search_id)):
+        raise HTTPException(status_code=404, detail=f"No checkpoint for search {search_id}")
+
+    if get_job_queue().active_for(search_id):
+        raise HTTPException(status_code=409, detail=f"Search {search_id} is already queued or running")
+
+    job_id = str(uuid.uuid4())
+    print(f"♻️ Resuming search {search_id} from checkpoint as backend job {job_id}")
+    jobs[job_id] = JobStatus(
+        job_id=job_id,
+        status="pending",
+        progress=f"Resuming search {search_id} from checkpoint...",
+        created_at=datetime.now()
+    )
+    get_job_queue().enqueue(job_id, "supabase_search", {'search_id': search_id, 'resume': True},
+                            int(request.get('priority') or 0), ref=search_id)
+
+    return {"job_id": job_id, "status": "started", "message": f"Resuming search {search_id} from checkpoint"}
+
+def resume_from_checkpoints() -> None:
+    """Queue the searches interrupted by a crash of this node (if enabled)"""
+    if CHECKPOINT_RESUME_ON_STARTUP:
+        resumed = resume_interrupted_jobs()
+        if resumed:
+            print(f"♻️ Resuming {len(resumed)} interrupted searches from checkpoints: {resumed}")
+
+def resume_interrupted_jobs() -> List[str]:
+    """
+    Queue a resume for searches whose process died mid-run; returns their checkpoint ids.
+    Searches still held by the job queue are skipped - their claim lapses and they are resumed from there.
+    A POST /api/jobs search is queued again as a 'search' job with its original request.
+    """
+    store = get_checkpoint_store()
+    if not store:
+        return []
+
+    resumed = []
+    queue = get_job_queue()
+    for saved in store.interrupted_jobs():
+        checkpoint_id = saved['job_id']
+        if queue.active_for(checkpoint_id):
+            continue
+        previous = queue.latest_for(checkpoint_id)
+        if previous and previous['kind'] == "search":
+            kind, payload = "search", dict(previous['payload'], resume=True)
+        else:
+            kind, payload = "supabase_search", {'search_id': checkpoint_id, 'resume': True}
+        job_id = str(uuid.uuid4())
+        jobs[job_id] = JobStatus(
+            job_id=job_id,
+            status="pending",
+            progress=f"Resuming search {checkpoint_id} from checkpoint...",
+            created_at=datetime.now()
+        )
+        queue.enqueue(job_id, kind, payload, ref=checkpoint_id)
+        resumed.append(checkpoint_id)
+    return resumed
 
-    return {"job_id": job_id, "status": "started", "message": f"Backend processing started for search {search_id}"}
+# --- Queue Workers ---
+
+def start_queue_workers() -> None:
+    """Start JOB_WORKERS workers that claim jobs from the durable queue"""
+    workers_stopping.clear()
+    host = socket.gethostname()
+    for index in range(max(1, JOB_WORKERS)):
+        worker_tasks.append(asyncio.create_task(queue_worker(f"{host}-{os.getpid()}-{index}")))
+    print(f"👷 Started {len(worker_tasks)} queue workers")
+
+async def stop_queue_workers() -> None:
+    """
+    Shut the queue workers down without losing or duplicating work: no new jobs are claimed, running
+    pipelines are suspended (their claims stay alive until they have stopped) and their jobs are handed
+    back to the queue. The next worker to claim one resumes it from its checkpoint if the checkpoint
+    store is shared with it (same host, or CHECKPOINT_DB_URL); otherwise the job starts over.
+    """
+    workers_stopping.set()
+    loop = asyncio.get_event_loop()
+    for job_id, pipeline_job in list(pipeline_jobs.items()):
+        print(f"⏸️ Suspending job {job_id} for shutdown")
+        await loop.run_in_executor(None, pipeline_job.suspend)
+
+    pending = set()
+    if worker_tasks:
+        _, pending = await asyncio.wait(worker_tasks, timeout=JOB_SHUTDOWN_TIMEOUT_S)
+    if pending:
+        # Their claims lapse after the visibility timeout and the jobs are resumed from there
+        print(f"⚠️ {len(pending)} queue workers did not stop within {JOB_SHUTDOWN_TIMEOUT_S}s, cancelling them")
+        for task in pending:
+            task.cancel()
+    await asyncio.gather(*worker_tasks, return_exceptions=True)
+    worker_tasks.clear()
+    await loop.run_in_executor(None, lambda: pipeline_executor.shutdown(wait=not pending, cancel_futures=True))
+
+async def queue_worker(worker_id: str):
+    """Claim and run queued jobs one at a time until the workers are stopped"""
+    queue = get_job_queue()
+    loop = asyncio.get_event_loop()
+    while not workers_stopping.is_set():
+        try:
+            claimed = await loop.run_in_executor(None, queue.claim, worker_id, JOB_VISIBILITY_TIMEOUT_S)
+        except Exception as e:
+            print(f"❌ Queue worker {worker_id} could not claim a job: {e}")
+            claimed = None
+        if not claimed:
+            await asyncio.sleep(JOB_QUEUE_POLL_S)
+            continue
+        await run_queued_job(claimed, worker_id)
+
+async def keep_claim(job_id: str, worker_id: str):
+    """Extend a running job's visibility timeout until cancelled"""
+    queue = get_job_queue()
+    loop = asyncio.get_event_loop()
+    while True:
+        await asyncio.sleep(JOB_VISIBILITY_TIMEOUT_S / 3)
+        try:
+            if not await loop.run_in_executor(None, queue.heartbeat, job_id, worker_id, JOB_VISIBILITY_TIMEOUT_S):
+                print(f"⚠️ Worker {worker_id} lost its claim on job {job_id}")
+        except Exception as e:
+            print(f"⚠️ Heartbeat for job {job_id} failed: {e}")
+
+async def sync_job(job_id: str):
+    """
+    Until cancelled: report the job's status to the queue (for APIs in other processes) and
+    cancel its pipeline when another process requested it
+    """
+    queue = get_job_queue()
+    loop = asyncio.get_event_loop()
+    last_report = 0.0
+    while True:
+        await asyncio.sleep(JOB_QUEUE_POLL_S)
+        try:
+            pipeline_job = pipeline_jobs.get(job_id)
+            if pipeline_job and not pipeline_job.cancelled and \
+                    await loop.run_in_executor(None, queue.cancel_requested, job_id):
+                print(f"🛑 Cancelling job {job_id} on request")
+                jobs[job_id].progress = "Cancelling..."
+                await loop.run_in_executor(None, pipeline_job.cancel)
+            if time.time() - last_report >= PROGRESS_UPDATE_INTERVAL_S:
+                last_report = time.time()
+                await loop.run_in_executor(None, report_job, job_id)
+        except Exception as e:
+            print(f"⚠️ Could not sync job {job_id} with the queue: {e}")
+
+def report_job(job_id: str) -> None:
+    """Write a job's current status to the queue"""
+    status = jobs[job_id]
+    if job_id in pipeline_jobs:
+        status.stage_progress = pipeline_jobs[job_id].progress.snapshot()
+    get_job_queue().report(job_id, status.model_dump(mode="json", exclude={'queue_position'}))
+
+async def run_queued_job(claimed: Dict, worker_id: str):
+    """Run one claimed job and record its outcome in the queue"""
+    job_id, payload = claimed['job_id'], claimed['payload']
+    if workers_stopping.is_set():
+        # Claimed while shutting down
+        get_job_queue().release(job_id, worker_id)
+        return
+    print(f"👷 Worker {worker_id} picked up job {job_id} ({claimed['kind']}, attempt {claimed['attempts']})")
+    if job_id not in jobs:
+        # Queued or started before a restart
+        jobs[job_id] = JobStatus(job_id=job_id, status="pending", progress="Recovered from queue...",
+                                 created_at=datetime.fromisoformat(claimed['created_at']))
+
+    heartbeat = asyncio.create_task(keep_claim(job_id, worker_id))
+    sync = asyncio.create_task(sync_job(job_id))
+    try:
+        if claimed['kind'] == "supabase_search":
+            # A retried attempt continues from the checkpoint of the lost one
+            resume = bool(payload.get('resume')) or claimed['attempts'] > 1
+            shortlist = {key: payload[key] for key in ('shortlist_size', 'shortlist_confidence') if key in payload}
+            await process_search_from_supabase_placeholder(job_id, payload['search_id'], resume, shortlist)
+        elif claimed['kind'] == "search":
+            request = dict(payload)
+            resume = bool(request.pop('resume', False)) or claimed['attempts'] > 1
+            await process_search_job(job_id, SearchRequest(**request), resume, claimed.get('ref') or job_id)
+        else:
+            jobs[job_id].status = "failed"
+            jobs[job_id].error = f"Unknown job kind: {claimed['kind']}"
+    finally:
+        heartbeat.cancel()
+        sync.cancel()
+    report_job(job_id)
+
+    if jobs[job_id].status == "pending" and workers_stopping.is_set():
+        # Suspended for the shutdown - back to the queue for the next worker to resume
+        get_job_queue().release(job_id, worker_id)
+        return
+    if jobs[job_id].status in ("coalesced", "pending"):
+        # Waits for its leader, which finishes it, or was released back to the queue
+        return
+    status = jobs[job_id].status if jobs[job_id].status in ("failed", "cancelled") else "completed"
+    get_job_queue().finish(job_id, status, jobs[job_id].error)
 
 # --- Background Job Processing ---
 
-async def process_search_from_supabase_placeholder(job_id: str, search_id: str):
-    """Process search job from Supabase with real integration"""
+async def report_search_progress(search_id: str, pipeline_job: PipelineJob, done: asyncio.Event):
+    """Write the pipeline's compact progress to Supabase periodically, and once more when it ends"""
+    from supabase_client import update_search_status
+
+    loop = asyncio.get_event_loop()
+    while not done.is_set():
+        try:
+            await asyncio.wait_for(done.wait(), timeout=PROGRESS_UPDATE_INTERVAL_S)
+        except asyncio.TimeoutError:
+            await loop.run_in_executor(None, update_search_status, search_id, 'processing',
+                                       pipeline_job.progress.compact())
+    await loop.run_in_executor(None, update_search_status, search_id, 'processing', pipeline_job.progress.compact())
+
+async def process_search_from_supabase_placeholder(job_id: str, search_id: str, resume: bool = False,
+                                                   shortlist: Optional[Dict] = None):
+    """
+    Process search job from Supabase with real integration (resume=True continues from its checkpoint).
+    A shortlist size (from the start request or the search row) sizes target_candidates from historical yield.
+    """
+    # Registered up front so the job can be cancelled while the search is still loading
+    pipeline_job = pipeline_jobs[job_id] = PipelineJob()
     try:
         print(f"📝 Processing job {job_id} for search {search_id}")
 
@@ -407,7 +871,8 @@ async def process_search_from_supabase_placeholder(job_id: str, search_id: str):
             load_search_from_supabase,
             update_search_status,
             update_search_results,
-            mark_search_failed
+            mark_search_failed,
+            SearchCandidatePublisher
         )
 
         # 1. Load search from Supabase (with retry for race condition)
@@ -425,6 +890,23 @@ async def process_search_from_supabase_placeholder(job_id: str, search_id: str):
 
         print(f"✅ Loaded search data: {search_data.get('name', 'Unnamed')} - {search_data.get('search_keywords')}")
 
+        search_data = {**search_data, **(shortlist or {})}
+        if search_data.get('shortlist_size'):
+            plan = await asyncio.get_event_loop().run_in_executor(None, plan_search, search_data)
+            print(f"📐 Yield plan for search {search_id}: {plan}")
+            jobs[job_id].plan = plan
+            search_data['target_candidates'] = plan['profiles_to_pull']
+
+        # Identical searches run once: follow a queued, running or recently completed one instead
+        if not resume:
+            loop = asyncio.get_event_loop()
+            leader = await loop.run_in_executor(
+                None, get_job_queue().coalesce, job_id, search_fingerprint(search_data), COALESCE_WINDOW_S
+            )
+            if leader and jobs[job_id].status != "completed":
+                await follow_search(job_id, search_id, leader)
+                return
+
         # 2. Update job status (in memory)
         jobs[job_id].status = "running"
         jobs[job_id].progress = f"Processing search: {search_data.get('name', search_id)}"
@@ -439,24 +921,62 @@ async def process_search_from_supabase_placeholder(job_id: str, search_id: str):
         from mvp import main_pipeline_for_api
 
         print(f"🚀 Starting REAL pipeline for search: {search_data.get('name', search_id)}")
-        results = await asyncio.get_event_loop().run_in_executor(
-            None, main_pipeline_for_api, search_data
+        # Qualified candidates are appended to search_candidates while the pipeline runs
+        publisher = search_publishers[job_id] = SearchCandidatePublisher(search_id)
+        pipeline_done = asyncio.Event()
+        progress_task = asyncio.create_task(report_search_progress(search_id, pipeline_job, pipeline_done))
+        try:
+            results = await asyncio.get_event_loop().run_in_executor(
+                pipeline_executor, main_pipeline_for_api, search_data, pipeline_job, resume, publisher
+            )
+        finally:
+            pipeline_done.set()
+            await progress_task
+            jobs[job_id].stage_progress = pipeline_job.progress.snapshot()
+
+        if results.get('suspended'):
+            # The search row stays 'processing'; the worker that claims the job next resumes it
+            print(f"⏸️ Search {search_id} suspended for shutdown")
+            jobs[job_id].status = "pending"
+            jobs[job_id].progress = "Suspended for a worker restart, waiting to be resumed..."
+            update_search_status(search_id, 'processing', 'Worker restarting - resuming shortly...')
+            return
+
+        cancelled = results.get('cancelled', False)
+        print(f"✅ Pipeline {'cancelled' if cancelled else 'completed'}! Found {results.get('filtered_count', 0)} qualified candidates")
+
+        # Searches that coalesced with this one receive the same candidates
+        followers = [] if cancelled else await asyncio.get_event_loop().run_in_executor(
+            None, get_job_queue().followers, job_id
         )
-
-        print(f"✅ Pipeline completed! Found {results.get('filtered_count', 0)} qualified candidates")
-
-        # 6. Update results in Supabase
-        update_search_results(search_id, results)
-
-        # 7. Update job status (in memory)
-        jobs[job_id].status = "completed"
-        jobs[job_id].progress = "Search completed successfully"
+        for follower in followers:
+            await asyncio.get_event_loop().run_in_executor(None, publisher.attach, follower['ref'])
+
+        # 6. Update results in Supabase - the candidates themselves are only embedded
+        #    if they could not all be published to search_candidates
+        stored_results = results
+        if await asyncio.get_event_loop().run_in_executor(None, publisher.finish, results['candidates']):
+            stored_results = {key: value for key, value in results.items() if key != 'candidates'}
+            stored_results['candidates_published'] = True
+        update_search_results(search_id, stored_results, 'cancelled' if cancelled else 'completed')
+
+        # 7. Update job status (in memory) - a cancelled job keeps its partial results
+        jobs[job_id].status = "cancelled" if cancelled else "completed"
+        jobs[job_id].progress = "Search cancelled" if cancelled else "Search completed successfully"
+        if results.get('budget_exhausted') and not cancelled:
+            jobs[job_id].progress = f"Search stopped early ({results['budget_exhausted']} budget exhausted), partial results"
         jobs[job_id].results = results
+        jobs[job_id].llm_usage = results.get("llm_usage")
         jobs[job_id].candidates_found = len(results["candidates"])
         jobs[job_id].completed_at = datetime.now()
 
         print(f"✅ Search {search_id} completed successfully with {len(results['candidates'])} candidates")
 
+        for follower in followers:
+            await finish_follower(follower, job_id, results, stored_results)
+        if cancelled:
+            release_followers(job_id)
+
         # 8. TODO Phase 5: Send email notification
 
     except Exception as e:
@@ -467,40 +987,163 @@ async def process_search_from_supabase_placeholder(job_id: str, search_id: str):
         jobs[job_id].error = str(e)
         jobs[job_id].progress = f"Error: {str(e)}"
 
+        # A resume that cannot even start must not be picked up again on every startup
+        if resume and get_checkpoint_store():
+            get_checkpoint_store().finish_job(search_id, "failed")
+
         # Update status in Supabase
         mark_search_failed(search_id, str(e))
 
-async def process_search_job(job_id: str, request: SearchRequest):
-    """Process the CV search job in background"""
+        # Searches waiting for this one run on their own instead
+        release_followers(job_id)
+
+    finally:
+        pipeline_jobs.pop(job_id, None)
+        search_publishers.pop(job_id, None)
+
+# --- Coalesced Searches ---
+
+async def follow_search(job_id: str, search_id: str, leader: Dict):
+    """Let a coalesced job take its results from the leader job running the identical search"""
+    from supabase_client import update_search_status
 
+    leader_id = leader['job_id']
+    print(f"🔗 Search {search_id} is identical to job {leader_id} - reusing its results")
+    if leader['status'] == "completed":
+        results = jobs[leader_id].results if leader_id in jobs else None
+        await finish_follower(get_job_queue().get(job_id), leader_id, results, None, leader['ref'])
+        return
+
+    jobs[job_id].status = "coalesced"
+    jobs[job_id].coalesced_with = leader_id
+    jobs[job_id].progress = f"Attached to identical search (job {leader_id})"
+    update_search_status(search_id, 'processing', f"Attached to an identical search that is already running")
+    # Candidates the leader publishes from now on (and those published so far) go to this search too
+    if leader_id in search_publishers:
+        await asyncio.get_event_loop().run_in_executor(None, search_publishers[leader_id].attach, search_id)
+
+async def finish_follower(follower: Dict, leader_id: str, results: Optional[Dict],
+                          stored_results: Optional[Dict], leader_search_id: Optional[str] = None):
+    """
+    Complete a coalesced job with its leader's results. stored_results is what the leader stored in
+    Supabase; without it (leader finished earlier) the results are loaded from the leader's search.
+    """
+    job_id = follower['job_id']
+    try:
+        follower_results = await asyncio.get_event_loop().run_in_executor(
+            None, deliver_coalesced_results, follower['ref'], leader_id, results, stored_results, leader_search_id
+        )
+    except Exception as e:
+        print(f"❌ Could not hand the results of job {leader_id} to job {job_id}: {e}")
+        get_job_queue().release_followers(leader_id, job_id)
+        if job_id in jobs:
+            jobs[job_id].status = "pending"
+            jobs[job_id].progress = "Queued to run on its own..."
+        return
+
+    get_job_queue().finish(job_id, "completed")
+    if job_id not in jobs:
+        # Submitted to another process
+        jobs[job_id] = JobStatus(job_id=job_id, status="completed", created_at=follower['created_at'])
+    jobs[job_id].status = "completed"
+    jobs[job_id].coalesced_with = leader_id
+    jobs[job_id].progress = "Search completed successfully (results of an identical search)"
+    jobs[job_id].results = follower_results
+    jobs[job_id].candidates_found = len(follower_results.get('candidates') or [])
+    jobs[job_id].completed_at = datetime.now()
+    report_job(job_id)
+    print(f"✅ Search {follower['ref']} completed with the results of job {leader_id}")
+
+def deliver_coalesced_results(search_id: str, leader_id: str, results: Optional[Dict],
+                              stored_results: Optional[Dict], leader_search_id: Optional[str] = None) -> Dict:
+    """Store a leader's results on a coalesced search and email them to its own recipient"""
+    from supabase_client import (
+        load_search_from_supabase,
+        load_search_candidates,
+        append_search_candidates,
+        update_search_results
+    )
+
+    if results is None:
+        leader_search = load_search_from_supabase(leader_search_id) or {}
+        if not leader_search.get('results'):
+            raise Exception(f"No stored results for search {leader_search_id}")
+        results = dict(leader_search['results'])
+        if 'candidates' not in results:
+            results['candidates'] = load_search_candidates(leader_search_id)
+    if stored_results is None:
+        stored_results = results
+        if append_search_candidates(search_id, results['candidates']):
+            stored_results = {key: value for key, value in results.items() if key != 'candidates'}
+            stored_results['candidates_published'] = True
+
+    search_data = load_search_from_supabase(search_id) or {}
+    params = normalize_search_params(search_data)
+    recipient_email = params['recipient_email']
+    follower_results = dict(results, recipient_email=recipient_email, coalesced_with=leader_id)
+    update_search_results(search_id, dict(stored_results, recipient_email=recipient_email, coalesced_with=leader_id))
+
+    # The leader's recipient already got this email
+    if results['candidates'] and recipient_email and recipient_email != results.get('recipient_email'):
+        send_email_with_results([from_api_candidate(candidate) for candidate in results['candidates']],
+                                results.get('search_keywords'), results.get('location'), params['max_radius'],
+                                recipient_email, search_data.get('name') or results.get('search_keywords'))
+    return follower_results
+
+def release_followers(leader_id: str) -> None:
+    """Queue the followers of a leader that did not complete, to run on their own"""
+    followers = get_job_queue().followers(leader_id)
+    if not followers:
+        return
+    released = get_job_queue().release_followers(leader_id)
+    print(f"🔓 Released {released} searches that were waiting for job {leader_id}")
+    for follower in followers:
+        if follower['job_id'] in jobs:
+            jobs[follower['job_id']].status = "pending"
+            jobs[follower['job_id']].coalesced_with = None
+            jobs[follower['job_id']].progress = "Queued to run on its own..."
+
+async def process_search_job(job_id: str, request: SearchRequest, resume: bool = False,
+                             pipeline_id: Optional[str] = None):
+    """
+    Run a POST /api/jobs search through the pipeline engine (resume=True continues from its checkpoint).
+    pipeline_id keys metrics, checkpoints and stored CVs; a resumed search keeps its first job's id.
+    """
+    pipeline_job = pipeline_jobs[job_id] = PipelineJob()
     try:
         # Update job status
         jobs[job_id].status = "running"
         jobs[job_id].progress = "Starting CV search pipeline..."
 
-        # Convert request to dictionary for pipeline
-        search_params = {
-            "search_keywords": request.search_keywords,
-            "location": request.location or "",
-            "resume_last_updated_days": request.resume_last_updated_days or 30,
-            "target_candidates": request.target_candidates or 100,
-            "max_radius": request.max_radius or 25,
-            "recipient_email": request.recipient_email or "",
-            "user_prompt": request.user_prompt or "",
-            "system_prompt": request.system_prompt or ""
-        }
+        # Same fields as a Supabase search row
+        search_params = request.model_dump(exclude={'shortlist_size', 'shortlist_confidence', 'priority'})
+        search_params['id'] = pipeline_id or job_id
 
         # Update progress
         jobs[job_id].progress = "Searching Indeed for candidates..."
 
-        # Run the actual pipeline (in a thread to avoid blocking)
-        loop = asyncio.get_event_loop()
-        results = await loop.run_in_executor(None, run_pipeline, search_params)
-
-        # Update job with results
-        jobs[job_id].status = "completed"
-        jobs[job_id].progress = "Search completed successfully"
+        # Run the actual pipeline on the dedicated pipeline pool
+        try:
+            results = await asyncio.get_event_loop().run_in_executor(
+                pipeline_executor, main_pipeline_for_api, search_params, pipeline_job, resume
+            )
+        finally:
+            jobs[job_id].stage_progress = pipeline_job.progress.snapshot()
+
+        if results.get('suspended'):
+            # The worker that claims the job next resumes it
+            jobs[job_id].status = "pending"
+            jobs[job_id].progress = "Suspended for a worker restart, waiting to be resumed..."
+            return
+
+        # Update job with results - a cancelled job keeps its partial results
+        cancelled = results.get('cancelled', False)
+        jobs[job_id].status = "cancelled" if cancelled else "completed"
+        jobs[job_id].progress = "Search cancelled" if cancelled else "Search completed successfully"
+        if results.get('budget_exhausted') and not cancelled:
+            jobs[job_id].progress = f"Search stopped early ({results['budget_exhausted']} budget exhausted), partial results"
         jobs[job_id].results = results
+        jobs[job_id].llm_usage = results.get('llm_usage')
         jobs[job_id].candidates_found = len(results.get('candidates', []))
         jobs[job_id].completed_at = datetime.now()
 
@@ -511,34 +1154,8 @@ async def process_search_job(job_id: str, request: SearchRequest):
         jobs[job_id].progress = f"Error: {str(e)}"
         print(f"Job {job_id} failed: {e}")
 
-def run_pipeline(search_params: Dict) -> Dict:
-    """
-    Wrapper function to run the existing pipeline with new parameters
-    This adapts the existing mvp.py functions to work with API requests
-    """
-
-    try:
-        # TODO: Adapt the existing main() function from mvp.py
-        # For now, return mock results
-
-        # Simulate the existing pipeline steps:
-        # 1. Search Indeed API
-        # 2. Download CVs
-        # 3. Filter with AI
-        # 4. Send email results
-
-        # This would call the actual pipeline functions
-        results = {
-            "candidates": [],
-            "total_found": 0,
-            "search_id": str(uuid.uuid4()),
-            "timestamp": datetime.now().isoformat()
-        }
-
-        return results
-
-    except Exception as e:
-        raise Exception(f"Pipeline execution failed: {str(e)}")
+    finally:
+        pipeline_jobs.pop(job_id, None)
 
 # --- Development Server ---
 
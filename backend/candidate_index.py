@@ -0,0 +1,268 @@
+"""
+Persistent candidate index for MatchTrex
+Remembers the latest processed CV per account key (MinHash signature of its cleaned text and its
+extracted data) so reposted or re-keyed copies of the same person are recognised and reuse its work.
+Copies within one job also share the first copy's evaluation verdict.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from config import NEAR_DUPLICATE_ENABLED, NEAR_DUPLICATE_THRESHOLD, NEAR_DUPLICATE_REUSE_MAX_AGE_DAYS
+from config import CANDIDATE_INDEX_PATH
+from minhash import estimated_similarity, lsh_band_keys
+
+class CandidateIndex:
+    """
+    JSONL index with one record per account key and LSH buckets held in memory.
+    Updates are appended; the file is rewritten once superseded lines outnumber the live records.
+    Claims (in memory only) group the copies of a CV within a job: the group's first copy extracts
+    and evaluates, later copies wait for its extraction and verdict instead of repeating them.
+    """
+
+    def __init__(self, path: str, threshold: float = NEAR_DUPLICATE_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._records: Dict[str, Dict] = {}
+        self._buckets: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # Notified when a claim's state changes
+        self._claims: Dict[str, Dict] = {}
+        self._loaded = False
+        self._lines = 0
+
+    def _index(self, record: Dict) -> None:
+        """Put a record into the in-memory map and its LSH buckets, replacing the account key's old record"""
+        account_key = record['account_key']
+        previous = self._records.get(account_key)
+        if previous:
+            for key in lsh_band_keys(previous.get('signature') or []):
+                bucket = self._buckets.get(key)
+                if bucket:
+                    bucket.discard(account_key)
+                    if not bucket:
+                        del self._buckets[key]
+        self._records[account_key] = record
+        for key in lsh_band_keys(record.get('signature') or []):
+            self._buckets.setdefault(key, set()).add(account_key)
+
+    def _compact(self) -> None:
+        """Rewrite the index file with only the latest record per account key"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for record in self._records.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.path)
+        self._lines = len(self._records)
+
+    def _load(self):
+        """Read the index file once; later lines for the same account key win"""
+        if self._loaded:
+            return
+        self._loaded = True
+
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Skip a partially written line
+                    self._lines += 1
+                    if record.get('account_key'):
+                        self._index(record)
+            print(f"✅ Loaded {len(self._records)} candidates into the candidate index")
+        except Exception as e:
+            print(f"⚠️ Could not load candidate index {self.path}: {e}")
+            return
+
+        if self._lines > len(self._records):
+            try:
+                self._compact()
+            except Exception as e:
+                print(f"⚠️ Could not compact candidate index {self.path}: {e}")
+
+    def _find_duplicate(self, signature, exclude_key: Optional[str] = None) -> Optional[Tuple[Dict, float]]:
+        matches = set()
+        for key in lsh_band_keys(signature):
+            matches |= self._buckets.get(key, set())
+        matches.discard(exclude_key)
+
+        best = None
+        for account_key in matches:
+            record = self._records[account_key]
+            similarity = estimated_similarity(signature, record.get('signature') or [])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (record, similarity)
+        return best
+
+    def find_duplicate(self, signature, exclude_key: Optional[str] = None) -> Optional[Tuple[Dict, float]]:
+        """Most similar indexed candidate at or above the threshold, as (record, similarity)"""
+        with self._lock:
+            self._load()
+            return self._find_duplicate(signature, exclude_key)
+
+    @staticmethod
+    def is_copy_in_job(record: Dict, account_key: str, job_id: Optional[str]) -> bool:
+        """Whether a match is another CV of the same job (a copy that shares its work)"""
+        return bool(job_id) and record['account_key'] != account_key and record.get('job_id') == job_id
+
+    def claim(self, account_key: str, url: str, signature, job_id: Optional[str] = None) -> Optional[Tuple[Dict, float]]:
+        """
+        Look up a CV's near-duplicate and register its signature in one step, before it is extracted,
+        so parallel workers see each other's copies. A copy of a CV of the same job joins that CV's
+        group; any other CV starts its own group and is indexed right away (its extraction follows in add()).
+        Returns the most similar indexed candidate as (record, similarity), like find_duplicate.
+        """
+        with self._lock:
+            self._load()
+            duplicate = self._find_duplicate(signature)
+            if duplicate and self.is_copy_in_job(duplicate[0], account_key, job_id):
+                group = duplicate[0]['account_key']
+                self._claims.setdefault(group, {'job_id': job_id, 'group': group, 'state': 'extracted'})
+                self._claims[account_key] = {'job_id': job_id, 'group': group}
+                return duplicate
+
+            # Keeps the account key's previous extraction until add() replaces it
+            previous = self._records.get(account_key) or {}
+            self._index({
+                'account_key': account_key,
+                'url': url,
+                'signature': signature,
+                'cv_data': previous.get('cv_data'),
+                'job_id': job_id,
+                'indexed_at': previous.get('indexed_at') or datetime.now().isoformat()
+            })
+            self._claims[account_key] = {'job_id': job_id, 'group': account_key, 'state': 'extracting'}
+            return duplicate
+
+    def _group(self, account_key: str) -> Optional[Dict]:
+        claim = self._claims.get(account_key)
+        return self._claims.get(claim['group']) if claim else None
+
+    def wait_for_extraction(self, account_key: str, timeout: float) -> Optional[Dict]:
+        """cv_data of the account key's group once its first copy is extracted (None if that failed)"""
+        with self._changed:
+            group = self._group(account_key)
+            if not group:
+                return None
+            self._changed.wait_for(lambda: group['state'] != 'extracting', timeout)
+            return group.get('cv_data')
+
+    def finish_extraction(self, account_key: str, cv_data: Optional[Dict]) -> None:
+        """Record the outcome of a group's extraction and wake the copies waiting for it"""
+        with self._changed:
+            claim = self._claims.get(account_key)
+            if claim and claim['group'] == account_key and claim['state'] == 'extracting':
+                claim.update(state='extracted' if cv_data else 'failed', cv_data=cv_data)
+                self._changed.notify_all()
+
+    def begin_evaluation(self, account_key: str, timeout: float) -> Tuple[bool, Optional[Dict]]:
+        """
+        Verdict shared by the copies of a CV within a job. Returns (True, verdict) if a copy was already
+        evaluated (waiting for one being evaluated right now). Otherwise returns (False, None) and the
+        caller evaluates and passes its result to finish_evaluation.
+        """
+        with self._changed:
+            group = self._group(account_key)
+            if not group:
+                return False, None
+            self._changed.wait_for(lambda: group['state'] != 'evaluating', timeout)
+            if group['state'] == 'evaluated':
+                return True, group['verdict']
+            group['state'] = 'evaluating'
+            return False, None
+
+    def finish_evaluation(self, account_key: str, verdict: Optional[Dict], evaluated: bool = True) -> None:
+        """
+        Store a group's verdict (the qualified candidate info or None) for its other copies.
+        With evaluated=False (aborted) the next copy evaluates instead.
+        """
+        with self._changed:
+            group = self._group(account_key)
+            if not group or group['state'] != 'evaluating':
+                return
+            if evaluated:
+                group.update(state='evaluated', verdict=verdict)
+            else:
+                group['state'] = 'extracted'
+            self._changed.notify_all()
+
+    def release_job(self, job_id: str) -> None:
+        """Drop a finished job's claims (verdicts depend on the job's prompts)"""
+        with self._changed:
+            for account_key in [key for key, claim in self._claims.items() if claim['job_id'] == job_id]:
+                del self._claims[account_key]
+            self._changed.notify_all()
+
+    @staticmethod
+    def is_reusable(record: Dict, similarity: float, max_age_days: float = NEAR_DUPLICATE_REUSE_MAX_AGE_DAYS) -> bool:
+        """
+        Whether a match's extraction can stand in for a new one: the text is identical
+        or the record is recent (an older near-match may be a since-updated resume)
+        """
+        if not record.get('cv_data'):
+            return False
+        if similarity >= 1.0:
+            return True
+        try:
+            indexed_at = datetime.fromisoformat(record.get('indexed_at') or '')
+        except ValueError:
+            return False
+        return datetime.now() - indexed_at <= timedelta(days=max_age_days)
+
+    def get(self, account_key: str) -> Optional[Dict]:
+        """Indexed record for an account key, or None"""
+        with self._lock:
+            self._load()
+            return self._records.get(account_key)
+
+    def add(self, account_key: str, url: str, signature, cv_data: Optional[Dict], job_id: Optional[str] = None) -> None:
+        """Store (or replace) a candidate's record in memory and append it to the index file"""
+        record = {
+            'account_key': account_key,
+            'url': url,
+            'signature': signature,
+            'cv_data': cv_data,
+            'job_id': job_id,
+            'indexed_at': datetime.now().isoformat()
+        }
+
+        with self._lock:
+            self._load()
+            self._index(record)
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._lines += 1
+                # Superseded lines are only dropped once they outnumber the live records
+                if self._lines > 2 * len(self._records):
+                    self._compact()
+            except Exception as e:
+                print(f"⚠️ Could not persist candidate index entry: {e}")
+
+# Global index instance (created lazily)
+_candidate_index: Optional[CandidateIndex] = None
+_index_init_lock = threading.Lock()
+
+def get_candidate_index() -> Optional[CandidateIndex]:
+    """Get the shared candidate index, or None when near-duplicate detection is disabled"""
+    global _candidate_index
+
+    if not NEAR_DUPLICATE_ENABLED:
+        return None
+
+    with _index_init_lock:
+        if _candidate_index is None:
+            _candidate_index = CandidateIndex(CANDIDATE_INDEX_PATH)
+    return _candidate_index
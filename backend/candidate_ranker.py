@@ -0,0 +1,90 @@
+"""
+Local lexical pre-ranker for MatchTrex candidates
+Scores profile-card or CV text against the search criteria with BM25 (NumPy-vectorized)
+so downloads and LLM evaluations are spent on the most promising candidates first
+"""
+
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# BM25 parameters (standard defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Words that carry no signal in prompts or profiles (German + English)
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "if", "in", "is", "it",
+    "of", "on", "only", "or", "the", "their", "they", "this", "to", "with", "without", "who", "should",
+    "der", "die", "das", "den", "dem", "des", "ein", "eine", "einer", "eines", "und", "oder", "im",
+    "mit", "von", "zu", "zum", "zur", "für", "auf", "bei", "als", "ist", "sind", "nicht", "sowie",
+    "https", "http", "www", "com", "resume", "resumes", "indeed", "json", "pass", "fail"
+}
+
+_TOKEN_PATTERN = re.compile(r"[^\W\d_]{2,}", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without digits and stopwords"""
+    return [token for token in _TOKEN_PATTERN.findall((text or "").lower()) if token not in STOPWORDS]
+
+def bm25_scores(documents: List[str], query: str) -> np.ndarray:
+    """
+    BM25 score of every document against the query.
+    Builds a (documents x vocabulary) term-frequency matrix and scores all documents at once.
+    """
+    if not documents:
+        return np.zeros(0)
+
+    doc_tokens = [tokenize(doc) for doc in documents]
+    query_tokens = tokenize(query)
+
+    # Only query terms can contribute, so the vocabulary is restricted to them
+    vocabulary = {term: i for i, term in enumerate(dict.fromkeys(query_tokens))}
+    if not vocabulary:
+        return np.zeros(len(documents))
+
+    term_freq = np.zeros((len(documents), len(vocabulary)), dtype=np.float64)
+    for row, tokens in enumerate(doc_tokens):
+        for token in tokens:
+            column = vocabulary.get(token)
+            if column is not None:
+                term_freq[row, column] += 1
+
+    query_weights = np.zeros(len(vocabulary), dtype=np.float64)
+    for token in query_tokens:
+        query_weights[vocabulary[token]] += 1
+
+    doc_lengths = np.array([len(tokens) for tokens in doc_tokens], dtype=np.float64)
+    avg_length = doc_lengths.mean() if doc_lengths.mean() > 0 else 1.0
+
+    doc_freq = (term_freq > 0).sum(axis=0)
+    n_docs = len(documents)
+    idf = np.log(1 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / avg_length)
+    saturated = term_freq * (BM25_K1 + 1) / (term_freq + length_norm[:, None])
+
+    return saturated @ (idf * query_weights)
+
+def rank_candidates(candidates: List[Dict], query: str, text_key: str = 'card_text') -> List[Dict]:
+    """
+    Return candidates sorted by BM25 score (best first), each with a 'rank_score' added.
+    Ties keep their original order.
+    """
+    if not candidates:
+        return []
+
+    scores = bm25_scores([candidate.get(text_key, '') for candidate in candidates], query)
+    order = np.argsort(-scores, kind='stable')
+
+    ranked = []
+    for index in order:
+        candidate = dict(candidates[index])
+        candidate['rank_score'] = round(float(scores[index]), 4)
+        ranked.append(candidate)
+    return ranked
+
+def build_ranking_query(user_prompt: Optional[str], search_keywords: Optional[str] = None) -> str:
+    """Query text for ranking: the evaluation criteria, or the search keywords if no prompt is set"""
+    return user_prompt if user_prompt and user_prompt.strip() else (search_keywords or "")
@@ -0,0 +1,163 @@
+"""
+Crash-safe job checkpoints for MatchTrex
+Records every job's parameters, search result and per-candidate stage progress in SQLite (one host)
+or a shared Postgres database (CHECKPOINT_DB_URL), so a job interrupted by a crash or redeploy can
+resume with only its unfinished candidates - on another host only with the shared database
+"""
+
+import json
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import CHECKPOINT_ENABLED, CHECKPOINT_DB_PATH, CHECKPOINT_DB_URL
+from db_backend import Database
+
+# Candidate stages in pipeline order; "skipped" and "evaluated" are final
+CANDIDATE_STAGES = ("searched", "downloaded", "extracted", "evaluated", "skipped", "failed")
+
+class CheckpointStore:
+    """Job and candidate progress (SQLite path or Postgres URL), safe to use from all pipeline worker threads"""
+
+    def __init__(self, target: str):
+        self.target = target
+        self._lock = threading.Lock()
+        self._db = Database(target)
+        self._ready = False
+
+    def _connect(self) -> Database:
+        """Open the database once and create the tables"""
+        if not self._ready:
+            db = self._db
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoint_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    unique_candidates TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )""")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoint_candidates (
+                    job_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    rank INTEGER NOT NULL,
+                    stage TEXT NOT NULL,
+                    filename TEXT,
+                    cv_data TEXT,
+                    candidate TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (job_id, url)
+                )""")
+            self._ready = True
+        return self._db
+
+    def start_job(self, job_id: str, params: Dict) -> None:
+        """Register a job (or mark an existing one as running again)"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._connect().execute(
+                """INSERT INTO checkpoint_jobs (job_id, params, status, created_at, updated_at)
+                   VALUES (?, ?, 'running', ?, ?)
+                   ON CONFLICT(job_id) DO UPDATE SET params = excluded.params, status = 'running',
+                                                     updated_at = excluded.updated_at""",
+                (job_id, json.dumps(params, ensure_ascii=False), now, now)
+            )
+
+    def reset_job(self, job_id: str) -> None:
+        """Forget a job's search result and candidate progress (fresh, non-resumed run)"""
+        with self._lock:
+            db = self._connect()
+            db.execute("DELETE FROM checkpoint_candidates WHERE job_id = ?", (job_id,))
+            db.execute("UPDATE checkpoint_jobs SET unique_candidates = NULL WHERE job_id = ?", (job_id,))
+
+    def save_search(self, job_id: str, unique_candidates: List[str], to_download: List[str]) -> None:
+        """Store the ranked search result and register the candidates that will be downloaded"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            db = self._connect()
+            with db.transaction():
+                db.execute(
+                    "UPDATE checkpoint_jobs SET unique_candidates = ?, updated_at = ? WHERE job_id = ?",
+                    (json.dumps(unique_candidates), now, job_id)
+                )
+                db.executemany(
+                    """INSERT INTO checkpoint_candidates (job_id, url, rank, stage, updated_at)
+                       VALUES (?, ?, ?, 'searched', ?) ON CONFLICT DO NOTHING""",
+                    [(job_id, url, rank, now) for rank, url in enumerate(to_download)]
+                )
+
+    def mark(self, job_id: str, url: str, stage: str, filename: Optional[str] = None,
+             cv_data: Optional[Dict] = None, candidate: Optional[Dict] = None) -> None:
+        """Record that a candidate reached a stage, with the data needed to continue from there"""
+        fields = {'stage': stage, 'updated_at': datetime.now().isoformat()}
+        if filename is not None:
+            fields['filename'] = filename
+        if cv_data is not None:
+            fields['cv_data'] = json.dumps(cv_data, ensure_ascii=False)
+        if candidate is not None:
+            fields['candidate'] = json.dumps(candidate, ensure_ascii=False)
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._connect().execute(
+                f"UPDATE checkpoint_candidates SET {assignments} WHERE job_id = ? AND url = ?",
+                (*fields.values(), job_id, url)
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Job row with decoded params and search result, or None"""
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM checkpoint_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['unique_candidates'] = json.loads(job['unique_candidates']) if job['unique_candidates'] else None
+        return job
+
+    def candidates(self, job_id: str) -> List[Dict]:
+        """Candidate progress rows of a job in rank order, JSON columns decoded"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT * FROM checkpoint_candidates WHERE job_id = ? ORDER BY rank", (job_id,)
+            ).fetchall()
+        candidates = []
+        for row in rows:
+            candidate = dict(row)
+            for column in ('cv_data', 'candidate'):
+                candidate[column] = json.loads(candidate[column]) if candidate[column] else None
+            candidates.append(candidate)
+        return candidates
+
+    def finish_job(self, job_id: str, status: str) -> None:
+        """Set a job's status when its run ends ('completed', 'failed', 'cancelled', or 'suspended' to be resumed)"""
+        with self._lock:
+            self._connect().execute(
+                "UPDATE checkpoint_jobs SET status = ?, updated_at = ? WHERE job_id = ?",
+                (status, datetime.now().isoformat(), job_id)
+            )
+
+    def interrupted_jobs(self) -> List[Dict]:
+        """Jobs still marked running - their process died before finishing them"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT job_id FROM checkpoint_jobs WHERE status = 'running' ORDER BY created_at"
+            ).fetchall()
+        return [self.get_job(row['job_id']) for row in rows]
+
+# Global store instance (created lazily)
+_checkpoint_store: Optional[CheckpointStore] = None
+_store_init_lock = threading.Lock()
+
+def get_checkpoint_store() -> Optional[CheckpointStore]:
+    """Get the shared checkpoint store (Postgres if CHECKPOINT_DB_URL is set), or None when checkpointing is disabled"""
+    global _checkpoint_store
+
+    if not CHECKPOINT_ENABLED:
+        return None
+
+    with _store_init_lock:
+        if _checkpoint_store is None:
+            _checkpoint_store = CheckpointStore(CHECKPOINT_DB_URL or CHECKPOINT_DB_PATH)
+    return _checkpoint_store
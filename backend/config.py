@@ -3,6 +3,8 @@ Configuration file for MatchTrex application.
 Contains settings for Google Sheets integration.
 """
 
+import os
+
 # Google Sheets Configuration
 GOOGLE_SHEETS_CREDENTIALS_PATH = "google_credentials.json"
 GOOGLE_SHEETS_ID = "1_jqlLt0ckySKVJf2hED7fVJZamAA_kNdl1N6GTQcrFg"  # Replace with your actual Google Sheets document ID
@@ -13,13 +15,134 @@ DEFAULT_EXCEL_FILE = "SearchRecords.xlsx"  # Fallback to Excel if Google Sheets
 # Data source priority: 'google_sheets' or 'excel'
 DATA_SOURCE = 'google_sheets'  # Change to 'excel' to use Excel files instead
 
+# Local data directory for caches and pipeline state (survives temp_CVs cleanup)
+DATA_DIR = os.environ.get('MATCHTREX_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+
+# Evaluation verdict cache - identical CV + prompts + model are only judged once
+EVALUATION_CACHE_ENABLED = os.environ.get('EVALUATION_CACHE_ENABLED', 'true').lower() == 'true'
+EVALUATION_CACHE_PATH = os.path.join(DATA_DIR, 'evaluation_cache.jsonl')
+
+# Structured output - request schema-constrained JSON from MistralAI and repair invalid fields
+STRUCTURED_OUTPUT_ENABLED = os.environ.get('STRUCTURED_OUTPUT_ENABLED', 'true').lower() == 'true'
+STRUCTURED_OUTPUT_MAX_REPAIRS = int(os.environ.get('STRUCTURED_OUTPUT_MAX_REPAIRS', '1'))
+
+# Evaluation cascade - a fast model decides clear cases, borderline ones escalate to the evaluation model
+EVALUATION_CASCADE_ENABLED = os.environ.get('EVALUATION_CASCADE_ENABLED', 'false').lower() == 'true'
+CASCADE_FAST_MODEL = os.environ.get('CASCADE_FAST_MODEL', 'mistral-small-latest')
+CASCADE_CONFIDENCE_THRESHOLD = float(os.environ.get('CASCADE_CONFIDENCE_THRESHOLD', '0.85'))
+
+# Candidate pre-ranking - BM25 relevance of profile cards to the user prompt decides download order
+CANDIDATE_RANKING_ENABLED = os.environ.get('CANDIDATE_RANKING_ENABLED', 'true').lower() == 'true'
+
+# Quota mode - stop once this many candidates qualified (hard cap = target x factor downloads)
+QUOTA_MAX_DOWNLOADS_FACTOR = int(os.environ.get('QUOTA_MAX_DOWNLOADS_FACTOR', '5'))
+
+# Pipeline engine - bounded queue size between stages and workers per stage
+PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', '8'))
+PIPELINE_DOWNLOAD_WORKERS = int(os.environ.get('PIPELINE_DOWNLOAD_WORKERS', '1'))  # one browser session each
+PIPELINE_EXTRACT_WORKERS = int(os.environ.get('PIPELINE_EXTRACT_WORKERS', '2'))
+PIPELINE_EVALUATE_WORKERS = int(os.environ.get('PIPELINE_EVALUATE_WORKERS', '3'))
+
+# Hard criteria - deterministic experience/tenure rules reject candidates before the evaluation call
+HARD_CRITERIA_ENABLED = os.environ.get('HARD_CRITERIA_ENABLED', 'true').lower() == 'true'
+
+# Streaming evaluation - read the verdict from the token stream and abort once the JSON array closes
+EVALUATION_STREAMING_ENABLED = os.environ.get('EVALUATION_STREAMING_ENABLED', 'false').lower() == 'true'
+
+# Request hedging - duplicate calls slower than the stage's p90 latency, within an extra-spend budget
+LLM_HEDGING_ENABLED = os.environ.get('LLM_HEDGING_ENABLED', 'false').lower() == 'true'
+LLM_HEDGE_BUDGET_FRACTION = float(os.environ.get('LLM_HEDGE_BUDGET_FRACTION', '0.1'))  # max hedges per call
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get('LLM_HEDGE_MIN_SAMPLES', '20'))
+
+# CV text budget for extraction (2000 ≈ the former 8000-character cut) - over-budget CVs keep whole sections by priority
+CV_TOKEN_BUDGET = int(os.environ.get('CV_TOKEN_BUDGET', '2000'))
+
+# CV encoding in the evaluation prompt - 'verbose' (bullet list) or 'compact' (one terse line per section)
+CV_ENCODING = os.environ.get('CV_ENCODING', 'verbose').lower()
+
+# Near-duplicate detection - MinHash/LSH over cleaned CV text, kept in a persistent candidate index
+NEAR_DUPLICATE_ENABLED = os.environ.get('NEAR_DUPLICATE_ENABLED', 'true').lower() == 'true'
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', '0.85'))
+NEAR_DUPLICATE_REUSE_MAX_AGE_DAYS = float(os.environ.get('NEAR_DUPLICATE_REUSE_MAX_AGE_DAYS', '30'))  # older non-identical matches are re-extracted
+NEAR_DUPLICATE_WAIT_S = float(os.environ.get('NEAR_DUPLICATE_WAIT_S', '120'))  # max wait of a copy for the first copy's extraction or verdict
+CANDIDATE_INDEX_PATH = os.path.join(DATA_DIR, 'candidate_index.jsonl')
+
+# Job history - finished jobs (funnel counts, timings, usage) for yield and cost estimates
+JOB_HISTORY_PATH = os.path.join(DATA_DIR, 'job_history.jsonl')
+
+# Yield estimator - prior accept rate (and its weight in pseudo-CVs) before history is available
+YIELD_PRIOR_ACCEPT_RATE = float(os.environ.get('YIELD_PRIOR_ACCEPT_RATE', '0.2'))
+YIELD_PRIOR_STRENGTH = float(os.environ.get('YIELD_PRIOR_STRENGTH', '10'))
+YIELD_MAX_DOWNLOADS = int(os.environ.get('YIELD_MAX_DOWNLOADS', '1000'))
+
+# Shared Mistral request rate limit (requests per second, 0 = unlimited)
+LLM_RATE_LIMIT_RPS = float(os.environ.get('LLM_RATE_LIMIT_RPS', '0'))
+
+# Prompt A/B harness - concurrent evaluations and their request rate when LLM_RATE_LIMIT_RPS is unset
+PROMPT_AB_WORKERS = int(os.environ.get('PROMPT_AB_WORKERS', '8'))
+PROMPT_AB_RATE_LIMIT_RPS = float(os.environ.get('PROMPT_AB_RATE_LIMIT_RPS', '4'))
+
+# CV store - cleaned CVs and extracted data per job, kept for evaluation replays
+CV_STORE_ENABLED = os.environ.get('CV_STORE_ENABLED', 'true').lower() == 'true'
+CV_STORE_DIR = os.path.join(DATA_DIR, 'cv_store')
+REPLAY_WORKERS = int(os.environ.get('REPLAY_WORKERS', '8'))
+
+# Checkpoints - per-candidate job progress in SQLite (or Postgres) so interrupted jobs resume where they stopped
+CHECKPOINT_ENABLED = os.environ.get('CHECKPOINT_ENABLED', 'true').lower() == 'true'
+CHECKPOINT_DB_PATH = os.environ.get('CHECKPOINT_DB_PATH', os.path.join(DATA_DIR, 'checkpoints.sqlite3'))
+# postgresql:// URL (e.g. the Supabase database) - lets a worker on another host resume a job from its checkpoint
+CHECKPOINT_DB_URL = os.environ.get('CHECKPOINT_DB_URL', '')
+CHECKPOINT_RESUME_ON_STARTUP = os.environ.get('CHECKPOINT_RESUME_ON_STARTUP', 'true').lower() == 'true'
+CV_WORK_DIR = os.environ.get('CV_WORK_DIR', os.path.join(DATA_DIR, 'temp_CVs'))  # Downloaded CV pages, one subdirectory per job
+
+# Incremental publishing - qualified candidates are appended to Supabase in batches while a job runs
+PUBLISH_BATCH_SIZE = int(os.environ.get('PUBLISH_BATCH_SIZE', '5'))
+PUBLISH_INTERVAL_S = float(os.environ.get('PUBLISH_INTERVAL_S', '30'))  # max delay of a partial batch
+
+# Job queue - durable SQLite (one host) or Postgres (several hosts) queue feeding a fixed pool of pipeline workers (one pipeline each)
+JOB_QUEUE_DB_PATH = os.environ.get('JOB_QUEUE_DB_PATH', os.path.join(DATA_DIR, 'job_queue.sqlite3'))  # API and workers on one host
+# postgresql:// URL (e.g. the Supabase database) - needed for workers on several hosts; overrides JOB_QUEUE_DB_PATH
+JOB_QUEUE_URL = os.environ.get('JOB_QUEUE_URL', '')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+JOB_VISIBILITY_TIMEOUT_S = float(os.environ.get('JOB_VISIBILITY_TIMEOUT_S', '300'))  # claim lapses without heartbeat
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+JOB_QUEUE_POLL_S = float(os.environ.get('JOB_QUEUE_POLL_S', '2'))
+JOB_SHUTDOWN_TIMEOUT_S = float(os.environ.get('JOB_SHUTDOWN_TIMEOUT_S', '60'))  # wait for suspended pipelines to stop
+# Run queue workers inside the API process; 'false' keeps the API thin - jobs then run in worker.py processes
+API_RUN_WORKERS = os.environ.get('API_RUN_WORKERS', 'true').lower() == 'true'
+
+# Job coalescing - identical searches submitted while one runs, or within this window after it finished,
+# share its results instead of running their own pipeline (0 = only while it runs)
+COALESCE_WINDOW_S = float(os.environ.get('COALESCE_WINDOW_S', '900'))
+
+# Job budgets - defaults for searches that set none (0 = unlimited). A job that exhausts a budget stops
+# the stages spending it and finishes with its partial results
+JOB_MAX_WALL_TIME_S = int(os.environ.get('JOB_MAX_WALL_TIME_S', '14400'))
+JOB_MAX_LLM_TOKENS = int(os.environ.get('JOB_MAX_LLM_TOKENS', '0'))
+JOB_MAX_PAGE_LOADS = int(os.environ.get('JOB_MAX_PAGE_LOADS', '0'))  # CV page loads in the browser
+
+# Job progress - interval of the compact progress updates written to Supabase while a search runs
+PROGRESS_UPDATE_INTERVAL_S = float(os.environ.get('PROGRESS_UPDATE_INTERVAL_S', '15'))
+
+# Pre-flight estimates - defaults until job history exists, and limits above which a search is oversized
+ESTIMATE_DEFAULT_SEARCH_SECONDS = float(os.environ.get('ESTIMATE_DEFAULT_SEARCH_SECONDS', '30'))
+ESTIMATE_DEFAULT_DOWNLOAD_SECONDS = float(os.environ.get('ESTIMATE_DEFAULT_DOWNLOAD_SECONDS', '20'))
+ESTIMATE_DEFAULT_EVALUATE_SECONDS = float(os.environ.get('ESTIMATE_DEFAULT_EVALUATE_SECONDS', '12'))
+ESTIMATE_DEFAULT_TOKENS_PER_CV = int(os.environ.get('ESTIMATE_DEFAULT_TOKENS_PER_CV', '4000'))
+ESTIMATE_MAX_WALL_TIME_S = int(os.environ.get('ESTIMATE_MAX_WALL_TIME_S', '14400'))
+ESTIMATE_MAX_COST_EUR = float(os.environ.get('ESTIMATE_MAX_COST_EUR', '10'))
+
+# MistralAI list prices in EUR per 1M tokens (input, output) - used for per-job cost estimates
+MISTRAL_PRICES_EUR_PER_M = {
+    'mistral-medium-latest': (0.37, 1.85),
+    'mistral-small-latest': (0.09, 0.28)
+}
+
 def get_google_sheets_id():
     """
     Get the Google Sheets ID from environment variable or config.
     Priority: Environment variable > config file setting
     """
-    import os
-    
     # Try to get from environment variable first
     sheets_id = os.environ.get('GOOGLE_SHEETS_ID')
     if sheets_id:
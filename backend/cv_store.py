@@ -0,0 +1,77 @@
+"""
+Per-job store of processed CVs for MatchTrex
+Keeps each job's cleaned CV text and extracted cv_data after temp_CVs is deleted,
+so the evaluation stage can be replayed with new prompts without re-scraping
+"""
+
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import CV_STORE_ENABLED, CV_STORE_DIR
+
+_store_lock = threading.Lock()
+
+def _job_path(job_id: str) -> str:
+    """Store file of a job; the id is reduced to filename-safe characters"""
+    safe_id = re.sub(r"[^A-Za-z0-9_-]", "_", str(job_id))
+    return os.path.join(CV_STORE_DIR, f"{safe_id}.jsonl")
+
+def store_cv(job_id: Optional[str], account_key: str, url: str, cv_text: str, cv_data: Optional[Dict]) -> None:
+    """Append one processed CV to its job's store file (no-op without a job id or when disabled)"""
+    if not CV_STORE_ENABLED or not job_id:
+        return
+
+    record = {
+        'account_key': account_key,
+        'url': url,
+        'cv_text': cv_text,
+        'cv_data': cv_data,
+        'stored_at': datetime.now().isoformat()
+    }
+    with _store_lock:
+        try:
+            os.makedirs(CV_STORE_DIR, exist_ok=True)
+            with open(_job_path(job_id), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"⚠️ Could not store CV {account_key}: {e}")
+
+def load_stored_cvs(job_id: str) -> List[Dict]:
+    """Stored CVs of a job in processing order, one per account key (empty if none were stored)"""
+    path = _job_path(job_id)
+    if not os.path.exists(path):
+        return []
+
+    records = {}
+    with _store_lock:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Skip a partially written line
+                records[record['account_key']] = record
+    return list(records.values())
+
+def list_stored_jobs() -> List[Dict]:
+    """Jobs with stored CVs, most recently updated first"""
+    if not os.path.isdir(CV_STORE_DIR):
+        return []
+
+    jobs = []
+    for name in os.listdir(CV_STORE_DIR):
+        if not name.endswith(".jsonl"):
+            continue
+        path = os.path.join(CV_STORE_DIR, name)
+        jobs.append({
+            'job_id': name[:-len(".jsonl")],
+            'updated_at': datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+        })
+    return sorted(jobs, key=lambda job: job['updated_at'], reverse=True)
@@ -0,0 +1,90 @@
+"""
+Token-budgeted CV text truncation for MatchTrex
+Splits the cleaned resume text (one line per block) into its sections and, when the CV is over
+budget, keeps whole sections in priority order (recent experience, skills, education, ...)
+instead of cutting the text at a fixed character offset
+"""
+
+import re
+from typing import List, Tuple
+
+from llm_client import estimate_tokens
+
+# Section headings of Indeed resumes (German and English) by section kind
+SECTION_HEADINGS = {
+    "experience": ["Berufserfahrung", "Arbeitserfahrung", "Work Experience", "Experience"],
+    "skills": ["Kenntnisse", "Fähigkeiten", "Skills"],
+    "education": ["Ausbildung", "Bildung", "Education"],
+    "summary": ["Zusammenfassung", "Summary"],
+    "languages": ["Sprachen", "Languages"],
+    "certifications": ["Zertifikate und Lizenzen", "Zertifizierungen", "Certifications and Licenses", "Certifications"],
+    "other": ["Weitere Informationen", "Additional Information", "Auszeichnungen", "Awards", "Links",
+              "Gruppen", "Groups", "Publikationen", "Publications", "Militärdienst", "Military Service"]
+}
+
+# Order in which sections are kept when the CV is over budget ("header" = name/location before the first heading)
+SECTION_PRIORITY = ["header", "experience", "skills", "education", "summary", "certifications", "languages", "other"]
+
+# Sections that are cut to fit rather than dropped (experience is listed most recent first)
+PARTIAL_SECTIONS = ("header", "experience")
+
+def split_cv_sections(cv_text: str) -> List[Tuple[str, str]]:
+    """
+    Split cleaned CV text into (kind, text) sections in document order.
+    A heading only counts on a line of its own (the first one per kind), so the same word
+    in the body of an entry does not split sections.
+    """
+    boundaries = []
+    for kind, headings in SECTION_HEADINGS.items():
+        pattern = "|".join(re.escape(heading) for heading in headings)
+        match = re.search(rf"^[ \t]*(?:{pattern})[ \t]*:?[ \t]*$", cv_text, re.MULTILINE)
+        if match:
+            boundaries.append((kind, match.start(), match.end()))
+
+    boundaries.sort(key=lambda item: item[1])
+    sections = []
+    if not boundaries or boundaries[0][1] > 0:
+        sections.append(("header", cv_text[:boundaries[0][1] if boundaries else len(cv_text)].strip()))
+    for i, (kind, start, _) in enumerate(boundaries):
+        end = boundaries[i + 1][1] if i + 1 < len(boundaries) else len(cv_text)
+        sections.append((kind, cv_text[start:end].strip()))
+    return [(kind, text) for kind, text in sections if text]
+
+def _cut_to_tokens(text: str, max_tokens: int) -> str:
+    """Prefix of text within max_tokens, cut at a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * 4]
+    space = max(cut.rfind(" "), cut.rfind("\n"))
+    return cut[:space] if space > 0 else cut
+
+def truncate_cv_text(cv_text: str, max_tokens: int) -> Tuple[str, List[str]]:
+    """
+    Fit CV text into a token budget, keeping sections in SECTION_PRIORITY order.
+    Returns (text, names of dropped or shortened sections); text is unchanged if it already fits.
+    """
+    if estimate_tokens(cv_text) <= max_tokens:
+        return cv_text, []
+
+    sections = split_cv_sections(cv_text)
+    rank = {kind: i for i, kind in enumerate(SECTION_PRIORITY)}
+    order = sorted(range(len(sections)), key=lambda i: (rank.get(sections[i][0], len(rank)), i))
+    kept = {}
+    # One token of slack per section for separators and per-section rounding
+    remaining = max_tokens - len(sections)
+
+    affected = []
+    for index in order:
+        kind, text = sections[index]
+        tokens = estimate_tokens(text)
+        if tokens <= remaining:
+            kept[index] = text
+            remaining -= tokens
+        elif kind in PARTIAL_SECTIONS and remaining > 0:
+            kept[index] = _cut_to_tokens(text, remaining)
+            remaining -= estimate_tokens(kept[index])
+            affected.append(f"{kind} (shortened)")
+        else:
+            affected.append(kind)
+
+    return "\n".join(kept[i] for i in sorted(kept)), affected
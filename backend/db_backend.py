@@ -0,0 +1,99 @@
+"""
+Database connections for the MatchTrex job queue and checkpoint store
+A path opens a local SQLite file (one host: every process must see the same file, and SQLite's WAL
+mode does not work over network filesystems). A postgresql:// URL (e.g. the Supabase database)
+opens a shared Postgres database, so workers on several hosts claim jobs from the same queue and
+resume each other's checkpoints. Queries are written with ? placeholders for both.
+"""
+
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Sequence
+
+POSTGRES_PREFIXES = ("postgres://", "postgresql://")
+
+def is_postgres_url(target: str) -> bool:
+    return bool(target) and target.startswith(POSTGRES_PREFIXES)
+
+class Database:
+    """
+    One lazily opened connection in autocommit mode (callers serialise access with their own lock).
+    Rows support access by column name.
+    """
+
+    def __init__(self, target: str):
+        self.target = target
+        self.postgres = is_postgres_url(target)
+        self._connection = None
+
+    @property
+    def float_type(self) -> str:
+        """Column type for epoch seconds (Postgres REAL is single precision)"""
+        return "DOUBLE PRECISION" if self.postgres else "REAL"
+
+    def connection(self):
+        """Open the connection on first use"""
+        if self._connection is None:
+            if self.postgres:
+                try:
+                    import psycopg2
+                    import psycopg2.extras
+                except ImportError as e:
+                    raise RuntimeError("psycopg2 is required for a Postgres job queue or checkpoint store") from e
+                connection = psycopg2.connect(self.target, cursor_factory=psycopg2.extras.RealDictCursor)
+                connection.autocommit = True
+            else:
+                os.makedirs(os.path.dirname(self.target) or ".", exist_ok=True)
+                connection = sqlite3.connect(self.target, check_same_thread=False, isolation_level=None, timeout=30)
+                connection.row_factory = sqlite3.Row
+                connection.execute("PRAGMA journal_mode=WAL")
+            self._connection = connection
+        return self._connection
+
+    def _sql(self, sql: str) -> str:
+        return sql.replace("?", "%s") if self.postgres else sql
+
+    def execute(self, sql: str, params: Sequence[Any] = ()):
+        """Run one statement; returns the cursor (fetchone/fetchall/rowcount)"""
+        if self.postgres:
+            cursor = self.connection().cursor()
+            cursor.execute(self._sql(sql), tuple(params))
+            return cursor
+        return self.connection().execute(sql, tuple(params))
+
+    def executemany(self, sql: str, rows: Iterable[Sequence[Any]]) -> None:
+        if self.postgres:
+            self.connection().cursor().executemany(self._sql(sql), [tuple(row) for row in rows])
+        else:
+            self.connection().executemany(sql, rows)
+
+    @contextmanager
+    def transaction(self):
+        """Run the enclosed statements atomically (SQLite takes the write lock up front)"""
+        self.execute("BEGIN" if self.postgres else "BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.execute("ROLLBACK")
+            raise
+        self.execute("COMMIT")
+
+    def lock_key(self, key: str) -> None:
+        """
+        Serialise transactions on key until the current one ends. SQLite transactions are already
+        serialised by BEGIN IMMEDIATE; Postgres uses a transaction-level advisory lock.
+        """
+        if self.postgres:
+            self.execute("SELECT pg_advisory_xact_lock(hashtext(?))", (key,))
+
+    def add_missing_columns(self, table: str, columns: Dict[str, str]) -> None:
+        """Add columns introduced after the table was created"""
+        if self.postgres:
+            for column, definition in columns.items():
+                self.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {definition}")
+            return
+        existing = {row['name'] for row in self.execute(f"PRAGMA table_info({table})")}
+        for column, definition in columns.items():
+            if column not in existing:
+                self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
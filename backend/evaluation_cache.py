@@ -0,0 +1,123 @@
+"""
+Evaluation verdict cache for MatchTrex
+Stores accept/reject decisions so unchanged CVs are not re-judged against unchanged prompts
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import EVALUATION_CACHE_ENABLED, EVALUATION_CACHE_PATH
+
+def hash_text(text: Optional[str]) -> str:
+    """Stable SHA-256 hex digest of a (possibly empty) string"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def make_cache_key(formatted_cv: str, system_prompt: str, user_prompt: str, model: str, lenient_version: str) -> str:
+    """
+    Build the cache key for one evaluation.
+    Every input is hashed, so any edit to the CV text or a prompt yields a new key.
+    """
+    parts = [
+        hash_text(formatted_cv),
+        hash_text(system_prompt),
+        hash_text(user_prompt),
+        model or "",
+        lenient_version or ""
+    ]
+    return hash_text("|".join(parts))
+
+class EvaluationCache:
+    """Append-only JSONL cache of evaluation verdicts, held in memory for instant lookups"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self):
+        """Read the cache file once; later entries for the same key win"""
+        if self._loaded:
+            return
+        self._loaded = True
+
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Skip a partially written line
+                    if entry.get('key'):
+                        self._entries[entry['key']] = entry
+            print(f"✅ Loaded {len(self._entries)} cached evaluation verdicts")
+        except Exception as e:
+            print(f"⚠️ Could not load evaluation cache {self.path}: {e}")
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached verdict for a key, or None"""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(key)
+            if entry:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def set(self, key: str, is_accepted: bool, ai_response: str, model: str, profile_url: str = "") -> None:
+        """Store a verdict in memory and append it to the cache file"""
+        entry = {
+            'key': key,
+            'is_accepted': bool(is_accepted),
+            'ai_response': ai_response,
+            'model': model,
+            'profile_url': profile_url,
+            'cached_at': datetime.now().isoformat()
+        }
+
+        with self._lock:
+            self._load()
+            self._entries[key] = entry
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            except Exception as e:
+                print(f"⚠️ Could not persist evaluation verdict: {e}")
+
+    def stats(self) -> Dict:
+        """Hit/miss counters since process start"""
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+# Global cache instance (created lazily)
+_evaluation_cache: Optional[EvaluationCache] = None
+_cache_init_lock = threading.Lock()
+
+def get_evaluation_cache() -> Optional[EvaluationCache]:
+    """Get the shared evaluation cache, or None when caching is disabled"""
+    global _evaluation_cache
+
+    if not EVALUATION_CACHE_ENABLED:
+        return None
+
+    with _cache_init_lock:
+        if _evaluation_cache is None:
+            _evaluation_cache = EvaluationCache(EVALUATION_CACHE_PATH)
+    return _evaluation_cache
@@ -151,6 +151,7 @@ class GoogleSheetsService:
                 ["resume_last_updated_days", "30", "Filter profiles updated within X days"],
                 ["target_candidates", "100", "Minimum candidates to find before stopping"],
                 ["max_radius", "50", "Maximum search radius in km"],
+                ["hard_criteria", '{"min_total_experience_years": 4, "max_short_positions": 1, "short_position_months": 6, "recent_window_years": 2}', "Deterministic rules checked before AI evaluation (JSON)"],
                 ["recipient_email", "parth@beyondleverage.com", "Email recipient for results"],
                 ["user_prompt", "EVALUATE each candidate against these EXACT criteria:\n\nCRITERION 1 - Experience Duration:\nPASS: Based on the experience provided, the candidate should have atleast 4+ years total professional experience (This is a non-negotiable requirement)\nFAIL: Less than 4 years total experience\n\nCRITERION 2 - Job Stability:\nPASS: 0-1 positions shorter than 6 months in last 2 years (2023-2025)\nFAIL: 2+ positions shorter than 6 months in last 2 years\n\nCRITERION 3 - Consultative Sales Experience:\nPASS: 1+ year in advisory/consultative sales roles:\n  - Fashion retail with customer styling/advice\n  - Furniture sales with design consultation\n  - Pet supplies with animal care advice\n  - Optics/eyewear with vision consultation\n  - Electronics with technical consultation\n  - Similar customer advisory positions\n\nFAIL: Only cashier, warehouse, or basic sales without consultation\n\nREQUIRED OUTPUT FORMAT:\n[\"https://resumes.indeed.com/resume/abc123\", \"https://resumes.indeed.com/resume/def456\"]\n\nIF NO CANDIDATES QUALIFY:\n[]\n\nNo SUMMARY. NO EXPLANATION. ANALYZE AND RETURN ONLY JSON ARRAY NOW:", "User prompt for MistralAI candidate evaluation"],
                 ["system_prompt", "You are an experienced recruiter specializing in fashion retail sales positions. Your task is to evaluate candidate CVs against specific criteria and return only the profile URLs of candidates who meet ALL requirements.", "System prompt for MistralAI"]
@@ -208,6 +209,12 @@ class GoogleSheetsService:
             "resume_last_updated_days": 30,
             "target_candidates": 100,
             "max_radius": 50,
+            "hard_criteria": {
+                "min_total_experience_years": 4,
+                "max_short_positions": 1,
+                "short_position_months": 6,
+                "recent_window_years": 2
+            },
             "recipient_email": "parth@beyondleverage.com",
             "user_prompt": "EVALUATE each candidate against these EXACT criteria:\n\nCRITERION 1 - Experience Duration:\nPASS: Based on the experience provided, the candidate should have atleast 4+ years total professional experience (This is a non-negotiable requirement)\nFAIL: Less than 4 years total experience\n\nCRITERION 2 - Job Stability:\nPASS: 0-1 positions shorter than 6 months in last 2 years (2023-2025)\nFAIL: 2+ positions shorter than 6 months in last 2 years\n\nCRITERION 3 - Consultative Sales Experience:\nPASS: 1+ year in advisory/consultative sales roles:\n  - Fashion retail with customer styling/advice\n  - Furniture sales with design consultation\n  - Pet supplies with animal care advice\n  - Optics/eyewear with vision consultation\n  - Electronics with technical consultation\n  - Similar customer advisory positions\n\nFAIL: Only cashier, warehouse, or basic sales without consultation\n\nREQUIRED OUTPUT FORMAT:\n[\"https://resumes.indeed.com/resume/abc123\", \"https://resumes.indeed.com/resume/def456\"]\n\nIF NO CANDIDATES QUALIFY:\n[]\n\nNo SUMMARY. NO EXPLANATION. ANALYZE AND RETURN ONLY JSON ARRAY NOW:",
             "system_prompt": "You are an experienced recruiter specializing in fashion retail sales positions. Your task is to evaluate candidate CVs against specific criteria and return only the profile URLs of candidates who meet ALL requirements."
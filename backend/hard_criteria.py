@@ -0,0 +1,196 @@
+"""
+Deterministic hard-criteria checks for MatchTrex candidates
+Parses the experience dates extracted from a CV into month intervals, computes tenure and
+job-hopping metrics and rejects candidates that certainly fail a configured rule,
+so no evaluation call is spent on them
+"""
+
+import json
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Default rules - mirror the criteria of the default user prompt
+DEFAULT_HARD_CRITERIA = {
+    "min_total_experience_years": 4,
+    "max_short_positions": 1,
+    "short_position_months": 6,
+    "recent_window_years": 2
+}
+
+MONTHS = {
+    "jan": 1, "januar": 1, "january": 1, "jän": 1, "jänner": 1,
+    "feb": 2, "februar": 2, "february": 2,
+    "mar": 3, "mär": 3, "märz": 3, "maerz": 3, "march": 3, "mrz": 3,
+    "apr": 4, "april": 4,
+    "mai": 5, "may": 5,
+    "jun": 6, "juni": 6, "june": 6,
+    "jul": 7, "juli": 7, "july": 7,
+    "aug": 8, "august": 8,
+    "sep": 9, "sept": 9, "september": 9,
+    "okt": 10, "oct": 10, "oktober": 10, "october": 10,
+    "nov": 11, "november": 11,
+    "dez": 12, "dec": 12, "dezember": 12, "december": 12
+}
+
+# Markers of an ongoing position ("seit" / "since" imply it has not ended)
+_PRESENT_PATTERN = re.compile(r"\b(heute|present|current|currently|aktuell|now|today|jetzt|laufend|seit|since)\b")
+
+_DATE_PATTERN = re.compile(
+    r"(?P<month_name>[^\W\d_]+)\.?\s+(?P<year_a>(?:19|20)\d{2})"   # Jan 2020 / Januar 2020
+    r"|(?P<month_num>\d{1,2})\s*[./-]\s*(?P<year_b>(?:19|20)\d{2})"  # 01/2020, 1.2020
+    r"|(?P<year_c>(?:19|20)\d{2})-(?P<month_iso>\d{1,2})\b(?![./])"  # 2020-01
+    r"|(?P<year_d>(?:19|20)\d{2})",                                  # 2020
+    re.UNICODE
+)
+
+def _month_index(year: int, month: int) -> int:
+    """Months since year 0 (so intervals can be compared and subtracted)"""
+    return year * 12 + (month - 1)
+
+def _parse_dates(text: str, year_only_month: int) -> List[int]:
+    """All dates in a string as month indices, in order of appearance"""
+    found = []
+    for match in _DATE_PATTERN.finditer(text):
+        if match.group("year_a"):
+            month = MONTHS.get(match.group("month_name").lower())
+            if month is None:
+                # A word that is not a month followed by a year (e.g. "seit 2020")
+                found.append(_month_index(int(match.group("year_a")), year_only_month))
+            else:
+                found.append(_month_index(int(match.group("year_a")), month))
+        elif match.group("year_b"):
+            month = int(match.group("month_num"))
+            if 1 <= month <= 12:
+                found.append(_month_index(int(match.group("year_b")), month))
+        elif match.group("year_c"):
+            month = int(match.group("month_iso"))
+            if 1 <= month <= 12:
+                found.append(_month_index(int(match.group("year_c")), month))
+        elif match.group("year_d"):
+            found.append(_month_index(int(match.group("year_d")), year_only_month))
+    return found
+
+def parse_date_range(dates: str, now: Optional[datetime] = None) -> Optional[Tuple[int, int]]:
+    """
+    Parse a position's date string (e.g. "Jan 2020 - Mar 2022", "03/2019 – heute", "2018 - 2020")
+    into an inclusive (start, end) month-index interval. Returns None if it cannot be parsed,
+    or if it has a single date and is not ongoing ("Mai 2025") - its length is unknown.
+    """
+    if not dates or not isinstance(dates, str):
+        return None
+
+    now = now or datetime.now()
+    text = dates.strip().lower()
+    is_present = bool(_PRESENT_PATTERN.search(text))
+
+    # Year-only dates are read as the longest possible span (January to December),
+    # so a rejection based on them holds whatever the real months were
+    starts = _parse_dates(text, year_only_month=1)
+    if not starts:
+        return None
+    start = starts[0]
+
+    if is_present:
+        end = _month_index(now.year, now.month)
+    elif len(starts) < 2:
+        return None
+    else:
+        ends = _parse_dates(text, year_only_month=12)
+        end = ends[-1]
+
+    if end < start:
+        start, end = end, start
+    return start, end
+
+def _merged_months(intervals: List[Tuple[int, int]]) -> int:
+    """Number of distinct months covered by the intervals (overlapping positions count once)"""
+    total = 0
+    current_start, current_end = None, None
+    for start, end in sorted(intervals):
+        if current_end is None or start > current_end + 1:
+            if current_end is not None:
+                total += current_end - current_start + 1
+            current_start, current_end = start, end
+        else:
+            current_end = max(current_end, end)
+    if current_end is not None:
+        total += current_end - current_start + 1
+    return total
+
+def compute_experience_metrics(cv_data: Dict, criteria: Optional[Dict] = None, now: Optional[datetime] = None) -> Dict:
+    """
+    Tenure and job-hopping metrics for a CV:
+    total experience (months, overlaps merged), short positions in the recent window
+    and how many positions could not be parsed (including single-date entries without an end).
+    Ongoing positions are never short - they have not ended, so their length is not known yet.
+    """
+    criteria = {**DEFAULT_HARD_CRITERIA, **(criteria or {})}
+    now = now or datetime.now()
+    current_month = _month_index(now.year, now.month)
+    window_start = current_month - int(round(float(criteria["recent_window_years"]) * 12))
+    short_months = int(criteria["short_position_months"])
+
+    intervals = []
+    short_recent = 0
+    unparsed = 0
+    for position in cv_data.get("experience") or []:
+        dates = position.get("dates", "") if isinstance(position, dict) else ""
+        interval = parse_date_range(dates, now)
+        if not interval:
+            unparsed += 1
+            continue
+        intervals.append(interval)
+        start, end = interval
+        ongoing = bool(_PRESENT_PATTERN.search(dates.lower()))
+        if not ongoing and end - start + 1 < short_months and end >= window_start:
+            short_recent += 1
+
+    return {
+        "positions": len(intervals) + unparsed,
+        "parsed_positions": len(intervals),
+        "unparsed_positions": unparsed,
+        "total_experience_months": _merged_months(intervals),
+        "short_positions_recent": short_recent
+    }
+
+def evaluate_hard_criteria(cv_data: Dict, criteria: Optional[Dict],
+                           now: Optional[datetime] = None) -> Tuple[bool, Optional[str], Dict]:
+    """
+    Check a candidate against the hard criteria.
+    Only rejects when the outcome is certain (e.g. too little experience is only final if every
+    position could be parsed). Returns (passed, rejecting rule or None, metrics).
+    """
+    if not criteria:
+        return True, None, {}
+
+    # Only the rules present in criteria are applied; window sizes fall back to the defaults
+    metrics = compute_experience_metrics(cv_data, criteria, now)
+
+    max_short = criteria.get("max_short_positions")
+    if max_short is not None and metrics["short_positions_recent"] > int(max_short):
+        # Unparsed positions can only add short positions, so this is final
+        return False, "max_short_positions", metrics
+
+    min_years = criteria.get("min_total_experience_years")
+    if min_years is not None and metrics["positions"] and not metrics["unparsed_positions"]:
+        if metrics["total_experience_months"] < float(min_years) * 12:
+            return False, "min_total_experience_years", metrics
+
+    return True, None, metrics
+
+def parse_hard_criteria(value) -> Optional[Dict]:
+    """
+    Normalize a hard_criteria search parameter (dict, JSON string or empty) to a dict.
+    Returns None when no rules are configured or the value is invalid.
+    """
+    if not value:
+        return None
+    if isinstance(value, dict):
+        return value
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        print(f"⚠️ Ignoring invalid hard_criteria: {value!r}")
+        return None
+    return parsed if isinstance(parsed, dict) and parsed else None
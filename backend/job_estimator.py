@@ -0,0 +1,73 @@
+"""
+Pre-flight cost and duration estimates for MatchTrex searches
+Combines the number of matching Indeed profiles with per-CV timings and token usage
+learned from the job history
+"""
+
+from typing import Dict, List, Optional
+
+from config import (
+    ESTIMATE_DEFAULT_SEARCH_SECONDS, ESTIMATE_DEFAULT_DOWNLOAD_SECONDS,
+    ESTIMATE_DEFAULT_EVALUATE_SECONDS, ESTIMATE_DEFAULT_TOKENS_PER_CV
+)
+from job_history import load_job_history
+from llm_client import estimate_cost_eur
+
+# Model whose prices are used when there is no cost history yet
+DEFAULT_COST_MODEL = "mistral-medium-latest"
+
+def historical_unit_costs(history: Optional[List[Dict]] = None) -> Dict:
+    """
+    Average per-job search time and per-CV download time, evaluation time, tokens and cost
+    over past jobs that downloaded at least one CV; configured defaults where there is no data.
+    """
+    history = load_job_history() if history is None else history
+    jobs = [entry for entry in history if entry.get('downloaded')]
+
+    attempts = sum(entry.get('download_attempts') or entry['downloaded'] for entry in jobs)
+    downloaded = sum(entry['downloaded'] for entry in jobs)
+    stages = [entry.get('stage_seconds') or {} for entry in jobs]
+    usage = [entry.get('llm_usage') or {} for entry in jobs]
+
+    def per(total, count, default):
+        return total / count if count and total else default
+
+    default_cost = estimate_cost_eur(DEFAULT_COST_MODEL, int(ESTIMATE_DEFAULT_TOKENS_PER_CV * 0.85),
+                                     int(ESTIMATE_DEFAULT_TOKENS_PER_CV * 0.15))
+    return {
+        'history_jobs': len(jobs),
+        'search_seconds': per(sum(s.get('search', 0) for s in stages), len(jobs), ESTIMATE_DEFAULT_SEARCH_SECONDS),
+        'download_seconds_per_attempt': per(sum(s.get('download', 0) for s in stages), attempts, ESTIMATE_DEFAULT_DOWNLOAD_SECONDS),
+        # Extraction and evaluation overlap in the pipeline; the slower of the two paces the CVs
+        'evaluate_seconds_per_cv': per(sum(max(s.get('extract', 0), s.get('evaluate', 0)) for s in stages),
+                                       downloaded, ESTIMATE_DEFAULT_EVALUATE_SECONDS),
+        'tokens_per_cv': per(sum(u.get('total_tokens', 0) for u in usage), downloaded, ESTIMATE_DEFAULT_TOKENS_PER_CV),
+        'cost_eur_per_cv': per(sum(u.get('cost_eur', 0) for u in usage), downloaded, default_cost),
+        'download_success_rate': downloaded / attempts if attempts else 0.8
+    }
+
+def estimate_job(overall_match_count: Optional[int], target_candidates: int, accept_rate: float,
+                 history: Optional[List[Dict]] = None) -> Dict:
+    """
+    Expected wall time, LLM tokens/cost and qualified candidates for a search that downloads
+    up to target_candidates CVs out of overall_match_count matching profiles.
+    """
+    units = historical_unit_costs(history)
+    available = overall_match_count if overall_match_count is not None else target_candidates
+    attempts = min(target_candidates, available)
+    downloaded = attempts * units['download_success_rate']
+
+    # Downloads and evaluations run as overlapping stages after the search
+    wall_time = units['search_seconds'] + max(attempts * units['download_seconds_per_attempt'],
+                                              downloaded * units['evaluate_seconds_per_cv'])
+    return {
+        'overall_match_count': overall_match_count,
+        'download_attempts': attempts,
+        'expected_downloaded': round(downloaded, 1),
+        'expected_qualified': round(downloaded * accept_rate, 1),
+        'accept_rate': round(accept_rate, 4),
+        'expected_wall_time_s': round(wall_time),
+        'expected_llm_tokens': round(downloaded * units['tokens_per_cv']),
+        'expected_llm_cost_eur': round(downloaded * units['cost_eur_per_cv'], 4),
+        'unit_costs': {key: round(value, 4) if isinstance(value, float) else value for key, value in units.items()}
+    }
@@ -0,0 +1,45 @@
+"""
+Local history of finished MatchTrex pipeline runs
+One JSON line per job with its search parameters, funnel counts, durations and LLM usage;
+used to learn accept rates and to estimate the cost of new searches
+"""
+
+import json
+import os
+import threading
+from typing import Dict, List
+
+from config import JOB_HISTORY_PATH
+
+_history_lock = threading.Lock()
+
+def append_job_history(entry: Dict) -> None:
+    """Append one finished job to the history file"""
+    with _history_lock:
+        try:
+            os.makedirs(os.path.dirname(JOB_HISTORY_PATH) or ".", exist_ok=True)
+            with open(JOB_HISTORY_PATH, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"⚠️ Could not write job history: {e}")
+
+def load_job_history() -> List[Dict]:
+    """All recorded jobs, oldest first (empty if there is no history yet)"""
+    if not os.path.exists(JOB_HISTORY_PATH):
+        return []
+
+    entries = []
+    with _history_lock:
+        try:
+            with open(JOB_HISTORY_PATH, 'r', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entries.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue  # Skip a partially written line
+        except Exception as e:
+            print(f"⚠️ Could not read job history: {e}")
+    return entries
@@ -0,0 +1,97 @@
+"""
+Per-job metrics for MatchTrex pipeline runs
+Counters are collected on a JobMetrics object bound to the running job via a context variable
+"""
+
+import threading
+import uuid
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+class JobMetrics:
+    """Thread-safe counters for one pipeline run, grouped into named sections"""
+
+    def __init__(self, job_id: Optional[str] = None):
+        self.job_id = job_id
+        self._lock = threading.Lock()
+        self._sections: Dict[str, Dict[str, float]] = {}
+        self._llm_usage: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+    def increment(self, section: str, key: str, amount: float = 1) -> None:
+        """Add amount to a counter, creating section and counter on first use"""
+        with self._lock:
+            counters = self._sections.setdefault(section, {})
+            counters[key] = counters.get(key, 0) + amount
+
+    def get(self, section: str, key: str, default: float = 0) -> float:
+        """Read a single counter"""
+        with self._lock:
+            return self._sections.get(section, {}).get(key, default)
+
+    def record_llm_call(self, stage: str, model: str, prompt_tokens: int, completion_tokens: int,
+                        latency_ms: float, cost_eur: float, error: bool = False) -> None:
+        """Roll one LLM call into the per-(stage, model) usage totals"""
+        with self._lock:
+            totals = self._llm_usage.setdefault((stage, model), {
+                'calls': 0, 'errors': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                'latency_ms': 0.0, 'cost_eur': 0.0
+            })
+            totals['calls'] += 1
+            totals['errors'] += 1 if error else 0
+            totals['prompt_tokens'] += prompt_tokens
+            totals['completion_tokens'] += completion_tokens
+            totals['latency_ms'] += latency_ms
+            totals['cost_eur'] += cost_eur
+
+    def total_llm_tokens(self) -> int:
+        """Prompt + completion tokens spent by this job so far"""
+        with self._lock:
+            return int(sum(t['prompt_tokens'] + t['completion_tokens'] for t in self._llm_usage.values()))
+
+    def llm_usage_summary(self) -> Dict:
+        """Token, latency and cost totals for the job, overall and per stage and model"""
+        def rollup(rows):
+            summary = {'calls': 0, 'errors': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'latency_ms': 0.0, 'cost_eur': 0.0}
+            for row in rows:
+                for key in summary:
+                    summary[key] += row[key]
+            summary['total_tokens'] = summary['prompt_tokens'] + summary['completion_tokens']
+            summary['avg_latency_ms'] = round(summary['latency_ms'] / summary['calls'], 1) if summary['calls'] else 0.0
+            summary['latency_ms'] = round(summary['latency_ms'], 1)
+            summary['cost_eur'] = round(summary['cost_eur'], 6)
+            return summary
+
+        with self._lock:
+            items = [(key, dict(totals)) for key, totals in self._llm_usage.items()]
+
+        stages = sorted({stage for (stage, _), _ in items})
+        models = sorted({model for (_, model), _ in items})
+        return {
+            'total': rollup([totals for _, totals in items]),
+            'by_stage': {stage: rollup([t for (s, _), t in items if s == stage]) for stage in stages},
+            'by_model': {model: rollup([t for (_, m), t in items if m == model]) for model in models}
+        }
+
+    def to_dict(self) -> Dict:
+        """Snapshot of all sections, suitable for storing in job results"""
+        with self._lock:
+            return {section: dict(counters) for section, counters in self._sections.items()}
+
+# Metrics of the job running in the current thread/task
+_current_metrics: ContextVar[Optional[JobMetrics]] = ContextVar("job_metrics", default=None)
+
+def start_job_metrics(job_id: Optional[str] = None) -> JobMetrics:
+    """Create a fresh JobMetrics object and bind it to the current context (random job id if none given)"""
+    metrics = JobMetrics(job_id or uuid.uuid4().hex)
+    _current_metrics.set(metrics)
+    return metrics
+
+def get_job_metrics() -> Optional[JobMetrics]:
+    """Get the JobMetrics bound to the current context, if any"""
+    return _current_metrics.get()
+
+def record_metric(section: str, key: str, amount: float = 1) -> None:
+    """Increment a counter on the current job's metrics (no-op outside a job)"""
+    metrics = _current_metrics.get()
+    if metrics:
+        metrics.increment(section, key, amount)
@@ -0,0 +1,149 @@
+"""
+Structured progress for MatchTrex pipeline runs
+Per-stage done/total/failed counts, throughput and a moving-average ETA, updated by the
+pipeline engine as items pass through its stages
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Weight of the newest completion interval in the moving average
+ETA_SMOOTHING = 0.2
+
+class StageProgress:
+    """Counters of one stage; 'done' includes failed items"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.expected: Optional[int] = None  # Announced total (e.g. CVs to download)
+        self.received = 0
+        self.done = 0
+        self.failed = 0
+        self.dropped = 0  # Drained without processing after the stage was stopped
+        self.closed = False
+        self.started_at: Optional[float] = None
+        self.last_done_at: Optional[float] = None
+        self.avg_interval: Optional[float] = None  # Moving average of seconds between completions
+
+class JobProgress:
+    """Thread-safe progress of one job's stages, in pipeline order"""
+
+    def __init__(self, stage_names: Optional[List[str]] = None):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageProgress] = {}
+        self.started_at = time.time()
+        for name in stage_names or []:
+            self._stages[name] = StageProgress(name)
+
+    def _stage(self, name: str) -> StageProgress:
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages[name] = StageProgress(name)
+        return stage
+
+    def register(self, stage_names: List[str]) -> None:
+        """Declare the stages in pipeline order (keeps counters of stages already known)"""
+        with self._lock:
+            stages = {name: self._stages.get(name) or StageProgress(name) for name in stage_names}
+            stages.update({name: stage for name, stage in self._stages.items() if name not in stages})
+            self._stages = stages
+
+    def expect(self, stage: str, total: int) -> None:
+        """Announce how many items a stage will receive"""
+        with self._lock:
+            self._stage(stage).expected = total
+
+    def received(self, stage: str, count: int = 1) -> None:
+        with self._lock:
+            self._stage(stage).received += count
+
+    def finished(self, stage: str, count: int = 1, failed: bool = False) -> None:
+        """Count processed items and update the stage's completion rate"""
+        now = time.time()
+        with self._lock:
+            progress = self._stage(stage)
+            progress.done += count
+            progress.failed += count if failed else 0
+            if progress.last_done_at is not None:
+                interval = (now - progress.last_done_at) / count
+                if progress.avg_interval is None:
+                    progress.avg_interval = interval
+                else:
+                    progress.avg_interval += ETA_SMOOTHING * (interval - progress.avg_interval)
+            elif progress.started_at is not None:
+                progress.avg_interval = (now - progress.started_at) / count
+            progress.last_done_at = now
+
+    def fail(self, stage: str, count: int = 1) -> None:
+        """Mark already counted items as failed (stages that handle failures themselves)"""
+        with self._lock:
+            self._stage(stage).failed += count
+
+    def started(self, stage: str) -> None:
+        with self._lock:
+            progress = self._stage(stage)
+            if progress.started_at is None:
+                progress.started_at = time.time()
+
+    def dropped(self, stage: str, count: int = 1) -> None:
+        with self._lock:
+            self._stage(stage).dropped += count
+
+    def closed(self, stage: str) -> None:
+        """All workers of the stage are done"""
+        with self._lock:
+            self._stage(stage).closed = True
+
+    def snapshot(self) -> Dict:
+        """
+        Per-stage counts, throughput and ETA plus the job's ETA (the slowest remaining stage).
+        A stage's total is its announced or received item count; while its upstream is still
+        running, the items upstream has left are added at the stage's observed pass-through rate.
+        """
+        now = time.time()
+        with self._lock:
+            stages, eta, upstream = {}, 0.0, None
+            for progress in self._stages.values():
+                total = progress.expected if progress.expected is not None else progress.received
+                if upstream is not None and not progress.closed and progress.expected is None:
+                    upstream_left = max(0, upstream['total'] - upstream['done'] - upstream['dropped'])
+                    pass_rate = progress.received / upstream['done'] if upstream['done'] else 1.0
+                    total += round(upstream_left * min(1.0, pass_rate))
+                total = max(total, progress.done + progress.dropped)
+                remaining = 0 if progress.closed else total - progress.done - progress.dropped
+
+                elapsed = (progress.last_done_at or now) - progress.started_at if progress.started_at else 0
+                stage_eta = None
+                if remaining == 0:
+                    stage_eta = 0.0
+                elif progress.avg_interval is not None:
+                    stage_eta = remaining * progress.avg_interval
+                if stage_eta is not None:
+                    eta = max(eta, stage_eta)
+
+                stages[progress.name] = upstream = {
+                    'status': "done" if progress.closed else "running" if progress.started_at else "pending",
+                    'done': progress.done,
+                    'total': total,
+                    'failed': progress.failed,
+                    'dropped': progress.dropped,
+                    'per_minute': round(progress.done * 60 / elapsed, 2) if elapsed > 0 else None,
+                    'eta_s': round(stage_eta) if stage_eta is not None else None
+                }
+
+            return {
+                'elapsed_s': round(now - self.started_at),
+                'eta_s': round(eta) if stages else None,
+                'stages': stages
+            }
+
+    def compact(self) -> Dict:
+        """Small form for the Supabase progress column: [done, total, failed] per stage and the ETA"""
+        snapshot = self.snapshot()
+        return {
+            'stages': {name: [stage['done'], stage['total'], stage['failed']]
+                       for name, stage in snapshot['stages'].items()},
+            'eta_s': snapshot['eta_s'],
+            'elapsed_s': snapshot['elapsed_s']
+        }
@@ -0,0 +1,307 @@
+"""
+Durable job queue for MatchTrex
+Search jobs are stored in SQLite (one host) or a shared Postgres database (JOB_QUEUE_URL, several
+hosts) and claimed by a fixed number of pipeline workers per process, highest priority first. A claimed job stays invisible to other workers for a visibility timeout that
+its worker keeps extending; if the worker dies, the job becomes claimable again.
+Jobs with the same search fingerprint coalesce: later ones follow the first instead of running.
+The queue is shared by every process using the same database: workers report each job's
+status into it and pick up cancellation requests from it, so the API does not need to run them.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import JOB_QUEUE_DB_PATH, JOB_QUEUE_URL, JOB_MAX_ATTEMPTS
+from db_backend import Database
+
+# Job states; "queued" and "running" jobs are active, "coalesced" jobs wait for their leader's results
+QUEUE_STATES = ("queued", "running", "completed", "failed", "cancelled", "coalesced")
+
+class JobQueue:
+    """
+    Priority queue with claiming and visibility timeouts, on a SQLite file path or a Postgres URL.
+    On Postgres, workers on different hosts skip each other's locked rows while claiming.
+    """
+
+    def __init__(self, target: str, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.target = target
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        self._db = Database(target)
+        self._ready = False
+
+    def _connect(self) -> Database:
+        """Open the database once and create the table"""
+        if not self._ready:
+            db = self._db
+            db.execute(f"""
+                CREATE TABLE IF NOT EXISTS queue_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    ref TEXT,
+                    payload TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    visible_at {db.float_type} NOT NULL,
+                    claimed_by TEXT,
+                    fingerprint TEXT,
+                    leader_id TEXT,
+                    report TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )""")
+            db.add_missing_columns("queue_jobs", {
+                "fingerprint": "TEXT", "leader_id": "TEXT", "report": "TEXT",
+                "cancel_requested": "INTEGER NOT NULL DEFAULT 0"
+            })
+            db.execute("CREATE INDEX IF NOT EXISTS queue_jobs_claim_idx ON queue_jobs(status, priority DESC, created_at)")
+            db.execute("CREATE INDEX IF NOT EXISTS queue_jobs_fingerprint_idx ON queue_jobs(fingerprint)")
+            db.execute("CREATE INDEX IF NOT EXISTS queue_jobs_leader_idx ON queue_jobs(leader_id)")
+            db.execute("CREATE INDEX IF NOT EXISTS queue_jobs_ref_idx ON queue_jobs(ref)")
+            self._ready = True
+        return self._db
+
+    @staticmethod
+    def _decode(row) -> Optional[Dict]:
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['report'] = json.loads(job['report']) if job.get('report') else None
+        return job
+
+    def enqueue(self, job_id: str, kind: str, payload: Dict, priority: int = 0, ref: Optional[str] = None) -> None:
+        """Add a job; ref identifies what it works on (e.g. the Supabase search id)"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._connect().execute(
+                """INSERT INTO queue_jobs (job_id, kind, ref, payload, priority, status, visible_at, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)""",
+                (job_id, kind, ref, json.dumps(payload, ensure_ascii=False), priority, time.time(), now, now)
+            )
+
+    def claim(self, worker_id: str, visibility_timeout: float) -> Optional[Dict]:
+        """
+        Take the next visible job (queued, or running with an expired visibility timeout) and hide it
+        for visibility_timeout seconds. Jobs that were already tried max_attempts times are failed instead.
+        """
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            with db.transaction():
+                db.execute(
+                    """UPDATE queue_jobs SET status = 'failed', error = 'Worker lost too often', updated_at = ?
+                       WHERE status = 'running' AND visible_at <= ? AND attempts >= ?""",
+                    (datetime.now().isoformat(), now, self.max_attempts)
+                )
+                # Followers of a leader that ended without results run on their own
+                db.execute(
+                    """UPDATE queue_jobs SET status = 'queued', leader_id = NULL, attempts = 0, visible_at = ?, updated_at = ?
+                       WHERE status = 'coalesced' AND leader_id IN
+                             (SELECT job_id FROM queue_jobs WHERE status IN ('failed', 'cancelled'))""",
+                    (now, datetime.now().isoformat())
+                )
+                # Workers on other hosts skip the row this one is claiming instead of waiting for it
+                row = db.execute(
+                    """SELECT job_id FROM queue_jobs
+                       WHERE status IN ('queued', 'running') AND visible_at <= ?
+                       ORDER BY priority DESC, created_at LIMIT 1""" + (" FOR UPDATE SKIP LOCKED" if db.postgres else ""),
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    return None
+                db.execute(
+                    """UPDATE queue_jobs SET status = 'running', attempts = attempts + 1, visible_at = ?,
+                                             claimed_by = ?, updated_at = ?
+                       WHERE job_id = ?""",
+                    (now + visibility_timeout, worker_id, datetime.now().isoformat(), row['job_id'])
+                )
+                job = db.execute("SELECT * FROM queue_jobs WHERE job_id = ?", (row['job_id'],)).fetchone()
+        return self._decode(job)
+
+    def heartbeat(self, job_id: str, worker_id: str, visibility_timeout: float) -> bool:
+        """Extend a claimed job's visibility timeout; False if the worker no longer holds the claim"""
+        with self._lock:
+            cursor = self._connect().execute(
+                """UPDATE queue_jobs SET visible_at = ?, updated_at = ?
+                   WHERE job_id = ? AND claimed_by = ? AND status = 'running'""",
+                (time.time() + visibility_timeout, datetime.now().isoformat(), job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that no worker has claimed yet (or a follower); False if it is neither"""
+        with self._lock:
+            cursor = self._connect().execute(
+                """UPDATE queue_jobs SET status = 'cancelled', updated_at = ?
+                   WHERE job_id = ? AND status IN ('queued', 'coalesced')""",
+                (datetime.now().isoformat(), job_id)
+            )
+        return cursor.rowcount == 1
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Ask the worker running a job to cancel it; False if it is not running"""
+        with self._lock:
+            cursor = self._connect().execute(
+                "UPDATE queue_jobs SET cancel_requested = 1, updated_at = ? WHERE job_id = ? AND status = 'running'",
+                (datetime.now().isoformat(), job_id)
+            )
+        return cursor.rowcount == 1
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT cancel_requested FROM queue_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def report(self, job_id: str, status: Dict) -> None:
+        """Store the job's latest status (as shown by the API) for other processes"""
+        with self._lock:
+            self._connect().execute(
+                "UPDATE queue_jobs SET report = ? WHERE job_id = ?",
+                (json.dumps(status, ensure_ascii=False, default=str), job_id)
+            )
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        """Set a job's final status ('completed', 'failed' or 'cancelled')"""
+        with self._lock:
+            self._connect().execute(
+                "UPDATE queue_jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, datetime.now().isoformat(), job_id)
+            )
+
+    def coalesce(self, job_id: str, fingerprint: str, window_s: float) -> Optional[Dict]:
+        """
+        Find the leader for a job that is about to run: another job with the same fingerprint that is
+        queued, running, or completed less than window_s ago. If there is one, the job becomes its
+        follower (status 'coalesced') and the leader is returned; otherwise the job takes the
+        fingerprint itself and None is returned. Atomic, so of two identical jobs only one runs.
+        A released follower keeps its fingerprint and is not coalesced again.
+        """
+        now = datetime.now()
+        with self._lock:
+            db = self._connect()
+            with db.transaction():
+                db.lock_key(fingerprint)
+                own = db.execute("SELECT fingerprint FROM queue_jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if own is not None and own['fingerprint'] is not None:
+                    return None
+                leader = db.execute(
+                    """SELECT * FROM queue_jobs
+                       WHERE fingerprint = ? AND job_id != ? AND leader_id IS NULL
+                         AND (status IN ('queued', 'running') OR (status = 'completed' AND updated_at >= ?))
+                       ORDER BY status = 'completed', created_at LIMIT 1""",
+                    (fingerprint, job_id, datetime.fromtimestamp(now.timestamp() - window_s).isoformat())
+                ).fetchone()
+                if leader is None:
+                    db.execute(
+                        "UPDATE queue_jobs SET fingerprint = ?, updated_at = ? WHERE job_id = ?",
+                        (fingerprint, now.isoformat(), job_id)
+                    )
+                else:
+                    db.execute(
+                        """UPDATE queue_jobs SET fingerprint = ?, leader_id = ?, status = 'coalesced', updated_at = ?
+                           WHERE job_id = ?""",
+                        (fingerprint, leader['job_id'], now.isoformat(), job_id)
+                    )
+        return self._decode(leader)
+
+    def followers(self, leader_id: str) -> List[Dict]:
+        """Jobs waiting for leader_id's results"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT * FROM queue_jobs WHERE leader_id = ? AND status = 'coalesced' ORDER BY created_at",
+                (leader_id,)
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def release_followers(self, leader_id: str, job_id: Optional[str] = None) -> int:
+        """
+        Put the followers of a leader that did not complete (or only job_id) back in the queue to
+        run on their own
+        """
+        with self._lock:
+            cursor = self._connect().execute(
+                """UPDATE queue_jobs SET status = 'queued', leader_id = NULL, attempts = 0, visible_at = ?, updated_at = ?
+                   WHERE leader_id = ? AND status = 'coalesced' AND (? IS NULL OR job_id = ?)""",
+                (time.time(), datetime.now().isoformat(), leader_id, job_id, job_id)
+            )
+        return cursor.rowcount
+
+    def release(self, job_id: str, worker_id: str) -> bool:
+        """
+        Hand a claimed job back to the queue at once (e.g. on shutdown) instead of letting its claim lapse.
+        Its attempt count is kept, so the next claim runs it as a resume (from its checkpoint if that
+        worker can read it - see CHECKPOINT_DB_URL - otherwise from the start).
+        """
+        with self._lock:
+            cursor = self._connect().execute(
+                """UPDATE queue_jobs SET status = 'queued', visible_at = ?, claimed_by = NULL, updated_at = ?
+                   WHERE job_id = ? AND claimed_by = ? AND status = 'running'""",
+                (time.time(), datetime.now().isoformat(), job_id, worker_id)
+            )
+        return cursor.rowcount == 1
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM queue_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._decode(row)
+
+    def latest_for(self, ref: str) -> Optional[Dict]:
+        """Most recent job working on ref (or with ref as its own job id), in any status"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT * FROM queue_jobs WHERE ref = ? OR job_id = ? ORDER BY created_at DESC LIMIT 1", (ref, ref)
+            ).fetchone()
+        return self._decode(row)
+
+    def active_for(self, ref: str) -> List[Dict]:
+        """Queued, running or coalesced jobs working on ref"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT * FROM queue_jobs WHERE ref = ? AND status IN ('queued', 'running', 'coalesced')", (ref,)
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Number of queued jobs that will be claimed before this one (None unless it is queued)"""
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT priority, created_at FROM queue_jobs WHERE job_id = ? AND status = 'queued'", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            return db.execute(
+                """SELECT COUNT(*) AS ahead FROM queue_jobs WHERE status = 'queued'
+                   AND (priority > ? OR (priority = ? AND created_at < ?))""",
+                (row['priority'], row['priority'], row['created_at'])
+            ).fetchone()['ahead']
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per state"""
+        with self._lock:
+            rows = self._connect().execute("SELECT status, COUNT(*) AS jobs FROM queue_jobs GROUP BY status").fetchall()
+        counts = {state: 0 for state in QUEUE_STATES}
+        counts.update({row['status']: row['jobs'] for row in rows})
+        return counts
+
+# Global queue instance (created lazily)
+_job_queue: Optional[JobQueue] = None
+_queue_init_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """Get the shared job queue (Postgres if JOB_QUEUE_URL is set, otherwise the local SQLite file)"""
+    global _job_queue
+
+    with _queue_init_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(JOB_QUEUE_URL or JOB_QUEUE_DB_PATH)
+    return _job_queue
@@ -0,0 +1,427 @@
+"""
+Mistral API client for MatchTrex
+Single entry point for the chat completion calls made by the pipeline
+"""
+
+import contextvars
+import json
+import os
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import MISTRAL_PRICES_EUR_PER_M
+from config import LLM_HEDGING_ENABLED, LLM_HEDGE_BUDGET_FRACTION, LLM_HEDGE_MIN_SAMPLES, LLM_RATE_LIMIT_RPS
+from config import JOB_WORKERS, PIPELINE_EXTRACT_WORKERS, PIPELINE_EVALUATE_WORKERS, PROMPT_AB_WORKERS, REPLAY_WORKERS
+from job_metrics import get_job_metrics, JobMetrics
+
+# Constants - Load from environment variables
+MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "83pVv0mVbOBUwSRmoPBaWg6UUkNZunTP")  # Fallback to hardcoded
+MISTRAL_API_URL = "https://api.mistral.ai/v1/chat/completions"
+
+# Recent successful call latencies per stage (ms), used for the hedging threshold
+_stage_latencies: Dict[str, deque] = {}
+_latency_lock = threading.Lock()
+
+# Threads that make LLM calls at the same time: the pipelines' extract and evaluate workers plus replays and A/B runs
+_LLM_CALLERS = max(1, JOB_WORKERS) * (PIPELINE_EXTRACT_WORKERS + PIPELINE_EVALUATE_WORKERS) + REPLAY_WORKERS + PROMPT_AB_WORKERS
+
+# Threads for hedged calls (primary + duplicate run side by side)
+_hedge_executor = ThreadPoolExecutor(max_workers=2 * _LLM_CALLERS, thread_name_prefix="llm-hedge")
+
+# Cancellation - calls made inside a cancel scope give up as soon as its event is set
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("llm_cancel_event", default=None)
+_call_executor = ThreadPoolExecutor(max_workers=_LLM_CALLERS, thread_name_prefix="llm-call")
+
+class LLMCallCancelled(Exception):
+    """The job that made the call was cancelled"""
+
+@contextmanager
+def cancel_scope(event: threading.Event) -> Iterator[None]:
+    """Make the LLM calls of the current context (and contexts copied from it) cancellable via event"""
+    token = _cancel_event.set(event)
+    try:
+        yield
+    finally:
+        _cancel_event.reset(token)
+
+def _check_cancelled() -> None:
+    event = _cancel_event.get()
+    if event is not None and event.is_set():
+        raise LLMCallCancelled()
+
+class _CallAbort:
+    """
+    The connections of one LLM call (and of its hedged legs). abort() shuts their sockets down, so a
+    request blocked on the network fails at once instead of being generated and billed to the end.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._members = []  # urllib3 connections and child aborts
+        self.aborted = False
+
+    def _add(self, member) -> None:
+        with self._lock:
+            if self.aborted:
+                raise LLMCallCancelled()
+            self._members.append(member)
+
+    def child(self) -> "_CallAbort":
+        """Abort for part of the call (e.g. one hedged request) that can also be aborted on its own"""
+        child = _CallAbort()
+        self._add(child)
+        return child
+
+    def session(self) -> requests.Session:
+        """New session whose connections belong to this call"""
+        session = requests.Session()
+        adapter = _AbortableAdapter(self._add)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def abort(self) -> None:
+        with self._lock:
+            self.aborted = True
+            members = list(self._members)
+        for member in members:
+            if isinstance(member, _CallAbort):
+                member.abort()
+                continue
+            sock = getattr(member, 'sock', None)
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass  # Already closed
+
+class _AbortableAdapter(HTTPAdapter):
+    """Transport adapter that hands every connection it opens to register (see _CallAbort)"""
+
+    def __init__(self, register: Callable):
+        self._register = register
+        super().__init__()
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        register = self._register
+
+        def tracking(pool_class):
+            class TrackingPool(pool_class):
+                def _new_conn(self):
+                    connection = super()._new_conn()
+                    register(connection)
+                    return connection
+            return TrackingPool
+
+        manager = self.poolmanager
+        manager.pool_classes_by_scheme = {scheme: tracking(pool_class)
+                                          for scheme, pool_class in manager.pool_classes_by_scheme.items()}
+
+# Abort of the cancellable call running in the current context (None outside a cancel scope)
+_call_abort: ContextVar[Optional[_CallAbort]] = ContextVar("llm_call_abort", default=None)
+
+def _new_session() -> requests.Session:
+    """Session for one request; inside a cancellable call its connections can be aborted"""
+    abort = _call_abort.get()
+    return abort.session() if abort else requests.Session()
+
+def _call_cancellable(function: Callable, *args):
+    """
+    Run a blocking request so the caller is released once the cancel event is set.
+    On cancel the request's sockets are shut down, so the API stops generating (and billing) it.
+    """
+    event = _cancel_event.get()
+    if event is None:
+        return function(*args)
+    _check_cancelled()
+    abort = _CallAbort()
+    context = contextvars.copy_context()
+    context.run(_call_abort.set, abort)
+    future = _call_executor.submit(context.run, function, *args)
+    while True:
+        done, _ = wait([future], timeout=0.25)
+        if done:
+            return future.result()
+        if event.is_set():
+            future.cancel()
+            abort.abort()
+            raise LLMCallCancelled()
+
+class RateLimiter:
+    """Process-wide cap on request starts per second, shared by all threads (0 = unlimited)"""
+
+    def __init__(self, requests_per_second: float = 0):
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+        self.set_rate(requests_per_second)
+
+    def set_rate(self, requests_per_second: float) -> None:
+        self.interval = 1.0 / requests_per_second if requests_per_second and requests_per_second > 0 else 0.0
+
+    def acquire(self) -> None:
+        """Block until the caller's evenly spaced start slot"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+_rate_limiter = RateLimiter(LLM_RATE_LIMIT_RPS)
+
+def set_llm_rate_limit(requests_per_second: float) -> None:
+    """Change the shared request rate limit (0 disables it)"""
+    _rate_limiter.set_rate(requests_per_second)
+
+def estimate_cost_eur(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated cost of one call in EUR from the configured per-million-token prices"""
+    prices = MISTRAL_PRICES_EUR_PER_M.get(model)
+    if not prices:
+        return 0.0
+    input_price, output_price = prices
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+def record_llm_usage(stage: str, model: str, usage: Dict, latency_ms: float, error: bool = False) -> None:
+    """Add one call's tokens, latency and cost to the current job's usage accounting"""
+    metrics = get_job_metrics()
+    if not metrics:
+        return
+    metrics.record_llm_call(
+        stage=stage,
+        model=model,
+        prompt_tokens=usage.get('prompt_tokens', 0),
+        completion_tokens=usage.get('completion_tokens', 0),
+        latency_ms=latency_ms,
+        cost_eur=estimate_cost_eur(model, usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0)),
+        error=error
+    )
+
+def observe_latency(stage: str, latency_ms: float) -> None:
+    """Remember the latency of a successful call for the stage's percentile"""
+    with _latency_lock:
+        _stage_latencies.setdefault(stage, deque(maxlen=200)).append(latency_ms)
+
+def stage_latency_percentile(stage: str, percentile: float = 0.9) -> Optional[float]:
+    """Latency percentile (ms) of recent calls in a stage, None until enough calls were observed"""
+    with _latency_lock:
+        samples = sorted(_stage_latencies.get(stage, ()))
+    if len(samples) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return samples[min(len(samples) - 1, int(percentile * len(samples)))]
+
+def _post_completion(payload: Dict, stage: str, timeout: int, api_key: Optional[str],
+                     started: Optional[threading.Event] = None) -> Tuple[Dict, float]:
+    """
+    One accounted chat completion request. Returns (response body, latency in ms).
+    started is set once the request leaves the rate limiter.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key or MISTRAL_API_KEY}"
+    }
+
+    model = payload.get("model", "")
+    _rate_limiter.acquire()
+    if started:
+        started.set()
+    start_time = time.time()
+    try:
+        with _new_session() as session:
+            response = session.post(MISTRAL_API_URL, json=payload, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            result = response.json()
+    except Exception:
+        record_llm_usage(stage, model, {}, (time.time() - start_time) * 1000, error=True)
+        raise
+
+    latency_ms = (time.time() - start_time) * 1000
+    record_llm_usage(stage, model, get_usage(result), latency_ms)
+    observe_latency(stage, latency_ms)
+    return result, latency_ms
+
+def _hedge_allowed(metrics: Optional[JobMetrics]) -> bool:
+    """Whether another duplicate request fits in the job's extra-spend budget"""
+    if not metrics:
+        return False
+    calls = metrics.get("hedging", "calls")
+    hedges = metrics.get("hedging", "hedges")
+    return hedges + 1 <= LLM_HEDGE_BUDGET_FRACTION * calls
+
+def _expected_remaining_ms(stage: str, elapsed_ms: float) -> float:
+    """
+    Expected further latency of a call still running after elapsed_ms: the mean of the stage's recent
+    latencies above elapsed_ms, minus elapsed_ms (0 if no recent call took that long)
+    """
+    with _latency_lock:
+        slower = [latency for latency in _stage_latencies.get(stage, ()) if latency > elapsed_ms]
+    return sum(slower) / len(slower) - elapsed_ms if slower else 0.0
+
+def _hedged_completion(payload: Dict, stage: str, timeout: int, api_key: Optional[str], threshold_ms: float) -> Dict:
+    """
+    Run the request and, if it has not answered after threshold_ms, a duplicate of it;
+    return whichever succeeds first. The slower request is aborted.
+    """
+    metrics = get_job_metrics()
+    metrics.increment("hedging", "calls")
+    parent_abort = _call_abort.get()
+
+    def submit(started=None):
+        leg_abort = parent_abort.child() if parent_abort else _CallAbort()
+
+        def run():
+            _call_abort.set(leg_abort)
+            return _post_completion(payload, stage, timeout, api_key, started)
+        # Run in the caller's context so usage is accounted to the current job
+        return _hedge_executor.submit(contextvars.copy_context().run, run), leg_abort
+
+    # The threshold counts from the primary's request start, so neither waiting for a thread
+    # nor rate limiting triggers a hedge
+    primary_started = threading.Event()
+    primary, primary_abort = submit(primary_started)
+    primary_started.wait()
+    primary_started_at = time.time()
+    done, _ = wait([primary], timeout=threshold_ms / 1000)
+    if done or not _hedge_allowed(metrics):
+        return primary.result()[0]
+
+    metrics.increment("hedging", "hedges")
+    hedge, hedge_abort = submit()
+
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                error = future.exception()
+                continue
+            result, _ = future.result()
+            if future is hedge:
+                # The primary's remaining time is estimated, as it is aborted now
+                elapsed_ms = (time.time() - primary_started_at) * 1000
+                metrics.increment("hedging", "hedge_wins")
+                metrics.increment("hedging", "latency_saved_ms", round(_expected_remaining_ms(stage, elapsed_ms)))
+                primary_abort.abort()
+            else:
+                hedge_abort.abort()  # The duplicate was wasted
+            return result
+    raise error
+
+def chat_completion(payload: Dict, stage: str = "other", timeout: int = 120, api_key: Optional[str] = None) -> Dict:
+    """
+    POST a chat completion request to MistralAI and return the parsed response body.
+    Token usage, latency and cost are accounted to the current job under the given stage.
+    With hedging enabled, a call slower than the stage's p90 latency gets a duplicate request
+    (within the job's hedge budget) and the first answer wins.
+    """
+    if LLM_HEDGING_ENABLED and get_job_metrics():
+        threshold_ms = stage_latency_percentile(stage)
+        if threshold_ms is not None:
+            return _call_cancellable(_hedged_completion, payload, stage, timeout, api_key, threshold_ms)
+        get_job_metrics().increment("hedging", "calls")
+
+    return _call_cancellable(_post_completion, payload, stage, timeout, api_key)[0]
+
+def hedging_summary(metrics: JobMetrics) -> Dict:
+    """Hedge rate and latency saved for a job"""
+    calls = metrics.get("hedging", "calls")
+    hedges = metrics.get("hedging", "hedges")
+    return {
+        'calls': int(calls),
+        'hedges': int(hedges),
+        'hedge_rate': round(hedges / calls, 4) if calls else 0.0,
+        'hedge_wins': int(metrics.get("hedging", "hedge_wins")),
+        'latency_saved_ms': int(metrics.get("hedging", "latency_saved_ms"))
+    }
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for text whose usage was not reported (about 4 characters per token)"""
+    return max(1, len(text) // 4) if text else 0
+
+def _estimate_stream_usage(payload: Dict, content: str) -> Dict:
+    """Usage of a stream the API did not report it for"""
+    prompt_text = "".join(str(message.get('content', '')) for message in payload.get('messages', []))
+    return {'prompt_tokens': estimate_tokens(prompt_text), 'completion_tokens': estimate_tokens(content)}
+
+def stream_chat_completion(payload: Dict, stage: str = "other", stop_when: Optional[Callable[[str], bool]] = None,
+                           timeout: int = 120, api_key: Optional[str] = None) -> Tuple[str, Dict, bool]:
+    """
+    Stream a chat completion (server-sent events) and return (content, usage, stopped_early).
+    stop_when is called with the content received so far after every chunk; once it returns True
+    the connection is closed so the rest of the reply is neither generated nor awaited.
+    Usage of an aborted stream is not reported by the API and is estimated from the text.
+    A cancelled job closes the stream at the next chunk and raises LLMCallCancelled.
+    """
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key or MISTRAL_API_KEY}",
+        "Accept": "text/event-stream"
+    }
+
+    model = payload.get("model", "")
+    stream_payload = dict(payload, stream=True)
+    _check_cancelled()
+    _rate_limiter.acquire()
+    start_time = time.time()
+    content = ""
+    usage = {}
+    stopped_early = False
+    try:
+        with requests.post(MISTRAL_API_URL, json=stream_payload, headers=headers, timeout=timeout, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if chunk.get('usage'):
+                    usage = chunk['usage']
+                for choice in chunk.get('choices') or []:
+                    content += (choice.get('delta') or {}).get('content') or ""
+                if stop_when and stop_when(content):
+                    stopped_early = True
+                    break
+                _check_cancelled()
+    except LLMCallCancelled:
+        # The tokens streamed so far are billed
+        record_llm_usage(stage, model, _estimate_stream_usage(payload, content),
+                         (time.time() - start_time) * 1000, error=True)
+        raise
+    except Exception:
+        record_llm_usage(stage, model, {}, (time.time() - start_time) * 1000, error=True)
+        raise
+
+    if not usage:
+        usage = _estimate_stream_usage(payload, content)
+    usage = get_usage({'usage': usage})
+    record_llm_usage(stage, model, usage, (time.time() - start_time) * 1000)
+    return content.strip(), usage, stopped_early
+
+def get_message_content(result: Dict) -> str:
+    """Get the assistant message text from a chat completion response"""
+    return (result['choices'][0]['message'].get('content') or "").strip()
+
+def get_usage(result: Dict) -> Dict:
+    """Get the token usage block of a chat completion response (zeros if missing)"""
+    usage = result.get('usage') or {}
+    prompt_tokens = int(usage.get('prompt_tokens') or 0)
+    completion_tokens = int(usage.get('completion_tokens') or 0)
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': int(usage.get('total_tokens') or (prompt_tokens + completion_tokens))
+    }
@@ -1,15 +1,20 @@
 import requests
 import json
 import os
-import glob
 import smtplib
 import uuid
 import openpyxl
+import threading
+import time
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
+from llm_client import chat_completion
+from job_metrics import start_job_metrics, get_job_metrics, record_metric
+from config import PIPELINE_EVALUATE_WORKERS
+from pipeline_engine import PipelineEngine, PipelineJob, Stage
 
 def calculate_last_activity_timestamp(days_back=30):
     """
@@ -261,34 +266,15 @@ def anonymize_names(candidates):
     
     return anonymized
 
-def get_latest_json_file():
-    """
-    Find the latest response_*.json file in the current directory.
-    """
-    json_files = glob.glob("response_*.json")
-    if not json_files:
-        return None
-    
-    # Sort by modification time and return the newest
-    latest_file = max(json_files, key=os.path.getmtime)
-    return latest_file
-
 def query_mistral_ai_batch(candidates_batch, api_key, system_prompt, user_prompt):
     """
     Query MistralAI API to filter a batch of candidates.
     """
-    url = "https://api.mistral.ai/v1/chat/completions"
-    
     # Build the complete prompt with candidate data
     complete_prompt = f"""CANDIDATE DATA: {json.dumps(candidates_batch, indent=2)}
 
 {user_prompt}"""
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-    
     payload = {
         "model": "mistral-small-latest",
         "messages": [
@@ -306,60 +292,12 @@ def query_mistral_ai_batch(candidates_batch, api_key, system_prompt, user_prompt
     }
     
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        result = response.json()
+        result = chat_completion(payload, stage="batch_filter", api_key=api_key)
         return result['choices'][0]['message']['content']
     except requests.exceptions.RequestException as e:
         print(f"Error querying MistralAI: {e}")
         return None
 
-def query_mistral_ai(candidates_data, output_filename, api_key, system_prompt, user_prompt):
-    """
-    Query MistralAI API to filter candidates in batches.
-    Save results immediately to prevent data loss.
-    """
-    batch_size = 10  # Process 10 candidates at a time
-    all_filtered_urls = []
-    
-    print(f"Processing {len(candidates_data)} candidates in batches of {batch_size}")
-    
-    # Create the output file
-    with open(output_filename, 'w', encoding='utf-8') as f:
-        f.write("# Qualified Candidates - Updated in Real-time\n")
-        f.write("# Generated by MistralAI\n\n")
-    
-    for i in range(0, len(candidates_data), batch_size):
-        batch = candidates_data[i:i + batch_size]
-        batch_num = (i // batch_size) + 1
-        total_batches = (len(candidates_data) + batch_size - 1) // batch_size
-        
-        print(f"Processing batch {batch_num}/{total_batches} ({len(batch)} candidates)")
-        
-        batch_response = query_mistral_ai_batch(batch, api_key, system_prompt, user_prompt)
-        
-        if batch_response:
-            # Process batch response
-            batch_urls = process_mistral_response(batch_response)
-            if batch_urls:
-                all_filtered_urls.extend(batch_urls)
-                print(f"Batch {batch_num}: Found {len(batch_urls)} qualifying candidates")
-                
-                # Save results immediately
-                with open(output_filename, 'a', encoding='utf-8') as f:
-                    f.write(f"# Batch {batch_num} results:\n")
-                    for url in batch_urls:
-                        f.write(f"{url}\n")
-                    f.write("\n")
-                
-                print(f"Batch {batch_num}: Results saved to {output_filename}")
-            else:
-                print(f"Batch {batch_num}: No qualifying candidates found")
-        else:
-            print(f"Batch {batch_num}: Failed to get response")
-    
-    return all_filtered_urls
-
 def process_mistral_response(mistral_response):
     """
     Process MistralAI response and extract profile links.
@@ -403,63 +341,6 @@ def process_mistral_response(mistral_response):
         print(f"Error parsing MistralAI response: {e}")
         return []
 
-def filter_candidates_with_mistral(search_keywords, location, radius, params=None):
-    """
-    Main function to filter candidates using MistralAI.
-    """
-    # Load MistralAI API key from environment variable
-    api_key = os.getenv("MISTRAL_API_KEY", "83pVv0mVbOBUwSRmoPBaWg6UUkNZunTP")
-    
-    if not api_key:
-        api_key = input("Please enter your MistralAI API key: ").strip()
-        if not api_key:
-            print("Error: MistralAI API key is required")
-            return
-    
-    # Find latest JSON file
-    latest_file = get_latest_json_file()
-    if not latest_file:
-        print("No JSON files found to process")
-        return
-    
-    print(f"Processing file: {latest_file}")
-    
-    # Load candidates data
-    try:
-        with open(latest_file, 'r', encoding='utf-8') as f:
-            candidates = json.load(f)
-    except Exception as e:
-        print(f"Error loading JSON file: {e}")
-        return
-    
-    # Anonymize names using matchId
-    anonymized_candidates = anonymize_names(candidates)
-    
-    # Create timestamp for filename
-    timestamp = datetime.now().strftime("%d_%m_%Y_%H_%M_%S")
-    filename = f"filtered_contacts_mistral_ai_{timestamp}.txt"
-    
-    # Get prompts from parameters (configurable)
-    system_prompt = params.get('system_prompt', 'You are an experienced recruiter specializing in fashion retail sales positions. Your task is to evaluate candidate CVs against specific criteria and return only the profile URLs of candidates who meet ALL requirements.')
-    user_prompt = params.get('user_prompt', 'EVALUATE each candidate against these EXACT criteria:...')
-    
-    # Query MistralAI with real-time saving
-    print("Querying MistralAI for candidate filtering...")
-    filtered_links = query_mistral_ai(anonymized_candidates, filename, api_key, system_prompt, user_prompt)
-    
-    print(f"\nFiltering complete!")
-    print(f"Results saved to: {filename}")
-    print(f"Total qualified candidates found: {len(filtered_links)}")
-    
-    if len(filtered_links) == 0:
-        print("No candidates met the filtering criteria.")
-    else:
-        # Send email with the filtered results
-        send_email_with_attachment(filename, len(filtered_links), search_keywords, location, radius, params)
-        
-        # Create feedback tracking file
-        create_feedback_log(filename, filtered_links)
-
 def create_feedback_log(filename, candidate_urls):
     """
     Create a feedback log file to track unsuitable profiles for prompt improvement.
@@ -827,10 +708,177 @@ def send_email_with_attachment(filename, candidate_count, search_keywords, locat
         print(f"Error sending email: {e}")
         return False
 
+class ProfileSearchStage(Stage):
+    """Source stage: paginated Indeed search with growing radius, emits new profile cards"""
+    name = "search"
+    critical = True
+    record_seconds = False
+    
+    def process(self, job, params, emit, resource):
+        target_candidates = params['target_candidates']
+        max_radius = params['max_radius']
+        radius_increment = params['radius_increment']
+        started_at = time.time()
+        
+        radius = radius_increment
+        all_candidates = []
+        
+        while len(all_candidates) < target_candidates and not self.stopped:
+            print(f"\n=== SEARCHING RADIUS: {radius} km ===")
+            print(f"Current total candidates: {len(all_candidates)}")
+            print(f"Target: {target_candidates} candidates")
+            
+            # Use pagination to exhaust all candidates at this radius
+            radius_candidates = fetch_all_candidates_with_pagination(
+                radius, params['search_keywords'], params['resume_updated_timestamp'], 
+                params['location'], params['language'], params['country'], target_candidates, params
+            )
+            
+            if radius_candidates:
+                # Remove duplicates by checking profile URLs
+                existing_urls = {candidate.get('profileLink', '') for candidate in all_candidates}
+                new_candidates = [
+                    candidate for candidate in radius_candidates 
+                    if candidate.get('profileLink', '') not in existing_urls
+                ]
+                
+                all_candidates.extend(new_candidates)
+                print(f"Added {len(new_candidates)} new candidates from {radius}km radius")
+                print(f"Total candidates now: {len(all_candidates)}")
+                
+                # If we reached our target, break
+                if len(all_candidates) >= target_candidates:
+                    print(f"✅ Target of {target_candidates} candidates reached!")
+                    break
+            else:
+                print(f"No candidates found at {radius}km radius")
+            
+            # Increase radius and continue searching
+            radius += radius_increment
+            print(f"Expanding search radius to {radius} km...")
+            
+            # Safety limit to prevent infinite expansion
+            if radius > max_radius:
+                print(f"Maximum radius reached ({max_radius}km)")
+                break
+        
+        job.state['radius'] = radius
+        job.state['candidates_found'] = len(all_candidates)
+        record_metric("stage_seconds", "search", round(time.time() - started_at, 1))
+        if not all_candidates:
+            print("No candidates found")
+            return
+        
+        # Create timestamp for filename
+        timestamp = datetime.now().strftime("%d_%m_%Y_%H_%M_%S")
+        filename = f"response_{timestamp}.json"
+        
+        # Save only the filtered data
+        with open(filename, 'w') as f:
+            json.dump(all_candidates, f, indent=2)
+        
+        print(f"Filtered data saved to: {filename}")
+        print(f"Final result: {len(all_candidates)} candidates with {radius} km radius")
+        print("\nStarting MistralAI filtering...")
+        
+        for candidate in all_candidates:
+            emit(candidate)
+
+class BatchFilterStage(Stage):
+    """Filters anonymized profile cards with MistralAI in batches, saving qualified URLs immediately"""
+    name = "batch_filter"
+    
+    def __init__(self, output_filename, workers=1, batch_size=10):
+        super().__init__(workers=workers, batch_size=batch_size)
+        self.output_filename = output_filename
+        self._lock = threading.Lock()
+        self._batches = 0
+        
+        # Create the output file
+        with open(output_filename, 'w', encoding='utf-8') as f:
+            f.write("# Qualified Candidates - Updated in Real-time\n")
+            f.write("# Generated by MistralAI\n\n")
+    
+    def process(self, job, batch, emit, resource):
+        with self._lock:
+            self._batches += 1
+            batch_num = self._batches
+        print(f"Processing batch {batch_num} ({len(batch)} candidates)")
+        
+        params = job.params
+        batch_response = query_mistral_ai_batch(anonymize_names(batch), params['api_key'],
+                                                 params['system_prompt'], params['user_prompt'])
+        if not batch_response:
+            print(f"Batch {batch_num}: Failed to get response")
+            return
+        
+        # Process batch response
+        batch_urls = process_mistral_response(batch_response)
+        if not batch_urls:
+            print(f"Batch {batch_num}: No qualifying candidates found")
+            return
+        
+        print(f"Batch {batch_num}: Found {len(batch_urls)} qualifying candidates")
+        
+        # Save results immediately
+        with self._lock:
+            with open(self.output_filename, 'a', encoding='utf-8') as f:
+                f.write(f"# Batch {batch_num} results:\n")
+                for url in batch_urls:
+                    f.write(f"{url}\n")
+                f.write("\n")
+        print(f"Batch {batch_num}: Results saved to {self.output_filename}")
+        
+        for url in batch_urls:
+            emit(url)
+
+class ResultsMailStage(Stage):
+    """Collects qualified URLs, then mails the results file and creates the feedback log"""
+    name = "notify"
+    record_seconds = False
+    
+    def __init__(self, output_filename):
+        super().__init__()
+        self.output_filename = output_filename
+        self._urls = []
+    
+    def process(self, job, url, emit, resource):
+        self._urls.append(url)
+    
+    def finish(self, job, emit):
+        if not job.state.get('candidates_found') or job.error is not None:
+            return
+        params = job.params
+        
+        print(f"\nFiltering complete!")
+        print(f"Results saved to: {self.output_filename}")
+        print(f"Total qualified candidates found: {len(self._urls)}")
+        
+        metrics = get_job_metrics()
+        if metrics:
+            usage = metrics.llm_usage_summary()['total']
+            print(f"LLM usage: {usage['calls']} calls, {usage['total_tokens']} tokens, ~{usage['cost_eur']:.4f} EUR")
+        
+        if len(self._urls) == 0:
+            print("No candidates met the filtering criteria.")
+        else:
+            # Send email with the filtered results
+            send_email_with_attachment(self.output_filename, len(self._urls), params['search_keywords'],
+                                       params['location'], job.state['radius'], params)
+            
+            # Create feedback tracking file
+            create_feedback_log(self.output_filename, self._urls)
+        
+        for url in self._urls:
+            emit(url)
+
 if __name__ == "__main__":
     # Generate unique search ID
     search_id = str(uuid.uuid4())[:8]  # Short UUID for readability
     
+    # Account LLM usage for this run
+    start_job_metrics(search_id)
+    
     # Read search parameters from Excel
     print("📊 Reading search parameters from Excel...")
     params = read_search_parameters_from_excel()
@@ -852,13 +900,8 @@ if __name__ == "__main__":
         max_radius = 50
     
     # Hardcoded parameters (not in Excel)
-    language = "de"
-    country = "DE"
     radius_increment = 5
     
-    # Resume last updated filter (Unix timestamp in milliseconds)
-    resume_updated_timestamp = calculate_unix_timestamp_ms(resume_last_updated_days)
-    
     print(f"📋 Search Configuration:")
     print(f"   Keywords: {search_keywords}")
     print(f"   Location: {location}")
@@ -875,64 +918,27 @@ if __name__ == "__main__":
                        user_prompt=user_prompt, 
                        system_prompt=system_prompt)
     
-    radius = radius_increment
-    all_candidates = []
-    
-    while len(all_candidates) < target_candidates:
-        print(f"\n=== SEARCHING RADIUS: {radius} km ===")
-        print(f"Current total candidates: {len(all_candidates)}")
-        print(f"Target: {target_candidates} candidates")
-        
-        # Use pagination to exhaust all candidates at this radius
-        radius_candidates = fetch_all_candidates_with_pagination(
-            radius, search_keywords, resume_updated_timestamp, 
-            location, language, country, target_candidates, params
-        )
-        
-        if radius_candidates:
-            # Remove duplicates by checking profile URLs
-            existing_urls = {candidate.get('profileLink', '') for candidate in all_candidates}
-            new_candidates = [
-                candidate for candidate in radius_candidates 
-                if candidate.get('profileLink', '') not in existing_urls
-            ]
-            
-            all_candidates.extend(new_candidates)
-            print(f"Added {len(new_candidates)} new candidates from {radius}km radius")
-            print(f"Total candidates now: {len(all_candidates)}")
-            
-            # If we reached our target, break
-            if len(all_candidates) >= target_candidates:
-                print(f"✅ Target of {target_candidates} candidates reached!")
-                break
-        else:
-            print(f"No candidates found at {radius}km radius")
-        
-        # Increase radius and continue searching
-        radius += radius_increment
-        print(f"Expanding search radius to {radius} km...")
-        
-        # Safety limit to prevent infinite expansion
-        if radius > max_radius:
-            print(f"Maximum radius reached ({max_radius}km)")
-            break
-    
-    candidates = all_candidates
-    
-    if candidates:
-        # Create timestamp for filename
-        timestamp = datetime.now().strftime("%d_%m_%Y_%H_%M_%S")
-        filename = f"response_{timestamp}.json"
-        
-        # Save only the filtered data
-        with open(filename, 'w') as f:
-            json.dump(candidates, f, indent=2)
-        
-        print(f"Filtered data saved to: {filename}")
-        print(f"Final result: {len(candidates)} candidates with {radius} km radius")
-        
-        # Automatically run MistralAI filtering
-        print("\nStarting MistralAI filtering...")
-        filter_candidates_with_mistral(search_keywords, location, radius, params)
-    else:
-        print("No candidates found")
\ No newline at end of file
+    params.update({
+        'search_keywords': search_keywords,
+        'location': location,
+        'target_candidates': target_candidates,
+        'max_radius': max_radius,
+        'radius_increment': radius_increment,
+        'language': "de",
+        'country': "DE",
+        # Resume last updated filter (Unix timestamp in milliseconds)
+        'resume_updated_timestamp': calculate_unix_timestamp_ms(resume_last_updated_days),
+        'user_prompt': user_prompt,
+        'system_prompt': system_prompt,
+        'api_key': os.getenv("MISTRAL_API_KEY", "83pVv0mVbOBUwSRmoPBaWg6UUkNZunTP")
+    })
+    
+    # Search -> batch filter -> mail, with profile cards filtered while the search pages through radii
+    timestamp = datetime.now().strftime("%d_%m_%Y_%H_%M_%S")
+    output_filename = f"filtered_contacts_mistral_ai_{timestamp}.txt"
+    engine = PipelineEngine([
+        ProfileSearchStage(),
+        BatchFilterStage(output_filename, workers=PIPELINE_EVALUATE_WORKERS),
+        ResultsMailStage(output_filename)
+    ], name="profile-pipeline")
+    engine.run(PipelineJob(params), [params])
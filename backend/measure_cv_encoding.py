@@ -0,0 +1,81 @@
+"""
+Compare evaluation-prompt token counts of the verbose and compact CV encodings
+on a stored corpus of extracted CV data.
+
+Usage:
+    python measure_cv_encoding.py [PATH ...]
+
+PATH can be a .json file (a CV, a list of CVs or pipeline results with "candidates"),
+a .jsonl file (one CV or {"cv_data": ...} record per line) or a directory of such files.
+Defaults to the files in DATA_DIR.
+"""
+
+import json
+import os
+import sys
+from typing import Dict, Iterator, List
+
+from config import DATA_DIR
+from llm_client import estimate_tokens
+from mvp import format_cv_data_for_evaluation
+
+def _looks_like_cv(item) -> bool:
+    return isinstance(item, dict) and any(key in item for key in ('experience', 'skills', 'education'))
+
+def _cvs_in(item) -> Iterator[Dict]:
+    """CV dicts contained in a loaded JSON value"""
+    if isinstance(item, list):
+        for entry in item:
+            yield from _cvs_in(entry)
+    elif isinstance(item, dict):
+        if isinstance(item.get('cv_data'), dict):
+            yield item['cv_data']
+        elif isinstance(item.get('candidates'), list):
+            yield from _cvs_in(item['candidates'])
+        elif _looks_like_cv(item):
+            yield item
+
+def load_corpus(paths: List[str]) -> List[Dict]:
+    """Load every CV found in the given files/directories"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if name.endswith(('.json', '.jsonl')))
+        elif os.path.exists(path):
+            files.append(path)
+
+    corpus = []
+    for file_path in files:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                if file_path.endswith('.jsonl'):
+                    for line in f:
+                        if line.strip():
+                            corpus.extend(_cvs_in(json.loads(line)))
+                else:
+                    corpus.extend(_cvs_in(json.load(f)))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Skipping {file_path}: {e}")
+    return corpus
+
+def measure(corpus: List[Dict]) -> Dict:
+    """Estimated token totals per encoding and the relative saving"""
+    verbose = sum(estimate_tokens(format_cv_data_for_evaluation(cv, encoding="verbose")) for cv in corpus)
+    compact = sum(estimate_tokens(format_cv_data_for_evaluation(cv, encoding="compact")) for cv in corpus)
+    return {
+        'cvs': len(corpus),
+        'verbose_tokens': verbose,
+        'compact_tokens': compact,
+        'saved_tokens': verbose - compact,
+        'saving_pct': round(100 * (verbose - compact) / verbose, 1) if verbose else 0.0,
+        'verbose_avg': round(verbose / len(corpus), 1) if corpus else 0.0,
+        'compact_avg': round(compact / len(corpus), 1) if corpus else 0.0
+    }
+
+if __name__ == "__main__":
+    corpus = load_corpus(sys.argv[1:] or [DATA_DIR])
+    if not corpus:
+        print("❌ No CV data found")
+        sys.exit(1)
+    print(json.dumps(measure(corpus), indent=2))
@@ -0,0 +1,59 @@
+"""
+MinHash signatures and LSH banding for near-duplicate CV detection
+Word shingles of the cleaned CV text are hashed, MinHash estimates their Jaccard similarity
+and LSH buckets find likely duplicates without comparing every pair
+"""
+
+import hashlib
+import re
+from typing import List, Set
+
+import numpy as np
+
+SHINGLE_SIZE = 5        # words per shingle
+NUM_PERMUTATIONS = 128  # signature length
+LSH_BANDS = 16          # bands x rows = NUM_PERMUTATIONS; candidate threshold ~ (1/bands)^(1/rows) = 0.71
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.RandomState(20240601)  # fixed seed - signatures must stay comparable across runs
+_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERMUTATIONS).astype(np.uint64)
+_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERMUTATIONS).astype(np.uint64)
+
+_WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Overlapping word n-grams of the lowercased text"""
+    words = _WORD_PATTERN.findall((text or "").lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def minhash_signature(text: str) -> List[int]:
+    """MinHash signature of the text's shingles (empty list for empty text)"""
+    shingle_set = shingles(text)
+    if not shingle_set:
+        return []
+
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "big") for s in shingle_set],
+        dtype=np.uint64
+    ) % _PRIME
+    # (a * x + b) mod p for every permutation and shingle; products stay below 2^62
+    permuted = (np.outer(_A, hashes) + _B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.int64).tolist()
+
+def estimated_similarity(signature_a: List[int], signature_b: List[int]) -> float:
+    """Estimated Jaccard similarity of two signatures (fraction of equal positions)"""
+    if not signature_a or len(signature_a) != len(signature_b):
+        return 0.0
+    return float(np.mean(np.array(signature_a) == np.array(signature_b)))
+
+def lsh_band_keys(signature: List[int]) -> List[str]:
+    """Bucket keys of the signature's bands; similar signatures share at least one with high probability"""
+    if len(signature) != NUM_PERMUTATIONS:
+        return []
+    return [
+        f"{band}:" + hashlib.blake2b(str(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]).encode(), digest_size=8).hexdigest()
+        for band in range(LSH_BANDS)
+    ]
@@ -13,9 +13,11 @@ import smtplib
 import uuid
 import openpyxl
 import html
+import re
 import shutil
 import subprocess
 import threading
+import contextvars
 import asyncio
 import logging
 import random
@@ -40,9 +42,31 @@ from typing import List, Optional
 import uvicorn
 from google_sheets_service import GoogleSheetsService
 from config import get_google_sheets_id, GOOGLE_SHEETS_CREDENTIALS_PATH
+from config import STRUCTURED_OUTPUT_ENABLED, STRUCTURED_OUTPUT_MAX_REPAIRS
+from config import EVALUATION_CASCADE_ENABLED, CASCADE_FAST_MODEL, CASCADE_CONFIDENCE_THRESHOLD
+from config import CANDIDATE_RANKING_ENABLED, QUOTA_MAX_DOWNLOADS_FACTOR
+from config import PIPELINE_QUEUE_SIZE, PIPELINE_DOWNLOAD_WORKERS, PIPELINE_EXTRACT_WORKERS, PIPELINE_EVALUATE_WORKERS
+from config import HARD_CRITERIA_ENABLED, EVALUATION_STREAMING_ENABLED, CV_TOKEN_BUDGET, CV_ENCODING
+from config import CV_WORK_DIR, NEAR_DUPLICATE_WAIT_S
+from config import JOB_MAX_WALL_TIME_S, JOB_MAX_LLM_TOKENS, JOB_MAX_PAGE_LOADS
+from evaluation_cache import get_evaluation_cache, make_cache_key, hash_text
+from llm_client import MISTRAL_API_KEY, chat_completion, stream_chat_completion, get_message_content, get_usage
+from llm_client import hedging_summary, estimate_tokens, cancel_scope
+from cv_truncation import truncate_cv_text
+from structured_output import request_structured, CV_DATA_SCHEMA, EVALUATION_SCHEMA, CASCADE_EVALUATION_SCHEMA
+from structured_output import JsonValueScanner, validate_against_schema
+from job_metrics import start_job_metrics, get_job_metrics, record_metric
+from candidate_ranker import rank_candidates, build_ranking_query
+from hard_criteria import evaluate_hard_criteria, parse_hard_criteria
+from candidate_index import get_candidate_index
+from cv_store import store_cv
+from checkpoint_store import get_checkpoint_store
+from minhash import minhash_signature
+from job_history import append_job_history
+from yield_estimator import prompt_family
+from pipeline_engine import PipelineEngine, PipelineJob, Stage
 
 # Constants - Load from environment variables
-MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "83pVv0mVbOBUwSRmoPBaWg6UUkNZunTP")  # Fallback to hardcoded
 TWOCAPTCHA_KEY = os.getenv("TWOCAPTCHA_KEY", "22e969001c9ae2824614794f69230e68")  # Fallback to hardcoded
 
 # Email configuration from environment variables
@@ -51,6 +75,30 @@ EMAIL_PASS = os.getenv("EMAIL_PASS", "kxoc ajnf pked zhwp")
 SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
 SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 
+# Models used for CV data extraction and single-candidate evaluation
+EXTRACTION_MODEL = "mistral-medium-latest"
+EVALUATION_MODEL = "mistral-medium-latest"
+
+# Lenient evaluation instruction appended to every evaluation system prompt.
+# Its hash is part of the evaluation cache key, so editing the text invalidates cached verdicts.
+LENIENT_INSTRUCTION = """\nREQUIRED OUTPUT FORMAT: 
+                             ["https://resumes.indeed.com/resume/abc123", "https://resumes.indeed.com/resume/def456"]
+                             IF NO CANDIDATES QUALIFY:[]\n 
+                             No SUMMARY. NO EXPLANATION. ANALYZE AND RETURN ONLY JSON ARRAY NOW:\n
+                        
+                             \nIMPORTANT: Be lenient in your evaluation. If a candidate meets most of the requirements but is missing one or two, still consider them QUALIFIED. 
+                             Focus on potential and transferable skills rather than exact matches. If the candidate shows promise and could potentially fit the role, accept them."""
+LENIENT_INSTRUCTION_VERSION = hash_text(LENIENT_INSTRUCTION)[:16]
+
+# Appended in structured output mode, where the reply is constrained to EVALUATION_SCHEMA
+STRUCTURED_EVALUATION_INSTRUCTION = """\n\nRESPONSE FORMAT OVERRIDE: Return a JSON object {"qualified_urls": [...]}. 
+                             Put the candidate's profile URL in "qualified_urls" if they qualify, otherwise return {"qualified_urls": []}."""
+STRUCTURED_INSTRUCTION_VERSION = hash_text(LENIENT_INSTRUCTION + STRUCTURED_EVALUATION_INSTRUCTION)[:16]
+
+# Appended for the fast cascade tier, which must report how sure it is
+CASCADE_CONFIDENCE_INSTRUCTION = """\n\nAlso return "confidence": a number between 0 and 1 stating how certain you are of this decision. 
+                             Use a high value only when the candidate clearly meets or clearly fails the requirements."""
+
 # Header rotation pools for anti-detection
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
@@ -293,20 +341,75 @@ def make_indeed_request(radius, keywords, resume_updated_filter, location, offse
             print(f"Response body: {e.response.text[:1000]}")
         return None
 
-def extract_candidate_data(response):
-    """Extract candidate profile URLs from Indeed response"""
-    candidates = []
+def probe_match_count(keywords, location, radius, resume_last_updated_days=30):
+    """Total number of matching Indeed profiles for a search (one minimal request), or None"""
+    response = make_indeed_request(radius, keywords, calculate_unix_timestamp_ms(resume_last_updated_days), location, limit=1)
+    try:
+        return int(response['data']['findRCPMatches']['overallMatchCount'])
+    except (TypeError, KeyError, ValueError):
+        return None
+
+def build_profile_card_text(sourcing_profile, match=None):
+    """Flatten an Indeed profile card (titles, companies, skills, education, location, highlights) into plain text"""
+    card = sourcing_profile.get('profileCard') or {}
+    parts = []
+    
+    # The card has no headline; its first (most recent) job title serves as one
+    for exp in card.get('experiences') or []:
+        parts.append(f"{exp.get('title') or ''} {exp.get('company') or ''}")
+    for skill in card.get('skills') or []:
+        parts.append(skill.get('text') or '')
+    for credential in card.get('credentials') or []:
+        parts.append(credential.get('title') or '')
+    for edu in card.get('educations') or []:
+        parts.append(f"{edu.get('degree') or ''} {edu.get('school') or ''}")
+    parts.append((card.get('location') or {}).get('localizedValue') or '')
+    for highlight in (match or {}).get('highlights') or []:
+        parts.append(highlight.get('text') or '')
+    
+    return " ".join(part.strip() for part in parts if part and part.strip())
+
+def extract_candidate_profiles(response):
+    """Extract candidate profile URLs plus profile-card text from Indeed response"""
+    profiles = []
     try:
         matches = response['data']['findRCPMatches']['matchConnection']['matches']
         for match in matches:
             sourcing_profile = match.get('sourcingProfile', {})
             account_key = sourcing_profile.get('accountKey', '')
             if account_key:
-                resume_url = f"https://resumes.indeed.com/resume/{account_key}"
-                candidates.append(resume_url)
+                profiles.append({
+                    'url': f"https://resumes.indeed.com/resume/{account_key}",
+                    'account_key': account_key,
+                    'card_text': build_profile_card_text(sourcing_profile, match)
+                })
     except Exception as e:
         print(f"Error extracting candidates: {e}")
-    return candidates
+    return profiles
+
+def extract_candidate_data(response):
+    """Extract candidate profile URLs from Indeed response"""
+    return [profile['url'] for profile in extract_candidate_profiles(response)]
+
+def dedupe_and_rank_candidates(all_profiles, user_prompt, search_keywords=""):
+    """
+    Remove duplicate profile URLs (keeping first occurrence) and, if enabled,
+    order candidates by BM25 relevance of their profile card to the evaluation criteria.
+    """
+    unique_profiles = []
+    seen_urls = set()
+    for profile in all_profiles:
+        if profile['url'] not in seen_urls:
+            seen_urls.add(profile['url'])
+            unique_profiles.append(profile)
+    
+    if not CANDIDATE_RANKING_ENABLED or len(unique_profiles) < 2:
+        return unique_profiles
+    
+    ranked = rank_candidates(unique_profiles, build_ranking_query(user_prompt, search_keywords))
+    top_scores = ", ".join(f"{p['account_key']}={p['rank_score']}" for p in ranked[:5])
+    print(f"   Ranked {len(ranked)} candidates by profile relevance (top: {top_scores})")
+    return ranked
 
 def get_indeed_cookies():
     """Get the cookie string used in Indeed API headers"""
@@ -514,38 +617,32 @@ def extract_cv_data_with_mistral(html_content):
         print(f"❌ MISTRAL_API_KEY not found!")
         return None
 
-    # Permanent prompt for CV data extraction
-    extraction_prompt = """Extract CV data from the provided HTML content and return it in this exact JSON format:
+    cv_text = clean_cv_html(html_content)
+    if cv_text is None:
+        return None
+    
+    return extract_cv_data_from_text(cv_text)
 
-{
-  "name": "Full Name",
-  "location": "City, Country",
-  "experience": [
-    {
-      "title": "Job Title",
-      "company": "Company Name",
-      "dates": "Start Date - End Date",
-      "location": "Job Location"
-    }
-  ],
-  "skills": ["Skill1", "Skill2", "Skill3"],
-  "education": [
-    {
-      "degree": "Degree Name",
-      "institution": "Institution Name",
-      "dates": "Start Date - End Date"
-    }
-  ]
-}
+def _collapse_lines(text: str) -> str:
+    """Collapse whitespace within lines and drop empty lines"""
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
 
-If any section is missing or empty, use empty arrays [] or empty strings "". Return ONLY the JSON, no additional text."""
+def _page_text_lines(element) -> str:
+    """Text of a page element with one line per block (so section headings stay on their own line)"""
+    return _collapse_lines(element.get_text(separator="\n"))
 
-    url = "https://api.mistral.ai/v1/chat/completions"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {MISTRAL_API_KEY}"
-    }
-    
+def _phrase_pattern(phrase: str) -> str:
+    """Regex for phrase whose words may be separated by any whitespace (including line breaks)"""
+    return r"\s+".join(re.escape(word) for word in phrase.split())
+
+def _find_phrase(text: str, phrase: str) -> int:
+    """Offset of phrase in text (-1 if missing)"""
+    match = re.search(_phrase_pattern(phrase), text)
+    return match.start() if match else -1
+
+def clean_cv_html(html_content):
+    """Extract the resume text from a saved CV page and fit it into the token budget (None on error)"""
     # Extract text content from HTML for processing
     try:
         decoded_content = html.unescape(html_content)
@@ -572,21 +669,21 @@ If any section is missing or empty, use empty arrays [] or empty strings "". Ret
         # Method 1: Look for rdp-resume-container (Indeed's resume container)
         resume_container = soup.find('div', class_='rdp-resume-container')
         if resume_container:
-            cv_text = resume_container.get_text(separator=' ', strip=True)
+            cv_text = _page_text_lines(resume_container)
         
         # Method 2: Look for content between "Resume" and "Email" markers if container not found
         if not cv_text or len(cv_text) < 200:
-            full_text = soup.get_text(separator=' ', strip=True)
+            full_text = _page_text_lines(soup)
             
             # Find the start of resume content (after "Resume" keyword)
             resume_start = full_text.find("Resume")
             if resume_start != -1:
                 # Find the end of resume content (before "Email" or "Select a template")
-                resume_end = full_text.find("Email Select a template")
+                resume_end = _find_phrase(full_text, "Email Select a template")
                 if resume_end == -1:
-                    resume_end = full_text.find("Select a template")
+                    resume_end = _find_phrase(full_text, "Select a template")
                 if resume_end == -1:
-                    resume_end = full_text.find("Try Professional")
+                    resume_end = _find_phrase(full_text, "Try Professional")
                 if resume_end == -1:
                     resume_end = len(full_text)
                 
@@ -594,7 +691,7 @@ If any section is missing or empty, use empty arrays [] or empty strings "". Ret
         
         # Method 3: Fallback - get text and try to clean it
         if not cv_text or len(cv_text) < 200:
-            cv_text = soup.get_text(separator=' ', strip=True)
+            cv_text = _page_text_lines(soup)
             
             # Remove common Indeed interface text
             unwanted_phrases = [
@@ -615,13 +712,20 @@ If any section is missing or empty, use empty arrays [] or empty strings "". Ret
             ]
             
             for phrase in unwanted_phrases:
-                cv_text = cv_text.replace(phrase, "")
+                cv_text = re.sub(_phrase_pattern(phrase), "", cv_text)
             
-            # Clean up extra whitespace
-            cv_text = " ".join(cv_text.split())
+            # Clean up extra whitespace (line breaks are kept for the section split)
+            cv_text = _collapse_lines(cv_text)
         
-        # Limit text length for API call
-        cv_text = cv_text[:8000]  # Limit to prevent token overflow
+        # Fit the text into the token budget, keeping whole sections by priority.
+        # Sections are split on the line-broken text, the model gets it on one line as before
+        tokens_before = estimate_tokens(cv_text)
+        cv_text, affected_sections = truncate_cv_text(cv_text, CV_TOKEN_BUDGET)
+        if affected_sections:
+            print(f"   ✂️ CV over token budget ({tokens_before} > {CV_TOKEN_BUDGET}), dropped/shortened: {', '.join(affected_sections)}")
+            record_metric("cv_truncation", "truncated")
+            record_metric("cv_truncation", "tokens_removed", tokens_before - estimate_tokens(cv_text))
+        cv_text = " ".join(cv_text.split())
         
         # Print cleaned HTML data to console
         print(f"\n=== CLEANED CV TEXT ===")
@@ -632,22 +736,71 @@ If any section is missing or empty, use empty arrays [] or empty strings "". Ret
         print(f"Error processing HTML: {e}")
         return None
     
+    return cv_text
+
+def extract_cv_data_from_text(cv_text):
+    """Extract structured CV data from cleaned CV text using MistralAI"""
+    # Permanent prompt for CV data extraction
+    extraction_prompt = """Extract CV data from the provided HTML content and return it in this exact JSON format:
+
+{
+  "name": "Full Name",
+  "location": "City, Country",
+  "experience": [
+    {
+      "title": "Job Title",
+      "company": "Company Name",
+      "dates": "Start Date - End Date",
+      "location": "Job Location"
+    }
+  ],
+  "skills": ["Skill1", "Skill2", "Skill3"],
+  "education": [
+    {
+      "degree": "Degree Name",
+      "institution": "Institution Name",
+      "dates": "Start Date - End Date"
+    }
+  ]
+}
+
+If any section is missing or empty, use empty arrays [] or empty strings "". Return ONLY the JSON, no additional text."""
+
+    messages = [
+        {"role": "system", "content": "You are a CV data extraction specialist. Extract structured data from CV/resume content and return it in the exact JSON format requested."},
+        {"role": "user", "content": f"{extraction_prompt}\n\nCV Content:\n{cv_text}"}
+    ]
+    
+    if STRUCTURED_OUTPUT_ENABLED:
+        try:
+            cv_data, ai_response = request_structured(
+                messages, CV_DATA_SCHEMA, "cv_data", EXTRACTION_MODEL,
+                max_tokens=1500, temperature=0.1, max_repairs=STRUCTURED_OUTPUT_MAX_REPAIRS,
+                stage="extraction"
+            )
+            
+            # Print the raw MistralAI response for debugging
+            print(f"\n=== MISTRAL CV EXTRACTION RESPONSE ===")
+            print(ai_response)
+            print(f"=== END MISTRAL CV EXTRACTION RESPONSE ===\n")
+            
+            return cv_data
+            
+        except Exception as e:
+            print(f"Error extracting CV data with MistralAI: {e}")
+            return None
+    
     payload = {
-        "model": "mistral-medium-latest",
-        "messages": [
-            {"role": "system", "content": "You are a CV data extraction specialist. Extract structured data from CV/resume content and return it in the exact JSON format requested."},
-            {"role": "user", "content": f"{extraction_prompt}\n\nCV Content:\n{cv_text}"}
-        ],
+        "model": EXTRACTION_MODEL,
+        "messages": messages,
         "max_tokens": 1500,
         "temperature": 0.1
     }
     
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        result = response.json()
+        result = chat_completion(payload, stage="extraction")
         
-        ai_response = result['choices'][0]['message']['content'].strip()
+        ai_response = get_message_content(result)
         
         # Print the raw MistralAI response for debugging
         print(f"\n=== MISTRAL CV EXTRACTION RESPONSE ===")
@@ -667,71 +820,219 @@ If any section is missing or empty, use empty arrays [] or empty strings "". Ret
             
         except json.JSONDecodeError:
             print(f"Error parsing JSON from MistralAI response: {ai_response}")
+            record_metric("structured_output", "parse_failures")
+            record_metric("structured_output", "wasted_tokens", get_usage(result)['total_tokens'])
             return None
             
     except Exception as e:
         print(f"Error extracting CV data with MistralAI: {e}")
         return None
 
-def evaluate_candidate_with_mistral(cv_data, profile_url, system_prompt, user_prompt):
-    """Evaluate single candidate using MistralAI"""
-    url = "https://api.mistral.ai/v1/chat/completions"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {MISTRAL_API_KEY}"
-    }
+def run_evaluation_call(messages, model, profile_url, schema=None, stage="evaluation"):
+    """
+    Run one evaluation request against a model.
+    Returns (is_accepted, ai_response, verdict) where verdict is the parsed structured reply (or None).
+    Raises on HTTP errors and on structured replies that could not be validated.
+    """
+    if EVALUATION_STREAMING_ENABLED:
+        decision = run_streaming_evaluation_call(messages, model, profile_url, schema, stage)
+        if decision is not None:
+            return decision
     
-    # Format CV data for evaluation
-    formatted_cv = format_cv_data_for_evaluation(cv_data)
+    if schema is not None:
+        verdict, ai_response = request_structured(
+            messages, schema, "evaluation", model,
+            max_tokens=1000, temperature=0.1, max_repairs=STRUCTURED_OUTPUT_MAX_REPAIRS,
+            stage=stage
+        )
+        if verdict is None:
+            raise ValueError(f"No valid evaluation verdict from {model}")
+        
+        # Accepted only if the model returned this candidate's URL
+        qualified_urls = [str(u).strip().rstrip('/') for u in verdict['qualified_urls']]
+        return profile_url.rstrip('/') in qualified_urls, ai_response, verdict
     
-    # Add lenient evaluation instruction
-    lenient_instruction = """\nREQUIRED OUTPUT FORMAT: 
-                             ["https://resumes.indeed.com/resume/abc123", "https://resumes.indeed.com/resume/def456"]
-                             IF NO CANDIDATES QUALIFY:[]\n 
-                             No SUMMARY. NO EXPLANATION. ANALYZE AND RETURN ONLY JSON ARRAY NOW:\n
-                        
-                             \nIMPORTANT: Be lenient in your evaluation. If a candidate meets most of the requirements but is missing one or two, still consider them QUALIFIED. 
-                             Focus on potential and transferable skills rather than exact matches. If the candidate shows promise and could potentially fit the role, accept them."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": 1000,
+        "temperature": 0.1
+    }
+    result = chat_completion(payload, stage=stage)
+    ai_response = get_message_content(result)
+    
+    # Check if candidate is accepted (looking for the profile URL in response)
+    is_accepted = profile_url in ai_response or "PASS" in ai_response.upper()
+    return is_accepted, ai_response, None
 
+def run_streaming_evaluation_call(messages, model, profile_url, schema=None, stage="evaluation"):
+    """
+    Streaming variant of run_evaluation_call: decides as soon as the verdict array/object
+    has closed and aborts the rest of the reply.
+    Returns (is_accepted, ai_response, verdict), or None if the streamed reply held no usable
+    verdict (the caller then falls back to a regular request).
+    """
     payload = {
-        "model": "mistral-medium-latest",
-        "messages": [
-            {"role": "system", "content": system_prompt + lenient_instruction},
-            {"role": "user", "content": f"{user_prompt}\n\nCandidate CV:\n{formatted_cv}\n\nProfile URL: {profile_url}"}
-        ],
+        "model": model,
+        "messages": messages,
         "max_tokens": 1000,
         "temperature": 0.1
     }
+    if schema is not None:
+        payload["response_format"] = {
+            "type": "json_schema",
+            "json_schema": {"name": "evaluation", "schema": schema, "strict": True}
+        }
+    
+    start_time = time.time()
+    scanner = JsonValueScanner()  # Reads each streamed chunk once
+    content, usage, stopped_early = stream_chat_completion(
+        payload, stage=stage, stop_when=lambda text: scanner.scan(text) is not None
+    )
+    record_metric("streaming", "calls")
+    record_metric("streaming", "latency_ms", round((time.time() - start_time) * 1000))
+    record_metric("streaming", "completion_tokens", usage['completion_tokens'])
+    if stopped_early:
+        record_metric("streaming", "early_stops")
+    
+    verdict = scanner.scan(content)
+    if schema is not None:
+        if verdict is None or validate_against_schema(verdict, schema):
+            print(f"   ⚠️ Streamed verdict unusable, retrying without streaming")
+            record_metric("streaming", "fallbacks")
+            return None
+        qualified_urls = [str(u).strip().rstrip('/') for u in verdict['qualified_urls']]
+        return profile_url.rstrip('/') in qualified_urls, content, verdict
+    
+    if not isinstance(verdict, list):
+        # Free-text reply without a JSON array - judge it the same way as a full reply
+        return profile_url in content or "PASS" in content.upper(), content, None
     
+    qualified_urls = [str(u).strip().rstrip('/') for u in verdict]
+    return profile_url.rstrip('/') in qualified_urls, content, None
+
+def run_cascade_fast_tier(system_content, user_content, profile_url):
+    """
+    First cascade tier: cheap model with a confidence signal.
+    Returns (is_accepted, ai_response) for confident decisions, or None to escalate.
+    """
+    messages = [
+        {"role": "system", "content": system_content + CASCADE_CONFIDENCE_INSTRUCTION},
+        {"role": "user", "content": user_content}
+    ]
+    
+    start_time = time.time()
     try:
-        response = requests.post(url, json=payload, headers=headers)
-        response.raise_for_status()
-        result = response.json()
+        is_accepted, ai_response, verdict = run_evaluation_call(
+            messages, CASCADE_FAST_MODEL, profile_url, CASCADE_EVALUATION_SCHEMA,
+            stage="evaluation_fast"
+        )
+    except Exception as e:
+        print(f"   ⚠️ Fast tier ({CASCADE_FAST_MODEL}) failed, escalating: {e}")
+        return None
+    finally:
+        record_metric("cascade", "fast_calls")
+        record_metric("cascade", "fast_latency_ms", round((time.time() - start_time) * 1000))
+    
+    confidence = float(verdict.get('confidence', 0))
+    print(f"   Fast tier: {'ACCEPTED' if is_accepted else 'REJECTED'} (confidence {confidence:.2f})")
+    
+    if confidence < CASCADE_CONFIDENCE_THRESHOLD:
+        return None
+    
+    record_metric("cascade", "fast_accepts" if is_accepted else "fast_rejects")
+    return is_accepted, ai_response
+
+def evaluate_candidate_with_mistral(cv_data, profile_url, system_prompt, user_prompt, lenient_instruction=None):
+    """Evaluate single candidate using MistralAI"""
+    # Format CV data for evaluation
+    formatted_cv = format_cv_data_for_evaluation(cv_data)
+    
+    # Structured and free-text replies differ, so they are cached separately
+    instruction_version = STRUCTURED_INSTRUCTION_VERSION if STRUCTURED_OUTPUT_ENABLED else LENIENT_INSTRUCTION_VERSION
+    if lenient_instruction is None:
+        lenient_instruction = LENIENT_INSTRUCTION
+    elif lenient_instruction != LENIENT_INSTRUCTION:
+        # Prompt experiments may swap the lenient instruction; its verdicts are cached under its own version
+        structured_suffix = STRUCTURED_EVALUATION_INSTRUCTION if STRUCTURED_OUTPUT_ENABLED else ""
+        instruction_version = hash_text(lenient_instruction + structured_suffix)[:16]
+    
+    # Cascade verdicts depend on both tiers and the escalation threshold
+    model_key = EVALUATION_MODEL
+    if EVALUATION_CASCADE_ENABLED:
+        model_key = f"cascade:{CASCADE_FAST_MODEL}@{CASCADE_CONFIDENCE_THRESHOLD}>{EVALUATION_MODEL}"
+        instruction_version = hash_text(instruction_version + CASCADE_CONFIDENCE_INSTRUCTION)[:16]
+    
+    # Return a cached verdict if this exact CV was already judged against these prompts
+    cache = get_evaluation_cache()
+    cache_key = make_cache_key(formatted_cv, system_prompt, user_prompt, model_key, instruction_version)
+    if cache:
+        cached = cache.get(cache_key)
+        record_metric("evaluation_cache", "hits" if cached else "misses")
+        if cached:
+            ai_response = cached['ai_response']
+            if cached.get('profile_url') and cached['profile_url'] != profile_url:
+                ai_response = ai_response.replace(cached['profile_url'], profile_url)
+            print(f"   ⚡ Cached evaluation result: {'ACCEPTED' if cached['is_accepted'] else 'REJECTED'}")
+            return cached['is_accepted'], ai_response
+
+    system_content = system_prompt + lenient_instruction
+    if STRUCTURED_OUTPUT_ENABLED:
+        system_content += STRUCTURED_EVALUATION_INSTRUCTION
+    user_content = f"{user_prompt}\n\nCandidate CV:\n{formatted_cv}\n\nProfile URL: {profile_url}"
+    
+    try:
+        decision = None
+        if EVALUATION_CASCADE_ENABLED:
+            decision = run_cascade_fast_tier(system_content, user_content, profile_url)
+            if decision is None:
+                print(f"   ↗️ Borderline candidate, escalating to {EVALUATION_MODEL}")
+                record_metric("cascade", "escalations")
         
-        ai_response = result['choices'][0]['message']['content'].strip()
+        if decision is None:
+            messages = [
+                {"role": "system", "content": system_content},
+                {"role": "user", "content": user_content}
+            ]
+            start_time = time.time()
+            try:
+                is_accepted, ai_response, _ = run_evaluation_call(
+                    messages, EVALUATION_MODEL, profile_url,
+                    EVALUATION_SCHEMA if STRUCTURED_OUTPUT_ENABLED else None
+                )
+            finally:
+                if EVALUATION_CASCADE_ENABLED:
+                    record_metric("cascade", "strong_calls")
+                    record_metric("cascade", "strong_latency_ms", round((time.time() - start_time) * 1000))
+        else:
+            is_accepted, ai_response = decision
         
         # Print the raw MistralAI evaluation response for debugging
         print(f"\n=== MISTRAL EVALUATION RESPONSE ===")
         print(ai_response)
         print(f"=== END MISTRAL EVALUATION RESPONSE ===\n")
         
-        # Check if candidate is accepted (looking for the profile URL in response)
-        is_accepted = profile_url in ai_response or "PASS" in ai_response.upper()
-        
         print(f"   Evaluation result: {'ACCEPTED' if is_accepted else 'REJECTED'}")
         print(f"   Reason: {ai_response[:200]}...")
         
+        if cache:
+            cache.set(cache_key, is_accepted, ai_response, model_key, profile_url)
+        
         return is_accepted, ai_response
             
     except Exception as e:
         print(f"Error evaluating candidate with MistralAI: {e}")
+        record_metric("evaluation", "errors")
         return False, "Error in evaluation"
 
-def format_cv_data_for_evaluation(cv_data):
-    """Format CV data for AI evaluation"""
+def format_cv_data_for_evaluation(cv_data, encoding=None):
+    """Format CV data for AI evaluation (verbose list, or the compact encoding if configured)"""
     if not cv_data:
         return "No CV data available"
     
+    if (encoding or CV_ENCODING) == "compact":
+        return format_cv_data_compact(cv_data)
+    
     formatted = f"Name: {cv_data.get('name', 'N/A')}\n"
     formatted += f"Location: {cv_data.get('location', 'N/A')}\n\n"
     
@@ -754,6 +1055,61 @@ def format_cv_data_for_evaluation(cv_data):
     
     return formatted
 
+# Placeholder values the extraction model uses for missing fields
+EMPTY_FIELD_VALUES = {"", "n/a", "na", "none", "null", "unknown", "-", "k.a.", "keine angabe"}
+
+def _compact_field(value):
+    """Normalized field text, or "" for empty/placeholder values"""
+    text = " ".join(str(value or "").split()).strip(" -•*·")
+    return "" if text.lower() in EMPTY_FIELD_VALUES else text
+
+def normalize_skills(skills):
+    """Skills with whitespace/bullets normalized and case-insensitive duplicates removed (first spelling wins)"""
+    seen = set()
+    normalized = []
+    for skill in skills or []:
+        text = _compact_field(skill)
+        if text and text.lower() not in seen:
+            seen.add(text.lower())
+            normalized.append(text)
+    return normalized
+
+def _compact_entry(role, place, dates):
+    """One experience/education entry as 'role @ place (dates)', leaving out empty parts"""
+    entry = " @ ".join(part for part in (_compact_field(role), _compact_field(place)) if part)
+    dates = _compact_field(dates)
+    if dates:
+        entry = f"{entry} ({dates})" if entry else f"({dates})"
+    return entry
+
+def format_cv_data_compact(cv_data):
+    """
+    Token-efficient CV encoding for the evaluation prompt: one line per section,
+    entries separated by '; ', empty fields and placeholders dropped, skills deduplicated.
+    """
+    lines = []
+    header = " | ".join(part for part in (_compact_field(cv_data.get('name')), _compact_field(cv_data.get('location'))) if part)
+    if header:
+        lines.append(header)
+    
+    experience = [_compact_entry(exp.get('title'), exp.get('company'), exp.get('dates'))
+                  for exp in cv_data.get('experience') or [] if isinstance(exp, dict)]
+    experience = [entry for entry in experience if entry]
+    if experience:
+        lines.append("EXP: " + "; ".join(experience))
+    
+    skills = normalize_skills(cv_data.get('skills'))
+    if skills:
+        lines.append("SKILLS: " + ", ".join(skills))
+    
+    education = [_compact_entry(edu.get('degree'), edu.get('institution'), edu.get('dates'))
+                 for edu in cv_data.get('education') or [] if isinstance(edu, dict)]
+    education = [entry for entry in education if entry]
+    if education:
+        lines.append("EDU: " + "; ".join(education))
+    
+    return "\n".join(lines) if lines else "No CV data available"
+
 def send_email_with_results(filtered_candidates, search_keywords, location, radius, recipient_email, search_name=None):
     """Send email with filtered candidates using HTML template"""
     try:
@@ -922,165 +1278,652 @@ def send_email_with_results(filtered_candidates, search_keywords, location, radi
     except Exception as e:
         print(f"Error sending email: {e}")
 
-def download_cv_html_files(unique_candidates, target_candidates):
-    """Download all CV HTML files to temp_CVs directory"""
-    # Clear and create temp_CVs directory
-    if os.path.exists("temp_CVs"):
-        shutil.rmtree("temp_CVs")
-    os.makedirs("temp_CVs")
-    
-    driver = setup_driver_with_cookies()
-    downloaded_files = []
+def prepare_temp_cv_dir(work_dir, keep_existing=False):
+    """Create a job's CV download directory; cleared first unless a resumed job keeps its downloads"""
+    if os.path.exists(work_dir) and not keep_existing:
+        shutil.rmtree(work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+
+def cleanup_temp_cv_dir(work_dir):
+    """Remove a job's CV download directory after the run (cleaned CVs are kept in the CV store)"""
+    if os.path.exists(work_dir):
+        shutil.rmtree(work_dir)
+        print(f"   Cleaned up {work_dir}")
+
+def download_cv_html(driver, profile_url, stop_event=None, directory="temp_CVs"):
+    """
+    Download one CV page with an open browser session and save its HTML to directory.
+    Returns file_info ({filename, url, account_key}) or None; setting stop_event abandons the download.
+    """
+    record_metric("downloads", "attempted")
     
     try:
-        for i, profile_url in enumerate(unique_candidates[:target_candidates], 1):
-            print(f"   Downloading CV {i}/{min(len(unique_candidates), target_candidates)}")
-            
-            try:
-                # Add timeout for page load
-                driver.set_page_load_timeout(30)
-                driver.get(profile_url)
-                time.sleep(3)
+        # Add timeout for page load
+        driver.set_page_load_timeout(30)
+        driver.get(profile_url)
+        time.sleep(3)
 
-                # Solve Turnstile if needed with timeout
-                try:
-                    if not solve_turnstile_challenge(driver, profile_url):
-                        print(f"   Failed to solve Turnstile for {profile_url}")
-                        continue
-                except Exception as turnstile_error:
-                    print(f"   Turnstile timeout for {profile_url}: {turnstile_error}")
-                    continue
-
-                # Wait for the actual CV content to load, not just loading messages
-                content_loaded = False
-                max_attempts = 3
-                for attempt in range(max_attempts):
-                    try:
-                        # Wait for the resume container
-                        WebDriverWait(driver, 10).until(
-                            EC.presence_of_element_located((By.CLASS_NAME, "rdp-resume-container"))
-                        )
-
-                        # Wait additional time for content to populate
-                        time.sleep(3)
-
-                        # Check if we have actual content (not just loading message)
-                        page_text = driver.execute_script("return document.body.innerText;")
-                        if len(page_text) > 100 and "Nur einen Moment" not in page_text and "Just a moment" not in page_text:
-                            content_loaded = True
-                            break
-                        else:
-                            print(f"   Attempt {attempt + 1}: Still loading, waiting longer...")
-                            time.sleep(5)
-
-                    except Exception as wait_error:
-                        print(f"   Attempt {attempt + 1}: Wait error: {wait_error}")
-                        time.sleep(3)
-
-                if not content_loaded:
-                    print(f"   Failed to load actual CV content after {max_attempts} attempts: {profile_url}")
-                    continue
-
-                time.sleep(1)
-                
-                # Get the complete HTML using browser's DOM
-                html_content = driver.execute_script("return document.documentElement.outerHTML;")
+        # Solve Turnstile if needed with timeout
+        try:
+            if not solve_turnstile_challenge(driver, profile_url):
+                print(f"   Failed to solve Turnstile for {profile_url}")
+                return None
+        except Exception as turnstile_error:
+            print(f"   Turnstile timeout for {profile_url}: {turnstile_error}")
+            return None
 
-                # Alternative: If the above doesn't work, try getting the body content
-                if not html_content or len(html_content) < 1000:
-                    html_content = driver.execute_script("return document.body.innerHTML;")
+        # Wait for the actual CV content to load, not just loading messages
+        content_loaded = False
+        max_attempts = 3
+        for attempt in range(max_attempts):
+            if stop_event and stop_event.is_set():
+                break
+            try:
+                # Wait for the resume container
+                WebDriverWait(driver, 10).until(
+                    EC.presence_of_element_located((By.CLASS_NAME, "rdp-resume-container"))
+                )
 
-                # Final fallback to page_source if needed
-                if not html_content or len(html_content) < 1000:
-                    html_content = driver.page_source
+                # Wait additional time for content to populate
+                time.sleep(3)
 
-                # Debug: Check content quality
+                # Check if we have actual content (not just loading message)
                 page_text = driver.execute_script("return document.body.innerText;")
-                if len(page_text) < 50:
-                    print(f"   ⚠️ Short content detected ({len(page_text)} chars): {page_text[:50]}...")
+                if len(page_text) > 100 and "Nur einen Moment" not in page_text and "Just a moment" not in page_text:
+                    content_loaded = True
+                    break
                 else:
-                    print(f"   ✅ Good content length: {len(page_text)} characters")
-                
-                # Extract account key from URL for filename
-                account_key = profile_url.split('/')[-1]
-                filename = f"temp_CVs/cv_{account_key}.html"
-                
-                # Save HTML content
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(html_content)
-                
-                downloaded_files.append({
-                    'filename': filename,
+                    print(f"   Attempt {attempt + 1}: Still loading, waiting longer...")
+                    time.sleep(5)
+
+            except Exception as wait_error:
+                print(f"   Attempt {attempt + 1}: Wait error: {wait_error}")
+                time.sleep(3)
+
+        if stop_event and stop_event.is_set():
+            print(f"   Download of {profile_url} cancelled")
+            record_metric("quota", "cancelled_downloads")
+            return None
+
+        if not content_loaded:
+            print(f"   Failed to load actual CV content after {max_attempts} attempts: {profile_url}")
+            return None
+
+        time.sleep(1)
+        
+        # Get the complete HTML using browser's DOM
+        html_content = driver.execute_script("return document.documentElement.outerHTML;")
+
+        # Alternative: If the above doesn't work, try getting the body content
+        if not html_content or len(html_content) < 1000:
+            html_content = driver.execute_script("return document.body.innerHTML;")
+
+        # Final fallback to page_source if needed
+        if not html_content or len(html_content) < 1000:
+            html_content = driver.page_source
+
+        # Debug: Check content quality
+        page_text = driver.execute_script("return document.body.innerText;")
+        if len(page_text) < 50:
+            print(f"   ⚠️ Short content detected ({len(page_text)} chars): {page_text[:50]}...")
+        else:
+            print(f"   ✅ Good content length: {len(page_text)} characters")
+        
+        # Extract account key from URL for filename
+        account_key = profile_url.split('/')[-1]
+        filename = os.path.join(directory, f"cv_{account_key}.html")
+        
+        # Save HTML content
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write(html_content)
+        
+        record_metric("downloads", "succeeded")
+        print(f"   ✓ Downloaded {account_key}")
+        return {
+            'filename': filename,
+            'url': profile_url,
+            'account_key': account_key
+        }
+        
+    except Exception as e:
+        print(f"   Error downloading {profile_url}: {e}")
+        # If driver gets stuck, try to recover
+        try:
+            driver.execute_script("window.stop();")
+        except:
+            pass
+        return None
+
+def extract_cv_file(file_info):
+    """
+    Clean and extract one saved CV file.
+    Returns cv_data, or None if the CV is empty. A near-duplicate of a CV already seen in this job
+    takes over that CV's extraction (and later its verdict, see EvaluateStage).
+    """
+    # Read HTML file
+    with open(file_info['filename'], 'r', encoding='utf-8') as f:
+        html_content = f.read()
+    
+    # Extract CV data using MistralAI
+    print(f"   Extracting CV data for {file_info['account_key']}...")
+    cv_text = clean_cv_html(html_content)
+    if cv_text is None:
+        print(f"   ❌ No CV data found for {file_info['account_key']}")
+        return None
+    
+    # Near-duplicates (same person under another account key or a repost) reuse the first copy's extraction
+    cv_data = None
+    in_job_copy = False
+    metrics = get_job_metrics()
+    job_id = metrics.job_id if metrics else None
+    index = get_candidate_index()
+    if index:
+        signature = minhash_signature(cv_text)
+        record_metric("near_duplicates", "checked")
+        # Claimed before extracting, so parallel workers of this job see each other's copies
+        duplicate = index.claim(file_info['account_key'], file_info['url'], signature, job_id)
+        if duplicate:
+            record, similarity = duplicate
+            in_job_copy = index.is_copy_in_job(record, file_info['account_key'], job_id)
+            if in_job_copy:
+                cv_data = index.wait_for_extraction(file_info['account_key'], NEAR_DUPLICATE_WAIT_S) or record.get('cv_data')
+                print(f"   ♻️ {file_info['account_key']} is a near-duplicate ({similarity:.2f}) of {record['account_key']} in this job, "
+                      f"{'reusing its extraction' if cv_data else 'extracting on its own'}")
+                record_metric("near_duplicates", "in_job_copies")
+            elif index.is_reusable(record, similarity):
+                print(f"   ♻️ Reusing extraction of {record['account_key']} (similarity {similarity:.2f})")
+                record_metric("near_duplicates", "extraction_reused")
+                cv_data = record['cv_data']
+            elif record.get('cv_data'):
+                print(f"   🔄 Near-duplicate {record['account_key']} (similarity {similarity:.2f}) was indexed {record.get('indexed_at')}, re-extracting")
+                record_metric("near_duplicates", "stale_reextracted")
+    
+    if cv_data is None:
+        cv_data = extract_cv_data_from_text(cv_text)
+    if index:
+        index.finish_extraction(file_info['account_key'], cv_data)
+    if not cv_data:
+        print(f"   ❌ No CV data found for {file_info['account_key']}")
+        return None
+    
+    if index and not in_job_copy:
+        index.add(file_info['account_key'], file_info['url'], signature, cv_data, job_id)
+    # Keep the cleaned CV and its extraction for evaluation replays (downloads are deleted after the job)
+    store_cv(job_id, file_info['account_key'], file_info['url'], cv_text, cv_data)
+
+    print(f"   ✅ CV data extracted: name={cv_data.get('name', 'N/A')}")
+    print(f"      Fields found: {list(cv_data.keys())}")
+    print(f"      name: {cv_data.get('name', 'Missing')}")
+    print(f"      email: {cv_data.get('email', 'Missing')}")
+    print(f"      location: {cv_data.get('location', 'Missing')}")
+    return cv_data
+
+def evaluate_extracted_cv(cv_data, profile_url, system_prompt, user_prompt, hard_criteria=None, rejections=None):
+    """
+    Evaluation stage for one extracted CV: hard criteria, then the LLM evaluation.
+    Returns the candidate info if qualified, otherwise None.
+    """
+    # Deterministic rules first - no LLM call for candidates that certainly fail
+    if hard_criteria and HARD_CRITERIA_ENABLED:
+        passed, rule, experience_metrics = evaluate_hard_criteria(cv_data, hard_criteria)
+        record_metric("hard_criteria", "checked")
+        if not passed:
+            print(f"   ✗ Candidate {cv_data.get('name', 'Unknown')} rejected by rule '{rule}' {experience_metrics}")
+            record_metric("hard_criteria", "rejected")
+            record_metric("hard_criteria", f"rejected:{rule}")
+            if rejections is not None:
+                rejections.append({
+                    'name': cv_data.get('name', 'N/A'),
                     'url': profile_url,
-                    'account_key': account_key
+                    'rule': rule,
+                    'metrics': experience_metrics
                 })
-                
-                print(f"   ✓ Downloaded {account_key}")
-                
-            except Exception as e:
-                print(f"   Error downloading {profile_url}: {e}")
-                # If driver gets stuck, try to recover
-                try:
-                    driver.execute_script("window.stop();")
-                except:
-                    pass
-                continue
+            return None
     
-    finally:
-        driver.quit()
+    # Evaluate candidate with MistralAI
+    is_qualified, ai_response = evaluate_candidate_with_mistral(
+        cv_data, profile_url, system_prompt, user_prompt
+    )
     
-    return downloaded_files
+    if not is_qualified:
+        print(f"   ✗ Candidate {cv_data.get('name', 'Unknown')} not qualified")
+        return None
+    
+    print(f"   ✓ Candidate {cv_data.get('name', 'Unknown')} qualified")
+    return {
+        'name': cv_data.get('name', 'N/A'),
+        'location': cv_data.get('location', 'N/A'),
+        'experience': cv_data.get('experience', []),
+        'skills': cv_data.get('skills', []),
+        'education': cv_data.get('education', []),
+        'url': profile_url,
+        'ai_response': ai_response
+    }
+
+# Job budgets: search param and the last stage stopped when the budget is used up
+# (page loads end the downloads; wall time and LLM tokens end the evaluations as well)
+JOB_BUDGETS = {
+    'wall_time': ('max_wall_time_s', "evaluate"),
+    'llm_tokens': ('max_llm_tokens', "evaluate"),
+    'page_loads': ('max_page_loads', "download")
+}
+_budget_lock = threading.Lock()
 
-def process_saved_cv_files(downloaded_files, system_prompt, user_prompt):
-    """Process saved CV HTML files with MistralAI"""
-    filtered_candidates = []
+def exhaust_budget(job, budget):
+    """Stop the stages that spend an exhausted budget; the run finishes with its partial results"""
+    with _budget_lock:
+        exhausted = job.state.setdefault('budgets_exhausted', [])
+        if budget in exhausted:
+            return
+        exhausted.append(budget)
+    param, stage_name = JOB_BUDGETS[budget]
+    print(f"   ⏱️ Budget {param}={job.params.get(param)} exhausted, stopping through the {stage_name} stage")
+    record_metric("budget", budget)
+    job.stop_through(stage_name)
+
+def check_budget(job, budget):
+    """True (and the budget is exhausted) once the job has used up its LLM tokens or page loads"""
+    limit = job.params.get(JOB_BUDGETS[budget][0])
+    metrics = get_job_metrics()
+    if not limit or not metrics:
+        return False
+    used = metrics.total_llm_tokens() if budget == 'llm_tokens' else metrics.get("downloads", "attempted")
+    if used < limit:
+        return False
+    exhaust_budget(job, budget)
+    return True
+
+def checkpoint_candidate(job, url, stage, **fields):
+    """Record a candidate's progress in the job's checkpoint (no-op without checkpointing)"""
+    checkpoint = job.state.get('checkpoint')
+    if checkpoint:
+        checkpoint.mark(job.state['job_id'], url, stage, **fields)
+
+class SearchStage(Stage):
+    """
+    Source stage: progressive radius search on Indeed, emits ranked profile URLs to download.
+    A resumed job skips the search and emits its unfinished candidates instead.
+    """
+    name = "search"
+    critical = True
+    record_seconds = False  # Emitting waits on downloads; the search time is recorded before that
     
-    for i, file_info in enumerate(downloaded_files, 1):
-        print(f"   Processing CV {i}/{len(downloaded_files)}")
+    def process(self, job, params, emit, resource):
+        if 'resume_items' in job.state:
+            items = job.state['resume_items']
+            print(f"   Resuming with {len(items)} unfinished candidates")
+        else:
+            items = [{'url': url, 'rank': rank} for rank, url in enumerate(self.search(job, params))]
+        job.progress.expect("download", len(items))
         
-        try:
-            # Read HTML file
-            with open(file_info['filename'], 'r', encoding='utf-8') as f:
-                html_content = f.read()
-            
-            # Extract CV data using MistralAI
-            print(f"   Extracting CV data for {file_info['account_key']}...")
-            cv_data = extract_cv_data_with_mistral(html_content)
-            if not cv_data:
-                print(f"   ❌ No CV data found for {file_info['account_key']}")
-                continue
-
-            print(f"   ✅ CV data extracted: name={cv_data.get('name', 'N/A')}")
-            print(f"      Fields found: {list(cv_data.keys())}")
-            print(f"      name: {cv_data.get('name', 'Missing')}")
-            print(f"      email: {cv_data.get('email', 'Missing')}")
-            print(f"      location: {cv_data.get('location', 'Missing')}")
-            
-            # Evaluate candidate with MistralAI
-            is_qualified, ai_response = evaluate_candidate_with_mistral(
-                cv_data, file_info['url'], system_prompt, user_prompt
-            )
-            
-            if is_qualified:
-                candidate_info = {
-                    'name': cv_data.get('name', 'N/A'),
-                    'location': cv_data.get('location', 'N/A'),
-                    'experience': cv_data.get('experience', []),
-                    'skills': cv_data.get('skills', []),
-                    'education': cv_data.get('education', []),
-                    'url': file_info['url'],
-                    'ai_response': ai_response
-                }
-                filtered_candidates.append(candidate_info)
-                print(f"   ✓ Candidate {cv_data.get('name', 'Unknown')} qualified")
-            else:
-                print(f"   ✗ Candidate {cv_data.get('name', 'Unknown')} not qualified")
+        for i, item in enumerate(items):
+            if self.stopped:
+                print(f"   Stopping downloads, {len(items) - i} remaining CVs skipped")
+                record_metric("quota", "skipped_downloads", len(items) - i)
+                break
+            emit(item)
+    
+    def search(self, job, params):
+        """Run the search; returns the profile URLs to download in rank order"""
+        search_keywords = params['search_keywords']
+        search_target = params['max_downloads'] or params['target_candidates']
+        resume_filter = calculate_unix_timestamp_ms(params['resume_last_updated_days'])
+        started_at = time.time()
+        all_profiles = []
+        
+        # Progressive radius search
+        for radius in range(5, params['max_radius'] + 1, 5):
+            if self.stopped:
+                break
+            print(f"   Searching radius {radius}km...")
+            response = make_indeed_request(radius, search_keywords, resume_filter, params['location'])
+            if response:
+                profiles = extract_candidate_profiles(response)
+                all_profiles.extend(profiles)
+                print(f"   Found {len(profiles)} candidates at {radius}km")
                 
+                if len(all_profiles) >= search_target:
+                    break
+        
+        # Remove duplicates and put the most relevant profiles first
+        ranked_profiles = dedupe_and_rank_candidates(all_profiles, params['user_prompt'], search_keywords)
+        unique_candidates = [profile['url'] for profile in ranked_profiles]
+        job.state['unique_candidates'] = unique_candidates
+        print(f"   Total unique candidates found: {len(unique_candidates)}")
+        record_metric("stage_seconds", "search", round(time.time() - started_at, 1))
+        
+        to_download = unique_candidates[:search_target]
+        if job.state.get('checkpoint'):
+            job.state['checkpoint'].save_search(job.state['job_id'], unique_candidates, to_download)
+        return to_download
+
+class DownloadStage(Stage):
+    """Downloads CV pages; every worker drives its own browser session"""
+    name = "download"
+    
+    def __init__(self, workers=1, queue_size=PIPELINE_QUEUE_SIZE, browser_fallback=False):
+        super().__init__(workers, queue_size)
+        self.browser_fallback = browser_fallback
+        self._drivers = set()  # Open browser sessions, quit at once on cancellation
+        self._drivers_lock = threading.Lock()
+    
+    def open(self, job):
+        try:
+            driver = setup_driver_with_cookies()
+            with self._drivers_lock:
+                self._drivers.add(driver)
+            return driver
         except Exception as e:
-            print(f"   Error processing {file_info['filename']}: {e}")
+            error_msg = str(e)
+            if self.browser_fallback and ("ChromeDriver" in error_msg or "Status code was: 127" in error_msg):
+                # Without a browser the search results are passed on unanalysed (see the notify stage)
+                print("⚠️ ChromeDriver not available on this system")
+                job.state['browser_unavailable'] = True
+                return None
+            raise
+    
+    def process(self, job, item, emit, driver):
+        if item.get('filename'):
+            # Resumed candidate that was already downloaded
+            emit(item)
+            return
+        if driver is None or check_budget(job, 'page_loads'):
+            return
+        print(f"   Downloading CV {item['rank'] + 1}: {item['url']}")
+        file_info = download_cv_html(driver, item['url'], self.stop_event, job.state['work_dir'])
+        if not file_info:
+            if not self.stopped:
+                checkpoint_candidate(job, item['url'], "failed")
+                job.progress.fail(self.name)
+            return
+        checkpoint_candidate(job, item['url'], "downloaded", filename=file_info['filename'])
+        emit(dict(file_info, rank=item['rank']))
+    
+    def close(self, job, driver):
+        if driver is None:
+            return
+        with self._drivers_lock:
+            if driver not in self._drivers:
+                return  # Already quit by interrupt()
+            self._drivers.discard(driver)
+        driver.quit()
+    
+    def interrupt(self, job):
+        # Quitting the session makes a download that is waiting on the page fail right away
+        with self._drivers_lock:
+            drivers, self._drivers = self._drivers, set()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception as e:
+                print(f"⚠️ Could not quit browser: {e}")
+        if drivers:
+            print(f"   🛑 Closed {len(drivers)} browser sessions")
+
+class ExtractStage(Stage):
+    """Cleans saved CVs and extracts structured cv_data"""
+    name = "extract"
+    
+    def process(self, job, file_info, emit, resource):
+        if file_info.get('cv_data'):
+            # Resumed candidate that was already extracted
+            emit(file_info)
+            return
+        cv_data = extract_cv_file(file_info)
+        if job.cancelled:
+            return  # The extraction may have been aborted; a resume repeats it
+        if not cv_data:
+            checkpoint_candidate(job, file_info['url'], "skipped")
+            return
+        checkpoint_candidate(job, file_info['url'], "extracted", cv_data=cv_data)
+        emit(dict(file_info, cv_data=cv_data))
+
+class EvaluateStage(Stage):
+    """
+    Hard criteria and LLM evaluation; emits qualified candidates.
+    Near-duplicates within the job share one verdict (see CandidateIndex.begin_evaluation).
+    In quota mode the stages up to this one stop once enough candidates qualified.
+    """
+    name = "evaluate"
+    
+    def __init__(self, workers=1, queue_size=PIPELINE_QUEUE_SIZE, already_qualified=0):
+        super().__init__(workers, queue_size)
+        self._lock = threading.Lock()
+        self._qualified = already_qualified
+    
+    def process(self, job, item, emit, resource):
+        params = job.params
+        if check_budget(job, 'llm_tokens'):
+            return  # Left unevaluated, like the items dropped from the queue
+        account_key = item['url'].split('/')[-1]
+        index = get_candidate_index()
+        shared, candidate_info = index.begin_evaluation(account_key, NEAR_DUPLICATE_WAIT_S) if index else (False, None)
+        if shared:
+            print(f"   ♻️ Reusing the verdict of a near-duplicate for {item['url']}")
+            record_metric("near_duplicates", "verdict_reused")
+            if candidate_info:
+                candidate_info = dict(candidate_info, url=item['url'],
+                                      ai_response=candidate_info['ai_response'].replace(candidate_info['url'], item['url']))
+        else:
+            try:
+                candidate_info = evaluate_extracted_cv(
+                    item['cv_data'], item['url'], params['system_prompt'], params['user_prompt'],
+                    params['hard_criteria'], job.state.setdefault('rejections', [])
+                )
+            except BaseException:
+                if index:
+                    index.finish_evaluation(account_key, None, evaluated=False)
+                raise
+            if index:
+                index.finish_evaluation(account_key, candidate_info, evaluated=not job.cancelled)
+        if job.cancelled:
+            return  # The evaluation may have been aborted; a resume repeats it
+        qualified_target = params['qualified_target']
+        if qualified_target:
+            record_metric("quota", "evaluated")
+        if candidate_info:
+            candidate_info = dict(candidate_info, rank=item['rank'])
+        checkpoint_candidate(job, item['url'], "evaluated", candidate=candidate_info or {})
+        publisher = job.state.get('publisher')
+        if not candidate_info:
+            if publisher:
+                publisher.record(None)
+            return
+        
+        if qualified_target:
+            with self._lock:
+                if self.stopped:
+                    # Finished after the quota was met - nobody will read it
+                    record_metric("quota", "surplus_qualified")
+                    if publisher:
+                        publisher.record(None)
+                    return
+                self._qualified += 1
+                if self._qualified >= qualified_target:
+                    print(f"   🎯 Quota of {qualified_target} qualified candidates reached, stopping")
+                    record_metric("quota", "quota_reached")
+                    job.stop_through(self.name)
+        if publisher:
+            publisher.record(to_api_candidate(candidate_info))
+        emit(candidate_info)
+
+class NotifyStage(Stage):
+    """Collects qualified candidates in rank order and hands them to the configuration's notify callback"""
+    name = "notify"
+    record_seconds = False
+    
+    def __init__(self, notify=None):
+        super().__init__(workers=1)
+        self.notify = notify
+        self._candidates = []
+    
+    def process(self, job, candidate_info, emit, resource):
+        self._candidates.append(candidate_info)
+    
+    def finish(self, job, emit):
+        # Candidates qualified before a resume count as well
+        candidates = job.state.get('resumed_qualified', []) + self._candidates
+        candidates = sorted(candidates, key=lambda candidate: candidate['rank'])
+        if job.params['qualified_target']:
+            candidates = candidates[:job.params['qualified_target']]
+        job.state['qualified'] = candidates
+        if self.notify and job.error is None:
+            self.notify(job, candidates)
+        for candidate in candidates:
+            emit(candidate)
+
+def normalize_search_params(params, default_radius=25, default_target=100):
+    """Typed pipeline parameters from form, sheet or Supabase values"""
+    qualified_target, max_downloads = get_quota_settings(params)
+    return {
+        'search_keywords': params.get('search_keywords') or '',
+        'location': params.get('location') or '',
+        'max_radius': int(params.get('max_radius') or default_radius),
+        'target_candidates': int(params.get('target_candidates') or default_target),
+        'recipient_email': params.get('recipient_email') or '',
+        'system_prompt': params.get('system_prompt') or '',
+        'user_prompt': params.get('user_prompt') or '',
+        'resume_last_updated_days': int(params.get('resume_last_updated_days') or 30),
+        'qualified_target': qualified_target,
+        'max_downloads': max_downloads,
+        'hard_criteria': parse_hard_criteria(params.get('hard_criteria')),
+        'max_wall_time_s': int(params.get('max_wall_time_s') or JOB_MAX_WALL_TIME_S),
+        'max_llm_tokens': int(params.get('max_llm_tokens') or JOB_MAX_LLM_TOKENS),
+        'max_page_loads': int(params.get('max_page_loads') or JOB_MAX_PAGE_LOADS)
+    }
+
+def search_fingerprint(search_data):
+    """
+    Canonical hash of everything that determines a search's results (not who receives them):
+    identical briefs get the same fingerprint regardless of key order, case and whitespace
+    """
+    params = normalize_search_params(search_data)
+    
+    def canonical(value):
+        return " ".join(value.lower().split()) if isinstance(value, str) else value
+    
+    key = {name: canonical(value) for name, value in params.items() if name != 'recipient_email'}
+    return hash_text(json.dumps(key, sort_keys=True, ensure_ascii=False, default=str))
+
+def build_cv_pipeline(notify=None, browser_fallback=False, already_qualified=0):
+    """search -> download -> extract -> evaluate -> notify, with per-stage workers from config"""
+    return PipelineEngine([
+        SearchStage(),
+        DownloadStage(PIPELINE_DOWNLOAD_WORKERS, browser_fallback=browser_fallback),
+        ExtractStage(PIPELINE_EXTRACT_WORKERS),
+        EvaluateStage(PIPELINE_EVALUATE_WORKERS, already_qualified=already_qualified),
+        NotifyStage(notify)
+    ], name="cv-pipeline")
+
+def load_resume_state(job, checkpoint, job_id):
+    """
+    Put a checkpointed job's progress into job.state: its search result, the candidates that
+    still need work (continuing from their last finished stage) and those that already qualified.
+    Returns False if there is nothing to resume from (no search result was saved).
+    """
+    saved = checkpoint.get_job(job_id)
+    if not saved or saved['unique_candidates'] is None:
+        return False
+    
+    resume_items, qualified, evaluated = [], [], 0
+    for row in checkpoint.candidates(job_id):
+        item = {'url': row['url'], 'rank': row['rank'], 'account_key': row['url'].split('/')[-1]}
+        if row['stage'] == "evaluated":
+            evaluated += 1
+            if row['candidate']:
+                qualified.append(row['candidate'])
+            continue
+        if row['stage'] == "skipped":
             continue
+        if row['stage'] in ("downloaded", "extracted") and row['filename'] and os.path.exists(row['filename']):
+            item['filename'] = row['filename']
+        if row['stage'] == "extracted" and row['cv_data']:
+            item['filename'] = row['filename']
+            item['cv_data'] = row['cv_data']
+        resume_items.append(item)
+    
+    qualified_target = job.params.get('qualified_target')
+    if qualified_target and len(qualified) >= qualified_target:
+        resume_items = []  # The quota was met before the interruption
+    
+    job.state['unique_candidates'] = saved['unique_candidates']
+    job.state['resume_items'] = resume_items
+    job.state['resumed_qualified'] = qualified
+    job.state['resumed_evaluated'] = evaluated
+    print(f"   Checkpoint: {len(qualified)} already qualified, {len(resume_items)} candidates left")
+    record_metric("checkpoint", "resumed_candidates", len(resume_items))
+    return True
+
+def run_cv_pipeline(params, notify=None, browser_fallback=False, job=None, resume=False):
+    """
+    Run the CV pipeline for normalized params and return the finished PipelineJob
+    (qualified candidates in job.state['qualified']). Pass job to be able to cancel the run.
+    Progress is checkpointed per candidate; with resume=True a checkpointed run of the same
+    job id continues with its unfinished candidates instead of searching again.
+    """
+    job = job or PipelineJob()
+    job.params = params
+    job.state.setdefault('rejections', [])
+    metrics = get_job_metrics()
+    job_id = metrics.job_id if metrics else uuid.uuid4().hex
+    job.state['job_id'] = job_id
+    job.state['work_dir'] = os.path.join(CV_WORK_DIR, job_id)
+    
+    checkpoint = get_checkpoint_store()
+    resumed = False
+    if checkpoint:
+        job.state['checkpoint'] = checkpoint
+        resumed = resume and load_resume_state(job, checkpoint, job_id)
+        if not resumed:
+            checkpoint.reset_job(job_id)
+        checkpoint.start_job(job_id, params)
+    if resumed and job.state.get('publisher'):
+        job.state['publisher'].start([to_api_candidate(candidate) for candidate in job.state['resumed_qualified']],
+                                     job.state['resumed_evaluated'])
     
-    return filtered_candidates
+    prepare_temp_cv_dir(job.state['work_dir'], keep_existing=resumed)
+    wall_time_timer = None
+    if params.get('max_wall_time_s'):
+        # Counted from the job's creation (includes loading the search)
+        remaining = max(0, params['max_wall_time_s'] - (time.time() - job.started_at))
+        wall_time_timer = threading.Timer(remaining, contextvars.copy_context().run, (exhaust_budget, job, 'wall_time'))
+        wall_time_timer.daemon = True
+        wall_time_timer.start()
+    try:
+        # Cancelling the job also aborts its in-flight LLM calls
+        with cancel_scope(job.cancel_event):
+            build_cv_pipeline(notify, browser_fallback, len(job.state.get('resumed_qualified', []))).run(job, [params])
+    except BaseException:
+        # Downloads are kept so a resume can continue from them
+        if checkpoint:
+            checkpoint.finish_job(job_id, "failed")
+        raise
+    finally:
+        if wall_time_timer:
+            wall_time_timer.cancel()
+        index = get_candidate_index()
+        if index:
+            index.release_job(job_id)
+    if job.suspended:
+        # Downloads are kept; the job queue hands the job to a worker that resumes it
+        if checkpoint:
+            checkpoint.finish_job(job_id, "suspended")
+        return job
+    if checkpoint:
+        checkpoint.finish_job(job_id, "cancelled" if job.cancelled else "completed")
+    cleanup_temp_cv_dir(job.state['work_dir'])
+    return job
+
+def get_quota_settings(params):
+    """
+    Read quota mode settings from search params.
+    Returns (qualified_target, max_downloads); qualified_target is 0 when quota mode is off.
+    """
+    qualified_target = int(params.get('qualified_target') or 0)
+    if qualified_target <= 0:
+        return 0, 0
+    max_downloads = int(params.get('max_downloads') or qualified_target * QUOTA_MAX_DOWNLOADS_FACTOR)
+    return qualified_target, max(max_downloads, qualified_target)
 
 def log_message(message):
     """Log message to file and console using logger"""
@@ -1186,8 +2029,8 @@ async def run_search(params: SearchParameters):
         pipeline_running = True
         
         try:
-            # Run pipeline directly with form parameters
-            profile_urls = main_pipeline(params.dict())
+            # Run pipeline with form parameters (in a thread - the pipeline engine runs its own event loop)
+            profile_urls = await asyncio.get_event_loop().run_in_executor(None, main_pipeline, params.dict())
             log_message("Search pipeline completed with form parameters")
             
             return JSONResponse({
@@ -1275,10 +2118,30 @@ async def health_check():
         script_exists=os.path.exists(SCRIPT_PATH)
     )
 
+def record_finished_job(metrics, search_keywords, location, user_prompt, total_found, qualified, duration_s):
+    """Append a finished run to the job history (feeds the yield and cost estimates)"""
+    append_job_history({
+        'job_id': metrics.job_id,
+        'finished_at': datetime.now().isoformat(),
+        'search_keywords': search_keywords,
+        'location': location,
+        'prompt_family': prompt_family(user_prompt),
+        'profiles_found': total_found,
+        'download_attempts': int(metrics.get("downloads", "attempted")),
+        'downloaded': int(metrics.get("downloads", "succeeded")),
+        'qualified': qualified,
+        'duration_s': round(duration_s, 1),
+        'stage_seconds': metrics.to_dict().get('stage_seconds', {}),
+        'llm_usage': metrics.llm_usage_summary()['total']
+    })
+
 def main_pipeline(form_params=None):
     """Main MVP pipeline"""
     print("=== MatchTrex MVP Pipeline ===\n")
     
+    metrics = start_job_metrics()
+    started_at = time.time()
+    
     # Step 1: Get search parameters - either from form or Google Sheets
     if form_params:
         print("1. Using search parameters from form...")
@@ -1290,60 +2153,27 @@ def main_pipeline(form_params=None):
             print("Error: Could not read search parameters")
             return
     
-    search_keywords = params.get('search_keywords', '')
-    location = params.get('location', '')
-    max_radius = int(params.get('max_radius', 20))
-    target_candidates = int(params.get('target_candidates', 10))
-    recipient_email = params.get('recipient_email', '')
-    system_prompt = params.get('system_prompt', '')
-    user_prompt = params.get('user_prompt', '')
-    resume_last_updated_days = int(params.get('resume_last_updated_days', 30))
-    
-    print(f"   Keywords: {search_keywords}")
-    print(f"   Location: {location}")
-    print(f"   Target: {target_candidates} candidates")
-    
-    # Step 2: Search for candidates
-    print("\n2. Searching for candidates on Indeed...")
-    resume_filter = calculate_unix_timestamp_ms(resume_last_updated_days)
-    all_candidates = []
-    
-    # Progressive radius search
-    for radius in range(5, max_radius + 1, 5):
-        print(f"   Searching radius {radius}km...")
-        response = make_indeed_request(radius, search_keywords, resume_filter, location)
-        if response:
-            candidates = extract_candidate_data(response)
-            all_candidates.extend(candidates)
-            print(f"   Found {len(candidates)} candidates at {radius}km")
-            
-            if len(all_candidates) >= target_candidates:
-                break
-    
-    # Remove duplicates
-    unique_candidates = list(set(all_candidates))
-    print(f"   Total unique candidates found: {len(unique_candidates)}")
-    
-    # Step 3: Download CV HTML files
-    print("\n3. Downloading CV HTML files...")
-    downloaded_files = download_cv_html_files(unique_candidates, target_candidates)
-    print(f"   Downloaded {len(downloaded_files)} CV files to temp_CVs/")
-    
-    # Step 4: Process CV files with MistralAI
-    print("\n4. Processing CV files with MistralAI...")
-    filtered_candidates = process_saved_cv_files(downloaded_files, system_prompt, user_prompt)
-    
-    # Clean up temp_CVs directory after processing
-    if os.path.exists("temp_CVs"):
-        shutil.rmtree("temp_CVs")
-        print("   Cleaned up temp_CVs directory")
-    
-    # Step 5: Send email with results
-    print(f"\n5. Sending results email...")
-    print(f"   Qualified candidates: {len(filtered_candidates)}")
+    params = normalize_search_params(params, default_radius=20, default_target=10)
+    print(f"   Keywords: {params['search_keywords']}")
+    print(f"   Location: {params['location']}")
+    if params['qualified_target']:
+        print(f"   Target: {params['qualified_target']} qualified candidates (max {params['max_downloads']} downloads)")
+    else:
+        print(f"   Target: {params['target_candidates']} candidates")
     
-    if filtered_candidates:
-        send_email_with_results(filtered_candidates, search_keywords, location, max_radius, recipient_email)
+    def notify(job, filtered_candidates):
+        # Step 5: Send email with results
+        print(f"\n5. Sending results email...")
+        print(f"   Qualified candidates: {len(filtered_candidates)}")
+        if job.state['rejections']:
+            print(f"   Rejected by hard criteria: {len(job.state['rejections'])}")
+        
+        if not filtered_candidates:
+            print("   No qualified candidates found")
+            return
+        
+        send_email_with_results(filtered_candidates, params['search_keywords'], params['location'],
+                                params['max_radius'], params['recipient_email'])
         
         # Save results to file
         timestamp = datetime.now().strftime("%d_%m_%Y_%H_%M_%S")
@@ -1354,160 +2184,152 @@ def main_pipeline(form_params=None):
                 f.write(f"{candidate['url']}\n")
         
         print(f"   Results saved to {filename}")
-    else:
-        print("   No qualified candidates found")
     
+    # Steps 2-4: Search, download, extract and evaluate as overlapping pipeline stages
+    print("\n2. Searching, downloading and evaluating candidates...")
+    job = run_cv_pipeline(params, notify)
+    filtered_candidates = job.state['qualified']
+    
+    print(f"   Job metrics: {json.dumps(metrics.to_dict())}")
+    print(f"   LLM usage: {json.dumps(metrics.llm_usage_summary()['by_stage'])}")
+    print(f"   Hedging: {json.dumps(hedging_summary(metrics))}")
+    record_finished_job(metrics, params['search_keywords'], params['location'], params['user_prompt'],
+                        len(job.state.get('unique_candidates', [])), len(filtered_candidates), time.time() - started_at)
     print("\n=== Pipeline Complete ===")
+    return [candidate['url'] for candidate in filtered_candidates]
+
+def build_fallback_candidates(candidate_urls):
+    """Basic candidate entries without CV analysis, used when no browser is available"""
+    fallback_candidates = []
+    for i, candidate_url in enumerate(candidate_urls):
+        fallback_candidates.append({
+            'name': f'Kandidat {i+1}',
+            'email': 'N/A (CV-Analyse nicht verfügbar)',
+            'url': candidate_url,
+            'ai_response': 'CV-Analyse nicht verfügbar: ChromeDriver fehlt auf diesem System. Bitte CV manuell prüfen.',
+            'location': 'N/A',
+            'title': 'N/A',
+            'experience': [],
+            'skills': [],
+            'education': []
+        })
+    return fallback_candidates
+
+def to_api_candidate(candidate):
+    """Qualified candidate in the API/Supabase result format"""
+    return {
+        "name": candidate.get('name', 'N/A'),
+        "email": candidate.get('email', 'N/A'),  # CV parsing might not extract email
+        "profile_url": candidate.get('url', 'N/A'),
+        "analysis": candidate.get('ai_response', 'No analysis available'),  # Fixed field name
+        "location": candidate.get('location', 'N/A'),
+        "title": candidate.get('title', 'N/A'),
+        "experience": candidate.get('experience', []),
+        "skills": candidate.get('skills', []),
+        "education": candidate.get('education', []),
+        "rank": candidate.get('rank')
+    }
+
+def from_api_candidate(candidate):
+    """API/Supabase candidate record back in the pipeline format (e.g. for the result email)"""
+    return dict(candidate, url=candidate.get('profile_url'), ai_response=candidate.get('analysis'))
 
-def main_pipeline_for_api(search_data: dict) -> dict:
+def main_pipeline_for_api(search_data: dict, job=None, resume=False, publisher=None) -> dict:
     """
     API-Version der Pipeline - angepasst für Backend Integration
     Nimmt Supabase search_data und gibt strukturierte Ergebnisse zurück
+    resume=True setzt einen unterbrochenen Lauf derselben Suche am letzten Checkpoint fort
+    publisher (SearchCandidatePublisher) veröffentlicht qualifizierte Kandidaten schon während des Laufs
     """
     print("=== MatchTrex MVP Pipeline (API Mode) ===\n")
 
+    # Per-job counters (structured output failures, wasted tokens, ...)
+    metrics = start_job_metrics(search_data.get('id'))
+    started_at = time.time()
+
     try:
         # Step 1: Parameter Mapping - Supabase Format → Pipeline Format
-        form_params = {
-            'search_keywords': search_data.get('search_keywords', ''),
-            'location': search_data.get('location', ''),
-            'max_radius': search_data.get('max_radius', 25),
-            'target_candidates': search_data.get('target_candidates', 100),
-            'recipient_email': search_data.get('recipient_email', ''),
-            'system_prompt': search_data.get('system_prompt', ''),
-            'user_prompt': search_data.get('user_prompt', ''),
-            'resume_last_updated_days': search_data.get('resume_last_updated_days', 30)
-        }
+        params = normalize_search_params(search_data)
 
         print(f"1. Search Parameters:")
-        print(f"   Keywords: {form_params['search_keywords']}")
-        print(f"   Location: {form_params['location']}")
-        print(f"   Target: {form_params['target_candidates']} candidates")
-        print(f"   Radius: {form_params['max_radius']} km")
-
-        # Extract parameters
-        search_keywords = form_params['search_keywords']
-        location = form_params['location']
-        max_radius = int(form_params['max_radius'])
-        target_candidates = int(form_params['target_candidates'])
-        recipient_email = form_params['recipient_email']
-        system_prompt = form_params['system_prompt']
-        user_prompt = form_params['user_prompt']
-        resume_last_updated_days = int(form_params['resume_last_updated_days'])
-
-        # Step 2: Search for candidates
-        print("\n2. Searching for candidates on Indeed...")
-        resume_filter = calculate_unix_timestamp_ms(resume_last_updated_days)
-        all_candidates = []
-
-        # Progressive radius search
-        for radius in range(5, max_radius + 1, 5):
-            print(f"   Searching radius {radius}km...")
-            response = make_indeed_request(radius, search_keywords, resume_filter, location)
-            if response:
-                candidates = extract_candidate_data(response)
-                all_candidates.extend(candidates)
-                print(f"   Found {len(candidates)} candidates at {radius}km")
-
-                if len(all_candidates) >= target_candidates:
-                    break
-
-        # Remove duplicates
-        unique_candidates = list(set(all_candidates))
-        print(f"   Total unique candidates found: {len(unique_candidates)}")
-
-        # Step 3: Download CV HTML files (with ChromeDriver fallback)
-        print("\n3. Downloading CV HTML files...")
-        try:
-            downloaded_files = download_cv_html_files(unique_candidates, target_candidates)
-            print(f"   Downloaded {len(downloaded_files)} CV files")
-
-            # Step 4: Process CV files with MistralAI
-            print("\n4. Processing CV files with MistralAI...")
-            filtered_candidates = process_saved_cv_files(downloaded_files, system_prompt, user_prompt)
-
-        except Exception as e:
-            error_msg = str(e)
-            print(f"❌ CV download/processing failed: {error_msg}")
-
-            if "ChromeDriver" in error_msg or "Status code was: 127" in error_msg:
-                print("⚠️ ChromeDriver not available on this system")
+        print(f"   Keywords: {params['search_keywords']}")
+        print(f"   Location: {params['location']}")
+        print(f"   Target: {params['target_candidates']} candidates")
+        print(f"   Radius: {params['max_radius']} km")
+        if params['qualified_target']:
+            print(f"   Quota mode: {params['qualified_target']} qualified candidates (max {params['max_downloads']} downloads)")
+
+        def notify(job, filtered_candidates):
+            if job.state.get('browser_unavailable'):
+                # Fallback: candidate list without CV analysis
                 print("   Falling back to candidate list without CV analysis...")
-
-                # Fallback: Create basic candidate entries without CV analysis
-                filtered_candidates = []
-                for i, candidate_url in enumerate(unique_candidates[:target_candidates]):
-                    # Extract account key from URL for basic info
-                    account_key = candidate_url.split('/')[-1] if '/' in candidate_url else f"candidate_{i+1}"
-
-                    fallback_candidate = {
-                        'name': f'Kandidat {i+1}',
-                        'email': 'N/A (CV-Analyse nicht verfügbar)',
-                        'url': candidate_url,
-                        'ai_response': 'CV-Analyse nicht verfügbar: ChromeDriver fehlt auf diesem System. Bitte CV manuell prüfen.',
-                        'location': 'N/A',
-                        'title': 'N/A',
-                        'experience': [],
-                        'skills': [],
-                        'education': []
-                    }
-                    filtered_candidates.append(fallback_candidate)
-
+                limit = params['qualified_target'] or params['target_candidates']
+                filtered_candidates = build_fallback_candidates(job.state.get('unique_candidates', [])[:limit])
+                job.state['qualified'] = filtered_candidates
                 print(f"   Created {len(filtered_candidates)} fallback candidate entries")
-            else:
-                # Re-raise if it's a different error
-                raise e
-
-        # Clean up temp_CVs directory
-        if os.path.exists("temp_CVs"):
-            shutil.rmtree("temp_CVs")
-            print("   Cleaned up temp_CVs directory")
 
-        # Step 5: Prepare API Results (no email/file saving in API mode)
+            # Step 6: Send Email Notification (if qualified candidates found and email provided)
+            recipient_email = params['recipient_email']
+            if job.cancelled:
+                print(f"\n6. Skipping email - search was {'suspended' if job.suspended else 'cancelled'}")
+            elif filtered_candidates and recipient_email:
+                print(f"\n6. Sending email notification...")
+                print(f"   Sending results to: {recipient_email}")
+                search_name = search_data.get('name', params['search_keywords'])  # Use search name if available
+                send_email_with_results(filtered_candidates, params['search_keywords'], params['location'],
+                                        params['max_radius'], recipient_email, search_name)
+                print(f"   ✅ Email sent successfully!")
+            elif not recipient_email:
+                print(f"\n6. Skipping email - no recipient email provided")
+            else:
+                print(f"\n6. Skipping email - no qualified candidates found")
+
+        # Steps 2-4: Search, download, extract and evaluate as overlapping pipeline stages
+        print("\n2. Searching, downloading and evaluating candidates...")
+        job = job or PipelineJob()
+        if publisher:
+            job.state['publisher'] = publisher
+        job = run_cv_pipeline(params, notify, browser_fallback=True, job=job, resume=resume)
+        filtered_candidates = job.state['qualified']
+        unique_candidates = job.state.get('unique_candidates', [])
+
+        # Step 5: Prepare API Results (no file saving in API mode)
         print(f"\n5. Preparing results...")
         print(f"   Total found: {len(unique_candidates)}")
         print(f"   After AI filtering: {len(filtered_candidates)}")
 
         # Convert filtered_candidates to API format
-        api_candidates = []
-        for candidate in filtered_candidates:
-            # Extract structured data from candidate
-            api_candidate = {
-                "name": candidate.get('name', 'N/A'),
-                "email": candidate.get('email', 'N/A'),  # CV parsing might not extract email
-                "profile_url": candidate.get('url', 'N/A'),
-                "analysis": candidate.get('ai_response', 'No analysis available'),  # Fixed field name
-                "location": candidate.get('location', 'N/A'),
-                "title": candidate.get('title', 'N/A'),
-                "experience": candidate.get('experience', []),
-                "skills": candidate.get('skills', []),
-                "education": candidate.get('education', [])
-            }
-            api_candidates.append(api_candidate)
+        api_candidates = [to_api_candidate(candidate) for candidate in filtered_candidates]
 
         # Return structured results for API
+        qualified_target = params['qualified_target']
         results = {
             "candidates": api_candidates,
             "total_found": len(unique_candidates),
             "filtered_count": len(filtered_candidates),
-            "search_completed": True,
+            "download_attempts": int(metrics.get("downloads", "attempted")),
+            "downloaded_count": int(metrics.get("downloads", "succeeded")),
+            "search_completed": not job.cancelled,
+            "cancelled": job.cancelled and not job.suspended,
+            "suspended": job.suspended,  # Stopped for a shutdown, resumed from its checkpoint
             "timestamp": datetime.now().isoformat(),
-            "search_keywords": search_keywords,
-            "location": location,
-            "recipient_email": recipient_email  # For Phase 5 email
+            "search_keywords": params['search_keywords'],
+            "location": params['location'],
+            "job_id": metrics.job_id,
+            "prompt_family": prompt_family(params['user_prompt']),
+            "recipient_email": params['recipient_email'],  # For Phase 5 email
+            "qualified_target": qualified_target or None,
+            "quota_reached": bool(qualified_target) and len(filtered_candidates) >= qualified_target,
+            "budget_exhausted": (job.state.get('budgets_exhausted') or [None])[0],  # First budget used up
+            "budgets": {budget: params[param] or None for budget, (param, _) in JOB_BUDGETS.items()},
+            "hard_criteria_rejections": job.state['rejections'],
+            "metrics": metrics.to_dict(),
+            "llm_usage": metrics.llm_usage_summary(),
+            "hedging": hedging_summary(metrics)
         }
-
-        # Step 6: Send Email Notification (if qualified candidates found and email provided)
-        if filtered_candidates and recipient_email:
-            print(f"\n6. Sending email notification...")
-            print(f"   Sending results to: {recipient_email}")
-            search_name = search_data.get('name', search_keywords)  # Use search name if available
-            send_email_with_results(filtered_candidates, search_keywords, location, max_radius, recipient_email, search_name)
-            print(f"   ✅ Email sent successfully!")
-        elif not recipient_email:
-            print(f"\n6. Skipping email - no recipient email provided")
-        else:
-            print(f"\n6. Skipping email - no qualified candidates found")
+        if not job.suspended:
+            record_finished_job(metrics, params['search_keywords'], params['location'], params['user_prompt'],
+                                len(unique_candidates), len(filtered_candidates), time.time() - started_at)
 
         print(f"✅ Pipeline completed successfully!")
         print(f"   Results: {len(api_candidates)} qualified candidates")
@@ -1518,9 +2340,6 @@ def main_pipeline_for_api(search_data: dict) -> dict:
         print(f"❌ Pipeline failed: {e}")
         raise Exception(f"Pipeline execution failed: {str(e)}")
 
-    print("\n=== API Pipeline Complete ===")
-    return [candidate['url'] for candidate in filtered_candidates] if filtered_candidates else []
-
 
 def main():
     """Main entry point - handles both direct execution and FastAPI server mode"""
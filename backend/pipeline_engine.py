@@ -0,0 +1,278 @@
+"""
+Stage-graph pipeline engine for MatchTrex
+A pipeline is a chain of stages connected by bounded queues. Every stage runs its own
+number of workers, so slow stages (browser downloads, LLM calls) overlap instead of
+waiting for fully materialized lists, and a full queue pauses the stages upstream of it.
+Stage code is ordinary blocking code; it runs in worker threads inside the job's context.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from config import PIPELINE_QUEUE_SIZE
+from job_metrics import record_metric
+from job_progress import JobProgress
+
+# End-of-stream marker; each worker of a stage receives exactly one
+_END = object()
+
+class PipelineCancelled(Exception):
+    """Raised inside a stage when the run was cancelled while it waited on a full queue"""
+
+class PipelineJob:
+    """One engine run: its parameters, shared state between stages, progress, cancellation and first error"""
+
+    def __init__(self, params: Optional[Dict] = None):
+        self.params = params or {}
+        self.state: Dict[str, Any] = {}
+        self.progress = JobProgress()
+        self.error: Optional[BaseException] = None
+        self.started_at = time.time()
+        self._cancel_event = threading.Event()
+        self._stages: List["Stage"] = []
+        self._stopped_through: Optional[str] = None  # Applied by the engine if the run has not started yet
+        self._suspended = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def cancel_event(self) -> threading.Event:
+        """Set once the run is cancelled (e.g. to abort in-flight requests)"""
+        return self._cancel_event
+
+    def cancel(self) -> None:
+        """
+        Stop every stage and interrupt their in-flight work; queued items are dropped and
+        finish hooks still run (partial results)
+        """
+        self._cancel_event.set()
+        for stage in self._stages:
+            stage.stop_event.set()
+        for stage in self._stages:
+            try:
+                stage.interrupt(self)
+            except Exception as e:
+                print(f"⚠️ Could not interrupt {stage.name} stage: {e}")
+
+    @property
+    def suspended(self) -> bool:
+        """Stopped by suspend() - to be resumed later rather than reported as cancelled"""
+        return self._suspended
+
+    def suspend(self) -> None:
+        """Stop the run like cancel() so it can be resumed from its checkpoint (e.g. on worker shutdown)"""
+        self._suspended = True
+        self.cancel()
+
+    def fail(self, error: BaseException) -> None:
+        """Record the first fatal error and cancel the run"""
+        if self.error is None:
+            self.error = error
+        self.cancel()
+
+    def stop_through(self, stage_name: str) -> None:
+        """
+        Stop the named stage and all stages before it (e.g. once a quota is met);
+        stages after it keep running on what they already received.
+        """
+        self._stopped_through = stage_name
+        for stage in self._stages:
+            stage.stop_event.set()
+            if stage.name == stage_name:
+                break
+
+class Stage:
+    """
+    Pluggable pipeline component. Subclasses implement process(); the other hooks are optional.
+    Items are handed over in batches of batch_size when it is above 1.
+    """
+
+    name = "stage"
+    critical = False  # An exception in process() fails the run instead of skipping the item
+    record_seconds = True  # Record the stage's wall time under "stage_seconds"
+
+    def __init__(self, workers: int = 1, queue_size: int = PIPELINE_QUEUE_SIZE, batch_size: int = 1):
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.batch_size = max(1, batch_size)
+        self.stop_event = threading.Event()
+
+    @property
+    def stopped(self) -> bool:
+        return self.stop_event.is_set()
+
+    def open(self, job: PipelineJob) -> Any:
+        """Create a per-worker resource (e.g. a browser session); failures fail the run"""
+        return None
+
+    def process(self, job: PipelineJob, item: Any, emit: Callable[[Any], None], resource: Any) -> None:
+        """Handle one item (or a list of items when batching) and emit results downstream"""
+        raise NotImplementedError
+
+    def close(self, job: PipelineJob, resource: Any) -> None:
+        """Release a worker's resource"""
+
+    def interrupt(self, job: PipelineJob) -> None:
+        """Called from another thread when the run is cancelled; abort blocking work (e.g. quit browsers)"""
+
+    def finish(self, job: PipelineJob, emit: Callable[[Any], None]) -> None:
+        """Called once after all workers are done, also when the run was stopped or cancelled"""
+
+class PipelineEngine:
+    """Runs a chain of stages; the items emitted by the last stage are the run's output"""
+
+    def __init__(self, stages: List[Stage], name: str = "pipeline"):
+        self.stages = stages
+        self.name = name
+
+    def run(self, job: PipelineJob, seeds: Iterable[Any]) -> List[Any]:
+        """
+        Run the pipeline to completion from a thread without an event loop.
+        seeds are fed to the first stage. Raises the first fatal stage error.
+        """
+        return asyncio.run(self.run_async(job, list(seeds)))
+
+    async def run_async(self, job: PipelineJob, seeds: List[Any]) -> List[Any]:
+        job._stages = self.stages
+        job.progress.register([stage.name for stage in self.stages])
+        if job.cancelled:
+            for stage in self.stages:
+                stage.stop_event.set()
+        elif job._stopped_through:
+            job.stop_through(job._stopped_through)
+        loop = asyncio.get_running_loop()
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        output: List[Any] = []
+        output_lock = threading.Lock()
+        # Every worker may block in a stage, plus one thread per stage for open/finish hooks
+        executor = ThreadPoolExecutor(
+            max_workers=sum(stage.workers for stage in self.stages) + len(self.stages),
+            thread_name_prefix=self.name
+        )
+
+        def in_thread(function, *args):
+            # Run blocking stage code in the job's context so metrics are attributed to it
+            return loop.run_in_executor(executor, contextvars.copy_context().run, function, *args)
+
+        def make_emit(index: int) -> Callable[[Any], None]:
+            if index + 1 == len(self.stages):
+                def collect(item):
+                    with output_lock:
+                        output.append(item)
+                return collect
+
+            outbox = queues[index + 1]
+            downstream = self.stages[index + 1].name
+
+            def emit(item):
+                # Blocks the calling worker while the downstream queue is full (backpressure)
+                future = asyncio.run_coroutine_threadsafe(outbox.put(item), loop)
+                while True:
+                    try:
+                        future.result(timeout=0.5)
+                        job.progress.received(downstream)
+                        return
+                    except FutureTimeoutError:
+                        if job.cancelled:
+                            future.cancel()
+                            raise PipelineCancelled()
+            return emit
+
+        async def run_stage(index: int, stage: Stage):
+            inbox = queues[index]
+            emit = make_emit(index)
+            first_started: List[float] = []
+
+            async def handle(item, resource):
+                if not first_started:
+                    first_started.append(time.time())
+                    job.progress.started(stage.name)
+                count = len(item) if stage.batch_size > 1 else 1
+                try:
+                    await in_thread(stage.process, job, item, emit, resource)
+                    record_metric("pipeline", f"{stage.name}.processed", count)
+                    job.progress.finished(stage.name, count)
+                except PipelineCancelled:
+                    job.progress.dropped(stage.name, count)
+                except Exception as e:
+                    record_metric("pipeline", f"{stage.name}.errors")
+                    job.progress.finished(stage.name, count, failed=True)
+                    if stage.critical:
+                        print(f"❌ {stage.name} stage failed: {e}")
+                        job.fail(e)
+                    else:
+                        print(f"   Error in {stage.name} stage: {e}")
+
+            async def worker():
+                resource = None
+                try:
+                    resource = await in_thread(stage.open, job)
+                except Exception as e:
+                    print(f"❌ Could not start {stage.name} stage: {e}")
+                    job.fail(e)
+
+                batch = []
+                try:
+                    while True:
+                        item = await inbox.get()
+                        if item is _END:
+                            break
+                        if stage.stopped:
+                            # Drain instead of process so upstream workers never block forever
+                            record_metric("pipeline", f"{stage.name}.dropped")
+                            job.progress.dropped(stage.name)
+                            continue
+                        if stage.batch_size == 1:
+                            await handle(item, resource)
+                            continue
+                        batch.append(item)
+                        if len(batch) >= stage.batch_size:
+                            await handle(batch, resource)
+                            batch = []
+                    if batch and not stage.stopped:
+                        await handle(batch, resource)
+                finally:
+                    try:
+                        await in_thread(stage.close, job, resource)
+                    except Exception as e:
+                        print(f"⚠️ Could not close {stage.name} stage worker: {e}")
+
+            await asyncio.gather(*(worker() for _ in range(stage.workers)))
+
+            try:
+                await in_thread(stage.finish, job, emit)
+            except PipelineCancelled:
+                pass
+            except Exception as e:
+                print(f"❌ {stage.name} stage failed to finish: {e}")
+                job.fail(e)
+
+            job.progress.closed(stage.name)
+            if stage.record_seconds and first_started:
+                record_metric("stage_seconds", stage.name, round(time.time() - first_started[0], 1))
+
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    await queues[index + 1].put(_END)
+
+        async def feed():
+            for seed in seeds:
+                await queues[0].put(seed)
+                job.progress.received(self.stages[0].name)
+            for _ in range(self.stages[0].workers):
+                await queues[0].put(_END)
+
+        try:
+            await asyncio.gather(feed(), *(run_stage(i, stage) for i, stage in enumerate(self.stages)))
+        finally:
+            executor.shutdown(wait=False)
+
+        if job.error is not None:
+            raise job.error
+        return output
@@ -0,0 +1,165 @@
+"""
+Prompt A/B harness for MatchTrex
+Evaluates K prompt variants on the same stored CVs and compares their verdicts,
+token usage and latency. Verdicts go through the evaluation cache, so re-running
+unchanged variants costs (almost) nothing.
+
+Usage:
+    python prompt_ab.py VARIANTS.json (--jobs JOB_ID ... | --corpus PATH ...) [--workers N] [--rps R] [--limit N]
+
+VARIANTS.json is a list of {"name", "user_prompt", "system_prompt", "lenient_instruction"};
+variants without a lenient_instruction use the pipeline's default one. --corpus accepts the
+files understood by measure_cv_encoding.py.
+"""
+
+import argparse
+import contextvars
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from config import PROMPT_AB_WORKERS, PROMPT_AB_RATE_LIMIT_RPS, LLM_RATE_LIMIT_RPS
+from cv_store import load_stored_cvs
+from job_metrics import start_job_metrics
+from llm_client import set_llm_rate_limit
+from measure_cv_encoding import load_corpus
+from mvp import evaluate_candidate_with_mistral
+
+def load_ab_corpus(job_ids: Optional[List[str]] = None, paths: Optional[List[str]] = None) -> List[Dict]:
+    """Corpus entries {account_key, url, cv_data} from stored jobs and/or CV files"""
+    corpus = []
+    for job_id in job_ids or []:
+        corpus.extend({'account_key': record['account_key'], 'url': record['url'], 'cv_data': record['cv_data']}
+                      for record in load_stored_cvs(job_id) if record.get('cv_data'))
+    for i, cv_data in enumerate(load_corpus(paths) if paths else []):
+        # The URL is what an accepting reply echoes back, so file CVs need a unique stand-in
+        corpus.append({'account_key': f"cv-{i}", 'url': f"cv-{i}", 'cv_data': cv_data})
+    return corpus
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(percentile * len(ordered)))], 1)
+
+def _variant_report(name: str, outcomes: List[Dict], metrics) -> Dict:
+    """Accept rate, tokens, latency and cache reuse of one variant"""
+    judged = [outcome for outcome in outcomes if not outcome['error']]
+    accepted = sum(1 for outcome in judged if outcome['accepted'])
+    latencies = [outcome['latency_ms'] for outcome in outcomes]
+    usage = metrics.llm_usage_summary()['total']
+    return {
+        'name': name,
+        'evaluated': len(judged),
+        'errors': len(outcomes) - len(judged),
+        'accepted': accepted,
+        'accept_rate': round(accepted / len(judged), 4) if judged else 0.0,
+        'prompt_tokens': usage['prompt_tokens'],
+        'completion_tokens': usage['completion_tokens'],
+        'total_tokens': usage['total_tokens'],
+        'cost_eur': usage['cost_eur'],
+        'llm_calls': usage['calls'],
+        'llm_avg_latency_ms': usage['avg_latency_ms'],
+        'latency_p50_ms': _percentile(latencies, 0.5),
+        'latency_p90_ms': _percentile(latencies, 0.9),
+        'cache_hits': int(metrics.get("evaluation_cache", "hits")),
+        'cache_misses': int(metrics.get("evaluation_cache", "misses"))
+    }
+
+def agreement_matrix(verdicts: Dict[str, Dict[str, bool]]) -> Dict[str, Dict[str, float]]:
+    """Share of CVs (judged by both) on which each pair of variants gave the same verdict"""
+    matrix = {}
+    for name_a, verdicts_a in verdicts.items():
+        row = {}
+        for name_b, verdicts_b in verdicts.items():
+            shared = [key for key in verdicts_a if key in verdicts_b]
+            same = sum(1 for key in shared if verdicts_a[key] == verdicts_b[key])
+            row[name_b] = round(same / len(shared), 4) if shared else None
+        matrix[name_a] = row
+    return matrix
+
+def run_prompt_ab(variants: List[Dict], corpus: List[Dict], workers: Optional[int] = None,
+                  requests_per_second: Optional[float] = None) -> Dict:
+    """
+    Evaluate every variant on every corpus CV. All evaluations share one worker pool and one
+    request rate limit; each variant accounts its tokens, latency and cache reuse separately.
+    """
+    names = [variant.get('name') or f"variant-{i}" for i, variant in enumerate(variants)]
+    if len(set(names)) != len(names):
+        raise ValueError("Variant names must be unique")
+
+    if requests_per_second is None:
+        requests_per_second = LLM_RATE_LIMIT_RPS or PROMPT_AB_RATE_LIMIT_RPS
+    set_llm_rate_limit(requests_per_second)
+
+    # One metrics context per variant; every evaluation runs in a copy of its variant's context
+    contexts = {}
+    for name in names:
+        context = contextvars.copy_context()
+        contexts[name] = (context, context.run(start_job_metrics, f"ab-{name}"))
+
+    def evaluate(variant, entry):
+        start_time = time.time()
+        accepted, ai_response = evaluate_candidate_with_mistral(
+            entry['cv_data'], entry['url'], variant.get('system_prompt') or "",
+            variant.get('user_prompt') or "", variant.get('lenient_instruction')
+        )
+        return {
+            'account_key': entry['account_key'],
+            'accepted': accepted,
+            'error': ai_response == "Error in evaluation",
+            'latency_ms': (time.time() - start_time) * 1000
+        }
+
+    print(f"🧪 Evaluating {len(variants)} prompt variants on {len(corpus)} CVs "
+          f"({requests_per_second or 'unlimited'} requests/s)")
+    started_at = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers or PROMPT_AB_WORKERS)) as executor:
+            # Interleave variants so each one sees the same share of the rate limit
+            futures = [
+                (name, executor.submit(contexts[name][0].copy().run, evaluate, variant, entry))
+                for entry in corpus
+                for name, variant in zip(names, variants)
+            ]
+            outcomes = {name: [] for name in names}
+            for name, future in futures:
+                outcomes[name].append(future.result())
+    finally:
+        set_llm_rate_limit(LLM_RATE_LIMIT_RPS)
+
+    verdicts = {
+        name: {outcome['account_key']: outcome['accepted'] for outcome in outcomes[name] if not outcome['error']}
+        for name in names
+    }
+    return {
+        'corpus_size': len(corpus),
+        'duration_s': round(time.time() - started_at, 1),
+        'requests_per_second': requests_per_second,
+        'variants': [_variant_report(name, outcomes[name], contexts[name][1]) for name in names],
+        'agreement': agreement_matrix(verdicts),
+        'verdicts': verdicts
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare prompt variants on stored CVs")
+    parser.add_argument("variants", help="JSON file with the list of prompt variants")
+    parser.add_argument("--jobs", nargs="*", default=[], help="Jobs whose stored CVs form the corpus")
+    parser.add_argument("--corpus", nargs="*", default=[], help="CV files or directories for the corpus")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent evaluations")
+    parser.add_argument("--rps", type=float, default=None, help="Shared Mistral requests per second")
+    parser.add_argument("--limit", type=int, default=None, help="Use only the first N CVs")
+    args = parser.parse_args()
+
+    with open(args.variants, 'r', encoding='utf-8') as f:
+        variants = json.load(f)
+    corpus = load_ab_corpus(args.jobs, args.corpus)[:args.limit]
+    if not variants or not corpus:
+        print("❌ Need at least one variant and one CV")
+        sys.exit(1)
+
+    report = run_prompt_ab(variants, corpus, args.workers, args.rps)
+    report.pop('verdicts')
+    print(json.dumps(report, indent=2, ensure_ascii=False))
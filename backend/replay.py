@@ -0,0 +1,121 @@
+"""
+Evaluation replay for MatchTrex
+Re-runs only the evaluation stage of a past job on its stored CVs with new prompts,
+so prompt experiments need no Indeed search or browser downloads
+
+Usage:
+    python replay.py JOB_ID --user-prompt-file PROMPT.txt [--system-prompt-file SYSTEM.txt] [--workers N]
+"""
+
+import argparse
+import contextvars
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import REPLAY_WORKERS
+from cv_store import load_stored_cvs
+from hard_criteria import parse_hard_criteria
+from job_metrics import start_job_metrics, record_metric
+from llm_client import hedging_summary
+from mvp import evaluate_extracted_cv, extract_cv_data_from_text
+
+def replay_stored_cv(record: Dict, system_prompt: str, user_prompt: str, hard_criteria: Optional[Dict],
+                     rejections: List[Dict]) -> Dict:
+    """Evaluate one stored CV; re-extracts cv_data from the stored text if it is missing"""
+    cv_data = record.get('cv_data')
+    if not cv_data and record.get('cv_text'):
+        cv_data = extract_cv_data_from_text(record['cv_text'])
+        record_metric("replay", "re_extracted")
+    if not cv_data:
+        record_metric("replay", "skipped")
+        return {'account_key': record['account_key'], 'qualified': None, 'candidate': None}
+
+    candidate = evaluate_extracted_cv(cv_data, record['url'], system_prompt, user_prompt, hard_criteria, rejections)
+    record_metric("replay", "evaluated")
+    return {'account_key': record['account_key'], 'qualified': candidate is not None, 'candidate': candidate}
+
+def replay_job(job_id: str, system_prompt: str, user_prompt: str, hard_criteria=None,
+               workers: Optional[int] = None, limit: Optional[int] = None) -> Dict:
+    """
+    Re-evaluate the stored CVs of job_id with new prompts (and optional hard criteria) concurrently.
+    Returns the qualified candidates in the original processing order, a verdict per account key,
+    and the replay's own metrics and LLM usage.
+    """
+    records = load_stored_cvs(job_id)
+    if not records:
+        raise ValueError(f"No stored CVs for job {job_id}")
+    if limit:
+        records = records[:limit]
+
+    metrics = start_job_metrics()
+    started_at = time.time()
+    hard_criteria = parse_hard_criteria(hard_criteria)
+    rejections = []
+    print(f"🔁 Replaying evaluation of {len(records)} stored CVs from job {job_id}")
+
+    def evaluate(record):
+        try:
+            return replay_stored_cv(record, system_prompt, user_prompt, hard_criteria, rejections)
+        except Exception as e:
+            print(f"   Error replaying {record['account_key']}: {e}")
+            record_metric("replay", "errors")
+            return {'account_key': record['account_key'], 'qualified': None, 'candidate': None}
+
+    # Each evaluation runs in the replay's context so metrics and LLM usage are attributed to it
+    with ThreadPoolExecutor(max_workers=max(1, workers or REPLAY_WORKERS)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, evaluate, record) for record in records]
+        outcomes = [future.result() for future in futures]
+
+    candidates = [outcome['candidate'] for outcome in outcomes if outcome['candidate']]
+    duration_s = round(time.time() - started_at, 1)
+    record_metric("stage_seconds", "evaluate", duration_s)
+    print(f"✅ Replay finished: {len(candidates)}/{len(records)} qualified in {duration_s}s")
+
+    return {
+        'replay_id': metrics.job_id,
+        'source_job_id': job_id,
+        'candidates': candidates,
+        'verdicts': {outcome['account_key']: outcome['qualified'] for outcome in outcomes},
+        'evaluated_count': len(records),
+        'filtered_count': len(candidates),
+        'hard_criteria_rejections': rejections,
+        'duration_s': duration_s,
+        'timestamp': datetime.now().isoformat(),
+        'metrics': metrics.to_dict(),
+        'llm_usage': metrics.llm_usage_summary(),
+        'hedging': hedging_summary(metrics)
+    }
+
+def _read_file(path: Optional[str]) -> str:
+    if not path:
+        return ""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-evaluate a past job's stored CVs with new prompts")
+    parser.add_argument("job_id", help="Job whose stored CVs are replayed")
+    parser.add_argument("--user-prompt-file", required=True, help="File with the new user prompt")
+    parser.add_argument("--system-prompt-file", help="File with the new system prompt")
+    parser.add_argument("--hard-criteria-file", help="JSON file with hard criteria")
+    parser.add_argument("--workers", type=int, default=None, help="Concurrent evaluations")
+    parser.add_argument("--limit", type=int, default=None, help="Replay only the first N CVs")
+    args = parser.parse_args()
+
+    try:
+        result = replay_job(
+            args.job_id,
+            _read_file(args.system_prompt_file),
+            _read_file(args.user_prompt_file),
+            _read_file(args.hard_criteria_file) or None,
+            args.workers,
+            args.limit
+        )
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(json.dumps({key: value for key, value in result.items() if key != 'candidates'}, indent=2, ensure_ascii=False))
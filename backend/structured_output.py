@@ -0,0 +1,307 @@
+"""
+Schema-constrained structured output for MistralAI calls
+Requests JSON with a declared schema, validates the reply and re-asks only for the malformed part
+"""
+
+import json
+from typing import Dict, List, Optional, Tuple
+
+from llm_client import chat_completion, get_message_content, get_usage
+from job_metrics import record_metric
+
+# Schema for CV data extraction (mirrors the extraction prompt format)
+CV_DATA_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "location": {"type": "string"},
+        "experience": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "title": {"type": "string"},
+                    "company": {"type": "string"},
+                    "dates": {"type": "string"},
+                    "location": {"type": "string"}
+                },
+                "required": ["title", "company", "dates", "location"]
+            }
+        },
+        "skills": {"type": "array", "items": {"type": "string"}},
+        "education": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "degree": {"type": "string"},
+                    "institution": {"type": "string"},
+                    "dates": {"type": "string"}
+                },
+                "required": ["degree", "institution", "dates"]
+            }
+        }
+    },
+    "required": ["name", "location", "experience", "skills", "education"]
+}
+
+# Schema for single-candidate evaluation: the qualifying profile URLs (empty if rejected)
+EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "qualified_urls": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["qualified_urls"]
+}
+
+# Schema for the fast cascade tier: same verdict plus the model's confidence in it
+CASCADE_EVALUATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "qualified_urls": {"type": "array", "items": {"type": "string"}},
+        "confidence": {"type": "number", "minimum": 0, "maximum": 1}
+    },
+    "required": ["qualified_urls", "confidence"]
+}
+
+_JSON_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "null": type(None)
+}
+
+def validate_against_schema(data, schema: Dict, path: str = "") -> List[Tuple[str, str]]:
+    """
+    Validate data against the subset of JSON Schema used here
+    (type, properties, required, items, enum, minimum, maximum).
+    Returns a list of (path, message) tuples; empty means valid.
+    """
+    errors = []
+    expected = schema.get("type")
+
+    if expected in ("number", "integer"):
+        if isinstance(data, bool) or not isinstance(data, (int, float)) or (expected == "integer" and not isinstance(data, int)):
+            return [(path or "$", f"expected {expected}")]
+        if "minimum" in schema and data < schema["minimum"]:
+            errors.append((path or "$", f"must be >= {schema['minimum']}"))
+        if "maximum" in schema and data > schema["maximum"]:
+            errors.append((path or "$", f"must be <= {schema['maximum']}"))
+    elif expected:
+        python_type = _JSON_TYPES.get(expected)
+        if python_type and not isinstance(data, python_type):
+            return [(path or "$", f"expected {expected}")]
+
+    if "enum" in schema and data not in schema["enum"]:
+        errors.append((path or "$", f"must be one of {schema['enum']}"))
+
+    if isinstance(data, dict):
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append((f"{path}.{key}" if path else key, "missing required field"))
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in data:
+                errors.extend(validate_against_schema(data[key], sub_schema, f"{path}.{key}" if path else key))
+
+    if isinstance(data, list) and "items" in schema:
+        for i, item in enumerate(data):
+            errors.extend(validate_against_schema(item, schema["items"], f"{path}[{i}]"))
+
+    return errors
+
+def parse_json_content(content: str):
+    """Parse a JSON reply, tolerating markdown fences and surrounding text. Raises ValueError."""
+    text = content.strip()
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif text.startswith("```"):
+        text = text.split("```")[1].strip()
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as first_error:
+        # Fall back to the outermost object/array in the reply
+        for opener, closer in (("{", "}"), ("[", "]")):
+            start, end = text.find(opener), text.rfind(closer)
+            if start != -1 and end > start:
+                try:
+                    return json.loads(text[start:end + 1])
+                except json.JSONDecodeError:
+                    continue
+        raise ValueError(f"invalid JSON: {first_error}")
+
+class JsonValueScanner:
+    """
+    Finds the first complete JSON array or object in a growing (streamed) reply.
+    scan() gets the whole text received so far but only reads the part it has not seen yet;
+    nesting depth, string and escape state are kept between calls, so a reply is scanned once.
+    """
+
+    def __init__(self):
+        self.value = None
+        self._position = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def scan(self, text: str):
+        """Returns the parsed value once its closing bracket arrived, otherwise None"""
+        while self.value is None and self._position < len(text):
+            i, char = self._position, text[self._position]
+            self._position += 1
+            if self._start is None:
+                if char in "[{":
+                    self._start, self._depth = i, 1
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "[{":
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        self.value = json.loads(text[self._start:i + 1])
+                    except json.JSONDecodeError:
+                        # Not JSON after all (e.g. "[see below]"), keep looking after it
+                        self._start = None
+        return self.value
+
+def scan_json_value(text: str):
+    """First complete JSON array or object in a (possibly partial) reply, or None"""
+    return JsonValueScanner().scan(text)
+
+def _response_format(schema: Dict, schema_name: str) -> Dict:
+    """Mistral response_format block for a JSON schema"""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": schema_name, "schema": schema, "strict": True}
+    }
+
+def _top_level_fields(errors: List[Tuple[str, str]]) -> List[str]:
+    """Top-level property names affected by validation errors"""
+    fields = []
+    for path, _ in errors:
+        field = path.split(".")[0].split("[")[0]
+        if field and field != "$" and field not in fields:
+            fields.append(field)
+    return fields
+
+def request_structured(messages: List[Dict], schema: Dict, schema_name: str, model: str,
+                       max_tokens: int = 1000, temperature: float = 0.1,
+                       max_repairs: int = 1, stage: str = "other") -> Tuple[Optional[Dict], str]:
+    """
+    Run a chat completion constrained to a JSON schema.
+    Invalid fields are re-requested on their own and merged into the first reply;
+    only a reply that is not JSON at all is re-requested in full.
+    Returns (data or None, raw content of the reply the data came from; after a field repair,
+    the merged JSON).
+    """
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "response_format": _response_format(schema, schema_name)
+    }
+
+    record_metric("structured_output", "calls")
+    result = chat_completion(payload, stage=stage)
+    raw_content = get_message_content(result)
+    # Tokens of calls whose output currently backs `data` (wasted if it is discarded)
+    pending_tokens = get_usage(result)['total_tokens']
+
+    data = None
+    attempts = 0
+    while True:
+        try:
+            data = parse_json_content(raw_content) if data is None else data
+            errors = validate_against_schema(data, schema)
+        except ValueError as e:
+            errors = [("$", str(e))]
+            record_metric("structured_output", "parse_failures")
+            # Nothing in an unparseable reply can be reused
+            record_metric("structured_output", "wasted_tokens", pending_tokens)
+            pending_tokens = 0
+            data = None
+
+        if not errors:
+            if attempts:
+                record_metric("structured_output", "repaired")
+            return data, raw_content
+
+        if data is not None:
+            record_metric("structured_output", "validation_failures")
+
+        if attempts >= max_repairs:
+            print(f"❌ Structured output still invalid after {attempts} repair(s): {errors[:5]}")
+            record_metric("structured_output", "unrecovered")
+            record_metric("structured_output", "wasted_tokens", pending_tokens)
+            return None, raw_content
+
+        attempts += 1
+        record_metric("structured_output", "repair_calls")
+        error_lines = "\n".join(f"- {path}: {message}" for path, message in errors[:20])
+
+        fields = _top_level_fields(errors) if isinstance(data, dict) else []
+        if fields:
+            # Re-ask only for the malformed fields
+            repair_schema = {
+                "type": "object",
+                "properties": {field: schema["properties"][field] for field in fields if field in schema.get("properties", {})},
+                "required": [field for field in fields if field in schema.get("properties", {})]
+            }
+            repair_prompt = (f"These fields of your previous answer are invalid:\n{error_lines}\n\n"
+                             f"Return ONLY a JSON object containing corrected values for: {', '.join(fields)}.")
+        else:
+            repair_schema = schema
+            repair_prompt = (f"Your previous answer could not be used:\n{error_lines}\n\n"
+                             f"Return ONLY the complete, valid JSON object.")
+
+        print(f"⚠️ Structured output invalid, re-asking for: {', '.join(fields) if fields else 'full response'}")
+        repair_payload = dict(payload)
+        repair_payload["messages"] = messages + [
+            {"role": "assistant", "content": raw_content},
+            {"role": "user", "content": repair_prompt}
+        ]
+        repair_payload["response_format"] = _response_format(repair_schema, f"{schema_name}_repair")
+
+        try:
+            repair_result = chat_completion(repair_payload, stage=stage)
+        except Exception as e:
+            print(f"❌ Structured output repair call failed: {e}")
+            record_metric("structured_output", "unrecovered")
+            record_metric("structured_output", "wasted_tokens", pending_tokens)
+            return None, raw_content
+
+        repair_content = get_message_content(repair_result)
+        repair_tokens = get_usage(repair_result)['total_tokens']
+
+        if fields:
+            try:
+                patch = parse_json_content(repair_content)
+            except ValueError:
+                record_metric("structured_output", "parse_failures")
+                record_metric("structured_output", "wasted_tokens", repair_tokens)
+                continue
+            pending_tokens += repair_tokens
+            if isinstance(patch, dict):
+                data.update({key: value for key, value in patch.items() if key in fields})
+                # The merged reply is what callers (and the evaluation cache) should keep
+                raw_content = json.dumps(data, ensure_ascii=False)
+        else:
+            if data is not None:
+                # Parsed but unusable as a whole (e.g. wrong top-level type)
+                record_metric("structured_output", "wasted_tokens", pending_tokens)
+            raw_content = repair_content
+            pending_tokens = repair_tokens
+            data = None
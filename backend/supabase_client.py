@@ -4,11 +4,15 @@ Handles all database operations for search management
 """
 
 import os
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from config import PUBLISH_BATCH_SIZE, PUBLISH_INTERVAL_S
+
 # Load environment variables
 load_dotenv()
 
@@ -51,8 +55,13 @@ def load_search_from_supabase(search_id: str) -> Optional[Dict]:
         print(f"❌ Error loading search {search_id}: {e}")
         return None
 
-def update_search_status(search_id: str, status: str, progress: str = None, error: str = None) -> bool:
-    """Update search status in Supabase"""
+def update_search_status(search_id: str, status: str, progress: Union[str, Dict, None] = None,
+                         error: str = None) -> bool:
+    """
+    Update search status in Supabase
+    progress is a message or a structured snapshot (JobProgress.compact()); it is stored in the
+    progress column together with the error, if any
+    """
     if not supabase:
         print(f"❌ Supabase client not available - would update {search_id} to {status}")
         return False
@@ -60,9 +69,14 @@ def update_search_status(search_id: str, status: str, progress: str = None, erro
     try:
         update_data = {'status': status}
 
-        # Only add progress/error if the columns exist in the schema
-        # We'll try to update and gracefully handle missing columns
-        if status == 'completed':
+        # Progress/error go to the progress column; a schema without it falls back to the basic update below
+        if progress is not None or error:
+            progress_data = {'message': progress} if isinstance(progress, str) else dict(progress or {})
+            if error:
+                progress_data['error'] = error
+            progress_data['updated_at'] = datetime.now().isoformat()
+            update_data['progress'] = progress_data
+        if status in ('completed', 'cancelled'):
             update_data['completed_at'] = datetime.now().isoformat()
 
         response = supabase.table('searches').update(update_data).eq('id', search_id).execute()
@@ -89,8 +103,8 @@ def update_search_status(search_id: str, status: str, progress: str = None, erro
             print(f"❌ Error updating search {search_id} status: {e}")
             return False
 
-def update_search_results(search_id: str, results: Dict) -> bool:
-    """Update search results in Supabase"""
+def update_search_results(search_id: str, results: Dict, status: str = 'completed') -> bool:
+    """Update search results in Supabase (status 'cancelled' for the partial results of a cancelled search)"""
     if not supabase:
         print(f"❌ Supabase client not available - would update {search_id} with results")
         return False
@@ -98,7 +112,7 @@ def update_search_results(search_id: str, results: Dict) -> bool:
     try:
         update_data = {
             'results': results,
-            'status': 'completed',
+            'status': status,
             'completed_at': datetime.now().isoformat()
         }
 
@@ -147,6 +161,181 @@ def mark_search_failed(search_id: str, error_message: str) -> bool:
             print(f"❌ Error marking search {search_id} as failed: {e}")
             return False
 
+def load_completed_search_results(limit: int = 500) -> List[Dict]:
+    """Results payloads of the most recent completed searches (for yield/cost estimates)"""
+    if not supabase:
+        return []
+
+    try:
+        response = (supabase.table('searches').select('results')
+                    .eq('status', 'completed').order('completed_at', desc=True).limit(limit).execute())
+        return [row['results'] for row in response.data or [] if row.get('results')]
+    except Exception as e:
+        print(f"❌ Error loading completed search results: {e}")
+        return []
+
+def append_search_candidates(search_id: str, candidates: List[Dict]) -> bool:
+    """Append qualified candidates to a search (rows already stored for a profile URL are kept)"""
+    if not supabase:
+        print(f"❌ Supabase client not available - would append {len(candidates)} candidates to {search_id}")
+        return False
+
+    rows = [{
+        'search_id': search_id,
+        'profile_url': candidate.get('profile_url'),
+        'rank': candidate.get('rank'),
+        'candidate': candidate
+    } for candidate in candidates]
+    try:
+        supabase.table('search_candidates').upsert(
+            rows, on_conflict='search_id,profile_url', ignore_duplicates=True
+        ).execute()
+        return True
+    except Exception as e:
+        print(f"❌ Error appending candidates to search {search_id}: {e}")
+        return False
+
+def update_search_progress(search_id: str, qualified_count: int, evaluated_count: int) -> bool:
+    """Update the running counters of a search"""
+    if not supabase:
+        return False
+
+    try:
+        supabase.table('searches').update({
+            'qualified_count': qualified_count,
+            'evaluated_count': evaluated_count
+        }).eq('id', search_id).execute()
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not update progress of search {search_id}: {e}")
+        return False
+
+def load_search_candidates(search_id: str) -> List[Dict]:
+    """Candidates published for a search, in rank order"""
+    if not supabase:
+        return []
+
+    try:
+        response = (supabase.table('search_candidates').select('candidate')
+                    .eq('search_id', search_id).order('rank').execute())
+        return [row['candidate'] for row in response.data or []]
+    except Exception as e:
+        print(f"❌ Error loading candidates of search {search_id}: {e}")
+        return []
+
+class SearchCandidatePublisher:
+    """
+    Publishes a running search's qualified candidates and counters to Supabase in small batches.
+    A batch is written once PUBLISH_BATCH_SIZE candidates are waiting or PUBLISH_INTERVAL_S passed;
+    failed batches stay queued and are retried with the next write.
+    Searches coalesced with this one can be attached and receive the same candidates.
+    """
+
+    def __init__(self, search_id: str, batch_size: int = PUBLISH_BATCH_SIZE,
+                 interval: float = PUBLISH_INTERVAL_S):
+        self.search_id = search_id
+        self.search_ids = [search_id]  # This search and the ones attached to it
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.qualified_count = 0
+        self.evaluated_count = 0
+        self._pending: List[Dict] = []
+        self._published = set()  # Profile URLs already stored
+        self._published_candidates: List[Dict] = []
+        self._incomplete = set()  # Attached searches that missed earlier candidates (rewritten by finish)
+        self._dirty = False
+        self._last_write = time.time()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # Keeps batches in order when several workers flush
+
+    def start(self, qualified: Optional[List[Dict]] = None, evaluated_count: int = 0) -> None:
+        """Set the counters of a resumed job; its qualified candidates are published again (idempotent)"""
+        with self._lock:
+            self._pending.extend(qualified or [])
+            self.qualified_count = len(qualified or [])
+            self.evaluated_count = evaluated_count
+            self._dirty = True
+        self.flush()
+
+    def record(self, candidate: Optional[Dict]) -> None:
+        """Count one evaluated CV; candidate is its API record if it qualified"""
+        with self._lock:
+            self.evaluated_count += 1
+            self._dirty = True
+            if candidate:
+                self._pending.append(candidate)
+                self.qualified_count += 1
+            due = (len(self._pending) >= self.batch_size
+                   or time.time() - self._last_write >= self.interval)
+        if due:
+            self.flush()
+
+    def flush(self) -> bool:
+        """Write waiting candidates and the counters; returns False if the candidates could not be written"""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return True
+                batch = list(self._pending)
+                qualified_count, evaluated_count = self.qualified_count, self.evaluated_count
+                self._dirty = False
+                self._last_write = time.time()
+
+                search_ids = list(self.search_ids)
+
+            written = not batch or all([append_search_candidates(search_id, batch) for search_id in search_ids])
+            with self._lock:
+                if written:
+                    del self._pending[:len(batch)]
+                    self._published.update(candidate.get('profile_url') for candidate in batch)
+                    self._published_candidates.extend(batch)
+                else:
+                    self._dirty = True
+            for search_id in search_ids:
+                update_search_progress(search_id, qualified_count, evaluated_count)
+            if written and batch:
+                print(f"   📤 Published {len(batch)} candidates ({qualified_count} qualified / {evaluated_count} evaluated)")
+            return written
+
+    def attach(self, search_id: str) -> bool:
+        """Publish to another search as well, starting with the candidates published so far"""
+        with self._write_lock:
+            with self._lock:
+                if search_id in self.search_ids:
+                    return True
+                self.search_ids.append(search_id)
+                published = list(self._published_candidates)
+                qualified_count, evaluated_count = self.qualified_count, self.evaluated_count
+            written = not published or append_search_candidates(search_id, published)
+            if not written:
+                self._incomplete.add(search_id)
+            update_search_progress(search_id, qualified_count, evaluated_count)
+            return written
+
+    def detach(self, search_id: str) -> None:
+        """Stop publishing to an attached search"""
+        with self._lock:
+            if search_id != self.search_id and search_id in self.search_ids:
+                self.search_ids.remove(search_id)
+            self._incomplete.discard(search_id)
+
+    def finish(self, candidates: List[Dict]) -> bool:
+        """
+        Make sure the final candidate list is published (also candidates that never went through
+        the evaluation, e.g. fallback results). Returns True if all of them are stored.
+        """
+        with self._lock:
+            waiting = {candidate.get('profile_url') for candidate in self._pending}
+            self._pending.extend(candidate for candidate in candidates
+                                 if candidate.get('profile_url') not in self._published | waiting)
+            self.qualified_count = len(candidates)
+            self._dirty = True
+        written = self.flush()
+        for search_id in list(self._incomplete):
+            if append_search_candidates(search_id, candidates):
+                self._incomplete.discard(search_id)
+        return written and not self._incomplete
+
 # Test function for debugging
 def test_supabase_connection():
     """Test the Supabase connection"""
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Pipeline worker for MatchTrex
+Claims search jobs from the shared job queue and runs them (Chrome and the LLM pipeline), writing
+progress and results back to the queue and Supabase. Start any number of worker processes against
+the same queue database and run the API with API_RUN_WORKERS=false so it only serves HTTP.
+Each process runs JOB_WORKERS pipelines at a time.
+The default SQLite queue and checkpoint files only work for processes on one host. Workers on
+several hosts need JOB_QUEUE_URL (and CHECKPOINT_DB_URL to resume each other's jobs) set to a
+shared Postgres database.
+"""
+
+import asyncio
+import signal
+
+from api import ensure_chrome_installed, resume_from_checkpoints, start_queue_workers, stop_queue_workers
+from config import JOB_QUEUE_DB_PATH, JOB_QUEUE_URL
+
+async def run_worker():
+    """Run queue workers until the process is stopped"""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    print(f"🚀 MatchTrex worker starting (queue: {'Postgres' if JOB_QUEUE_URL else JOB_QUEUE_DB_PATH})")
+    resume_from_checkpoints()
+    start_queue_workers()
+    await stop.wait()
+
+    # Running jobs are suspended and handed back to the queue for another worker to resume
+    print("⭐ MatchTrex worker shutting down...")
+    await stop_queue_workers()
+
+if __name__ == "__main__":
+    ensure_chrome_installed()
+    asyncio.run(run_worker())
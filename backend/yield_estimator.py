@@ -0,0 +1,148 @@
+"""
+Yield-rate estimator for MatchTrex searches
+Learns accept rates per prompt/keyword/location family from past jobs (beta-binomial model)
+and sizes the candidate pull needed to reach a requested shortlist with a given confidence
+"""
+
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+from config import YIELD_PRIOR_ACCEPT_RATE, YIELD_PRIOR_STRENGTH, YIELD_MAX_DOWNLOADS
+from evaluation_cache import hash_text
+from job_history import load_job_history
+
+# Connectives of Indeed keyword queries ("Verkäufer or Verkäuferin ...")
+_QUERY_WORDS = {"or", "and", "not", "oder", "und"}
+
+def keyword_family(search_keywords: Optional[str]) -> str:
+    """Order-insensitive normalized keyword set"""
+    words = re.findall(r"\w+", (search_keywords or "").lower())
+    return " ".join(sorted({word for word in words if word not in _QUERY_WORDS}))
+
+def location_family(location: Optional[str]) -> str:
+    return " ".join((location or "").lower().split())
+
+def prompt_family(user_prompt: Optional[str]) -> str:
+    """Short hash of the whitespace/case-normalized evaluation prompt"""
+    return hash_text(" ".join((user_prompt or "").lower().split()))[:12]
+
+def _observation(entry: Dict) -> Optional[Dict]:
+    """Normalize a job history entry or a stored results payload into one observation"""
+    evaluated = entry.get('downloaded', entry.get('downloaded_count'))
+    qualified = entry.get('qualified', entry.get('filtered_count'))
+    if not evaluated or qualified is None:
+        return None
+    return {
+        'job_id': entry.get('job_id'),
+        'prompt': entry.get('prompt_family') or "",
+        'keywords': keyword_family(entry.get('search_keywords')),
+        'location': location_family(entry.get('location')),
+        'evaluated': int(evaluated),
+        'accepted': min(int(qualified), int(evaluated)),
+        'attempts': int(entry.get('download_attempts') or evaluated)
+    }
+
+def collect_observations(extra_results: Optional[List[Dict]] = None) -> List[Dict]:
+    """Observations from the local job history plus stored results (e.g. Supabase), one per job"""
+    observations = {}
+    for index, entry in enumerate(load_job_history() + list(extra_results or [])):
+        observation = _observation(entry)
+        if observation:
+            observations[observation['job_id'] or f"entry-{index}"] = observation
+    return list(observations.values())
+
+def estimate_accept_rate(search_keywords: str, location: str, user_prompt: str,
+                         observations: List[Dict]) -> Dict:
+    """
+    Beta posterior of the accept rate for a search.
+    Starts from the configured prior and refines it level by level (all jobs, same prompt,
+    + same keywords, + same location); each level's posterior becomes the next level's prior
+    with limited strength, so sparse specific data shifts but does not dominate the estimate.
+    """
+    family = {
+        'prompt': prompt_family(user_prompt),
+        'keywords': keyword_family(search_keywords),
+        'location': location_family(location)
+    }
+
+    if any(obs['prompt'] == family['prompt'] for obs in observations):
+        chain = [(), ('prompt',), ('prompt', 'keywords'), ('prompt', 'keywords', 'location')]
+    else:
+        chain = [(), ('keywords',), ('keywords', 'location')]
+
+    alpha = YIELD_PRIOR_ACCEPT_RATE * YIELD_PRIOR_STRENGTH
+    beta = (1 - YIELD_PRIOR_ACCEPT_RATE) * YIELD_PRIOR_STRENGTH
+    level, used = "prior", 0
+    for keys in chain:
+        matching = [obs for obs in observations if all(obs[key] == family[key] for key in keys)]
+        if not matching:
+            break
+        if keys:
+            # Shrink the broader estimate to a prior of fixed strength before adding this level's data
+            mean = alpha / (alpha + beta)
+            alpha, beta = mean * YIELD_PRIOR_STRENGTH, (1 - mean) * YIELD_PRIOR_STRENGTH
+        alpha += sum(obs['accepted'] for obs in matching)
+        beta += sum(obs['evaluated'] - obs['accepted'] for obs in matching)
+        level, used = "+".join(keys) or "all", len(matching)
+
+    return {'alpha': alpha, 'beta': beta, 'accept_rate': alpha / (alpha + beta), 'level': level, 'jobs': used}
+
+def _beta_binomial_tail(n: int, k_min: int, alpha: float, beta: float) -> float:
+    """P(X >= k_min) for X ~ BetaBinomial(n, alpha, beta)"""
+    if k_min <= 0:
+        return 1.0
+    if k_min > n:
+        return 0.0
+    log_norm = math.lgamma(alpha + beta) - math.lgamma(alpha) - math.lgamma(beta) - math.lgamma(n + alpha + beta)
+    below = 0.0
+    for k in range(k_min):
+        log_pmf = (math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+                   + math.lgamma(k + alpha) + math.lgamma(n - k + beta) + log_norm)
+        below += math.exp(log_pmf)
+    return max(0.0, 1.0 - below)
+
+def downloads_for_shortlist(shortlist_size: int, confidence: float, alpha: float, beta: float) -> Tuple[int, float]:
+    """
+    Smallest number of evaluated CVs that yields at least shortlist_size accepts with the given probability.
+    Returns (downloads, achieved probability); capped at YIELD_MAX_DOWNLOADS.
+    """
+    if _beta_binomial_tail(YIELD_MAX_DOWNLOADS, shortlist_size, alpha, beta) < confidence:
+        return YIELD_MAX_DOWNLOADS, _beta_binomial_tail(YIELD_MAX_DOWNLOADS, shortlist_size, alpha, beta)
+
+    low, high = shortlist_size, YIELD_MAX_DOWNLOADS
+    while low < high:
+        middle = (low + high) // 2
+        if _beta_binomial_tail(middle, shortlist_size, alpha, beta) >= confidence:
+            high = middle
+        else:
+            low = middle + 1
+    return low, _beta_binomial_tail(low, shortlist_size, alpha, beta)
+
+def plan_candidate_pull(shortlist_size: int, confidence: float, search_keywords: str, location: str,
+                        user_prompt: str, extra_results: Optional[List[Dict]] = None) -> Dict:
+    """
+    How many profiles to pull (and CVs to download) to reach shortlist_size qualified candidates
+    with the given confidence, based on the learned accept rate and download success rate.
+    """
+    observations = collect_observations(extra_results)
+    rate = estimate_accept_rate(search_keywords, location, user_prompt, observations)
+    downloads, probability = downloads_for_shortlist(shortlist_size, confidence, rate['alpha'], rate['beta'])
+
+    # Share of download attempts that produce a usable CV (pooled over all jobs, lightly smoothed)
+    attempts = sum(obs['attempts'] for obs in observations)
+    succeeded = sum(obs['evaluated'] for obs in observations)
+    download_success_rate = (succeeded + 8) / (attempts + 10)
+
+    return {
+        'shortlist_size': shortlist_size,
+        'confidence': confidence,
+        'accept_rate': round(rate['accept_rate'], 4),
+        'accept_rate_level': rate['level'],
+        'history_jobs': rate['jobs'],
+        'downloads': downloads,
+        'download_success_rate': round(download_success_rate, 4),
+        'profiles_to_pull': min(YIELD_MAX_DOWNLOADS, math.ceil(downloads / download_success_rate)),
+        'probability': round(probability, 4),
+        'reachable': probability >= confidence
+    }
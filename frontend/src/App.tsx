@@ -21,7 +21,7 @@ interface Search {
   user_prompt: string | null;
   system_prompt: string | null;
   results: any;
-  status: 'pending' | 'processing' | 'completed' | 'failed';
+  status: 'pending' | 'processing' | 'completed' | 'failed' | 'cancelled';
   created_at: string;
   completed_at: string | null;
 }
@@ -1,6 +1,10 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
 import { ArrowLeft, Copy, ExternalLink, Calendar, MapPin, Briefcase, FileText, Search, Clock, Users, Mail, Navigation } from 'lucide-react';
 import { formatPromptText } from '../utils/formatPromptText';
+import { supabase } from '../lib/supabase';
+
+// Reload interval for running searches (qualified candidates are published while they run)
+const REFRESH_INTERVAL_MS = 5000;
 
 interface Search {
   id: string;
@@ -10,15 +14,30 @@ interface Search {
   resume_last_updated_days: number | null;
   target_candidates: number | null;
   max_radius: number | null;
+  qualified_target?: number | null;
+  max_downloads?: number | null;
+  shortlist_size?: number | null;
   recipient_email: string | null;
   user_prompt: string | null;
   system_prompt: string | null;
   results: any;
-  status: 'pending' | 'processing' | 'completed' | 'failed';
+  status: 'pending' | 'processing' | 'completed' | 'failed' | 'cancelled';
+  qualified_count?: number | null;
+  evaluated_count?: number | null;
+  max_wall_time_s?: number | null;
+  max_llm_tokens?: number | null;
+  max_page_loads?: number | null;
+  progress?: { stages?: Record<string, [number, number, number]>; eta_s?: number | null } | null;
   created_at: string;
   completed_at: string | null;
 }
 
+const budgetLabels: Record<string, string> = {
+  wall_time: 'Laufzeit',
+  llm_tokens: 'LLM-Tokens',
+  page_loads: 'Seitenaufrufe'
+};
+
 interface SearchDetailProps {
   search: Search;
   onBack: () => void;
@@ -26,6 +45,45 @@ interface SearchDetailProps {
 }
 
 export default function SearchDetail({ search, onBack, onCopyFilters }: SearchDetailProps) {
+  const [liveSearch, setLiveSearch] = useState<Search>(search);
+  const [publishedCandidates, setPublishedCandidates] = useState<any[]>([]);
+
+  const isRunning = liveSearch.status === 'pending' || liveSearch.status === 'processing';
+
+  useEffect(() => {
+    setLiveSearch(search);
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    let active = true;
+
+    const refresh = async () => {
+      const [searchResponse, candidatesResponse] = await Promise.all([
+        supabase.from('searches').select('*').eq('id', search.id).single(),
+        supabase.from('search_candidates').select('candidate').eq('search_id', search.id).order('rank')
+      ]);
+      if (!active) return;
+
+      const current = (searchResponse.data as Search | null) || search;
+      if (searchResponse.data) setLiveSearch(current);
+      if (candidatesResponse.data) {
+        setPublishedCandidates(candidatesResponse.data.map((row: any) => row.candidate));
+      }
+      if (current.status === 'pending' || current.status === 'processing') {
+        timer = setTimeout(refresh, REFRESH_INTERVAL_MS);
+      }
+    };
+
+    refresh();
+    return () => {
+      active = false;
+      if (timer) clearTimeout(timer);
+    };
+  }, [search]);
+
+  // Older searches embed their candidates in results; newer ones publish them to search_candidates
+  const candidates: any[] = liveSearch.results?.candidates?.length > 0
+    ? liveSearch.results.candidates
+    : publishedCandidates;
+
   const formatDate = (dateString: string) => {
     const date = new Date(dateString);
     const now = new Date();
@@ -80,6 +138,9 @@ export default function SearchDetail({ search, onBack, onCopyFilters }: SearchDe
             resume_last_updated_days: search.resume_last_updated_days?.toString() || '',
             target_candidates: search.target_candidates?.toString() || '',
             max_radius: search.max_radius?.toString() || '',
+            qualified_target: search.qualified_target?.toString() || '',
+            max_downloads: search.max_downloads?.toString() || '',
+            shortlist_size: search.shortlist_size?.toString() || '',
             recipient_email: search.recipient_email || '',
             user_prompt: search.user_prompt || '',
             system_prompt: search.system_prompt || '',
@@ -106,21 +167,23 @@ export default function SearchDetail({ search, onBack, onCopyFilters }: SearchDe
             <Calendar size={16} />
             <span>Erstellt: {formatDate(search.created_at)}</span>
           </div>
-          {search.completed_at && (
+          {liveSearch.completed_at && (
             <div className="flex items-center space-x-2 text-slate-600">
               <Calendar size={16} />
-              <span>Abgeschlossen: {formatDate(search.completed_at)}</span>
+              <span>Abgeschlossen: {formatDate(liveSearch.completed_at)}</span>
             </div>
           )}
           <div className="flex items-center space-x-2">
             <div className={`w-3 h-3 rounded-full ${
-              search.status === 'completed' ? 'bg-green-500' :
-              search.status === 'failed' ? 'bg-red-500' : 'bg-yellow-500'
+              liveSearch.status === 'completed' ? 'bg-green-500' :
+              liveSearch.status === 'failed' ? 'bg-red-500' :
+              liveSearch.status === 'cancelled' ? 'bg-slate-400' : 'bg-yellow-500'
             }`}></div>
             <span className="text-slate-600">
-              {search.status === 'pending' ? 'Ausstehend' : 
-               search.status === 'processing' ? 'Verarbeitung' :
-               search.status === 'completed' ? 'Abgeschlossen' : 'Fehlgeschlagen'}
+              {liveSearch.status === 'pending' ? 'Ausstehend' : 
+               liveSearch.status === 'processing' ? 'Verarbeitung' :
+               liveSearch.status === 'completed' ? 'Abgeschlossen' :
+               liveSearch.status === 'cancelled' ? 'Abgebrochen' : 'Fehlgeschlagen'}
             </span>
           </div>
         </div>
@@ -250,22 +313,40 @@ export default function SearchDetail({ search, onBack, onCopyFilters }: SearchDe
       <div className="bg-white rounded-xl border border-slate-200 p-6">
         <h2 className="text-lg font-medium text-slate-800 mb-4">Ergebnisse</h2>
         
-        {search.status === 'pending' || search.status === 'processing' ? (
+        {isRunning && (
           <div className="text-center py-8">
             <div className="animate-spin w-8 h-8 border-2 border-blue-500 border-t-transparent rounded-full mx-auto mb-4"></div>
             <p className="text-slate-500">Suche läuft...</p>
+            {(liveSearch.evaluated_count ?? 0) > 0 && (
+              <p className="text-sm text-slate-500 mt-2">
+                {liveSearch.qualified_count ?? 0} qualifiziert von {liveSearch.evaluated_count} geprüften Lebensläufen
+              </p>
+            )}
+            {liveSearch.progress?.stages?.download && (
+              <p className="text-sm text-slate-500 mt-1">
+                {liveSearch.progress.stages.download[0]} von {liveSearch.progress.stages.download[1]} Lebensläufen geladen
+                {(liveSearch.progress.eta_s ?? 0) > 0 && (
+                  <span>, noch ca. {Math.ceil((liveSearch.progress.eta_s ?? 0) / 60)} Min.</span>
+                )}
+              </p>
+            )}
           </div>
-        ) : search.status === 'failed' ? (
+        )}
+
+        {liveSearch.status === 'failed' && candidates.length === 0 ? (
           <div className="text-center py-8">
             <p className="text-red-600">Suche fehlgeschlagen. Bitte versuchen Sie es erneut.</p>
           </div>
-        ) : search.results?.candidates?.length > 0 ? (
+        ) : candidates.length > 0 ? (
           <div className="space-y-4">
             <p className="text-sm text-slate-600 mb-4">
-              {search.results.candidates.length} Kandidaten gefunden
+              {candidates.length} Kandidaten {isRunning ? 'bisher ' : ''}gefunden
+              {liveSearch.status === 'cancelled' && ' (Suche abgebrochen, Teilergebnis)'}
+              {liveSearch.status === 'completed' && liveSearch.results?.budget_exhausted &&
+                ` (Budget erschöpft: ${budgetLabels[liveSearch.results.budget_exhausted] || liveSearch.results.budget_exhausted}, Teilergebnis)`}
             </p>
             
-            {search.results.candidates.map((candidate: any, index: number) => (
+            {candidates.map((candidate: any, index: number) => (
               <div key={index} className="border border-slate-200 rounded-lg p-4 hover:bg-slate-50 transition-colors duration-200">
                 <div className="flex items-center justify-between mb-2">
                   <h3 className="font-medium text-slate-800">{candidate.name || `Kandidat #${index + 1}`}</h3>
@@ -325,13 +406,13 @@ export default function SearchDetail({ search, onBack, onCopyFilters }: SearchDe
               </div>
             ))}
           </div>
-        ) : search.results?.profile_urls?.length > 0 ? (
+        ) : liveSearch.results?.profile_urls?.length > 0 ? (
           <div className="space-y-4">
             <p className="text-sm text-slate-600 mb-4">
-              {search.results.profile_urls.length} Kandidaten gefunden
+              {liveSearch.results.profile_urls.length} Kandidaten gefunden
             </p>
             
-            {search.results.profile_urls.map((profileUrl: string, index: number) => (
+            {liveSearch.results.profile_urls.map((profileUrl: string, index: number) => (
               <div key={index} className="border border-slate-200 rounded-lg p-4 hover:bg-slate-50 transition-colors duration-200">
                 <div className="flex items-center justify-between mb-2">
                   <h3 className="font-medium text-slate-800">Kandidat #{index + 1}</h3>
@@ -352,7 +433,7 @@ export default function SearchDetail({ search, onBack, onCopyFilters }: SearchDe
               </div>
             ))}
           </div>
-        ) : (
+        ) : !isRunning && (
           <div className="text-center py-8">
             <p className="text-slate-500">Keine Kandidaten für diese Suche gefunden.</p>
           </div>
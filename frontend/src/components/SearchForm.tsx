@@ -16,6 +16,9 @@ export default function SearchForm({ onBack, onSearchCreated, initialData }: Sea
     resume_last_updated_days: initialData?.resume_last_updated_days || '30',
     target_candidates: initialData?.target_candidates || '100',
     max_radius: initialData?.max_radius || '25',
+    qualified_target: initialData?.qualified_target || '',
+    max_downloads: initialData?.max_downloads || '',
+    shortlist_size: initialData?.shortlist_size || '',
     recipient_email: initialData?.recipient_email || '',
     system_prompt: initialData?.system_prompt || '',
     user_prompt: initialData?.user_prompt || '',
@@ -41,6 +44,9 @@ export default function SearchForm({ onBack, onSearchCreated, initialData }: Sea
         resume_last_updated_days: formData.resume_last_updated_days ? parseInt(formData.resume_last_updated_days) : null,
         target_candidates: formData.target_candidates ? parseInt(formData.target_candidates) : null,
         max_radius: formData.max_radius ? parseInt(formData.max_radius) : null,
+        qualified_target: formData.qualified_target ? parseInt(formData.qualified_target) : null,
+        max_downloads: formData.max_downloads ? parseInt(formData.max_downloads) : null,
+        shortlist_size: formData.shortlist_size ? parseInt(formData.shortlist_size) : null,
         recipient_email: formData.recipient_email || null,
         user_prompt: formData.user_prompt || null,
         system_prompt: formData.system_prompt || null,
@@ -52,6 +58,9 @@ export default function SearchForm({ onBack, onSearchCreated, initialData }: Sea
           resume_last_updated_days: formData.resume_last_updated_days,
           target_candidates: formData.target_candidates,
           max_radius: formData.max_radius,
+          qualified_target: formData.qualified_target,
+          max_downloads: formData.max_downloads,
+          shortlist_size: formData.shortlist_size,
         }
       };
 
@@ -254,6 +263,60 @@ export default function SearchForm({ onBack, onSearchCreated, initialData }: Sea
               </div>
             </div>
 
+            {/* Quota Mode */}
+            <div>
+              <label className="block text-sm font-medium text-slate-700 mb-2">
+                Qualifizierte Kandidaten (Quote)
+              </label>
+              <input
+                type="number"
+                name="qualified_target"
+                value={formData.qualified_target}
+                onChange={handleInputChange}
+                placeholder="Optional - stoppt, sobald erreicht"
+                min="1"
+                className="w-full px-4 py-3 border border-slate-200 rounded-lg 
+                         focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-transparent
+                         placeholder:text-slate-300 placeholder:font-light"
+              />
+            </div>
+
+            <div>
+              <label className="block text-sm font-medium text-slate-700 mb-2">
+                Max. Downloads (Quote)
+              </label>
+              <input
+                type="number"
+                name="max_downloads"
+                value={formData.max_downloads}
+                onChange={handleInputChange}
+                placeholder="Optional"
+                min="1"
+                disabled={!formData.qualified_target}
+                className="w-full px-4 py-3 border border-slate-200 rounded-lg 
+                         focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-transparent
+                         placeholder:text-slate-300 placeholder:font-light disabled:bg-slate-50"
+              />
+            </div>
+
+            {/* Shortlist Size */}
+            <div>
+              <label className="block text-sm font-medium text-slate-700 mb-2">
+                Shortlist-Größe
+              </label>
+              <input
+                type="number"
+                name="shortlist_size"
+                value={formData.shortlist_size}
+                onChange={handleInputChange}
+                placeholder="Optional - bestimmt die Anzahl Kandidaten"
+                min="1"
+                className="w-full px-4 py-3 border border-slate-200 rounded-lg 
+                         focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-transparent
+                         placeholder:text-slate-300 placeholder:font-light"
+              />
+            </div>
+
             {/* Recipient Email */}
             <div className="md:col-span-2">
               <label className="block text-sm font-medium text-slate-700 mb-2">
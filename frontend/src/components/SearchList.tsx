@@ -14,7 +14,7 @@ interface Search {
   user_prompt: string | null;
   system_prompt: string | null;
   results: any;
-  status: 'pending' | 'processing' | 'completed' | 'failed';
+  status: 'pending' | 'processing' | 'completed' | 'failed' | 'cancelled';
   created_at: string;
   completed_at: string | null;
 }
@@ -90,6 +90,7 @@ export default function SearchList({ onViewSearch, onNewSearch }: SearchListProp
       case 'completed': return 'bg-green-100 text-green-800';
       case 'failed': return 'bg-red-100 text-red-800';
       case 'processing': return 'bg-blue-100 text-blue-800';
+      case 'cancelled': return 'bg-slate-100 text-slate-800';
       default: return 'bg-yellow-100 text-yellow-800';
     }
   };
@@ -262,14 +263,15 @@ export default function SearchList({ onViewSearch, onNewSearch }: SearchListProp
                 <span className={`px-3 py-1 rounded-full text-xs font-medium ${getStatusColor(search.status)}`}>
                   {search.status === 'pending' ? 'ausstehend' : 
                    search.status === 'processing' ? 'verarbeitung' :
-                   search.status === 'completed' ? 'abgeschlossen' : 'fehlgeschlagen'}
+                   search.status === 'completed' ? 'abgeschlossen' :
+                   search.status === 'cancelled' ? 'abgebrochen' : 'fehlgeschlagen'}
                 </span>
               </div>
 
-              {search.results && search.status === 'completed' && (
+              {search.results && (search.status === 'completed' || search.status === 'cancelled') && (
                 <div className="mt-3 pt-3 border-t border-slate-100">
                   <p className="text-sm text-slate-600">
-                    {search.results.candidates?.length || search.results.profile_urls?.length || 0} Kandidaten gefunden
+                    {search.results.candidates?.length || search.results.filtered_count || search.results.profile_urls?.length || 0} Kandidaten gefunden
                   </p>
                 </div>
               )}
@@ -0,0 +1,46 @@
+/*
+  # Incremental search results
+
+  1. New Tables
+    - `search_candidates`
+      - `id` (uuid, primary key)
+      - `search_id` (uuid, foreign key to searches)
+      - `profile_url` (text) - one row per candidate and search
+      - `rank` (integer) - search ranking of the candidate
+      - `candidate` (jsonb) - candidate record as in `results.candidates`
+      - `created_at` (timestamp)
+
+  2. Changes
+    - Add progress counters `qualified_count` and `evaluated_count` to `searches`
+    - Qualified candidates are appended by the backend while a search runs; `results`
+      only holds the summary once all candidates are stored in `search_candidates`
+
+  3. Security
+    - Enable RLS on search_candidates with the same open policies as searches
+*/
+
+CREATE TABLE IF NOT EXISTS search_candidates (
+  id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+  search_id uuid REFERENCES searches(id) ON DELETE CASCADE NOT NULL,
+  profile_url text NOT NULL,
+  rank integer,
+  candidate jsonb NOT NULL DEFAULT '{}',
+  created_at timestamptz DEFAULT now(),
+  UNIQUE (search_id, profile_url)
+);
+
+ALTER TABLE search_candidates ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "search_candidates_select_policy" ON search_candidates
+  FOR SELECT
+  USING (true);
+
+CREATE POLICY "search_candidates_insert_policy" ON search_candidates
+  FOR INSERT
+  WITH CHECK (true);
+
+CREATE INDEX IF NOT EXISTS search_candidates_search_id_rank_idx ON search_candidates(search_id, rank);
+
+-- Progress counters, updated with every published batch
+ALTER TABLE searches ADD COLUMN IF NOT EXISTS qualified_count integer DEFAULT 0;
+ALTER TABLE searches ADD COLUMN IF NOT EXISTS evaluated_count integer DEFAULT 0;
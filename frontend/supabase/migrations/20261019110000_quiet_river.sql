@@ -0,0 +1,12 @@
+/*
+  # Structured search progress
+
+  1. Changes
+    - Add `progress` (jsonb) to `searches`, written by the backend while a search runs:
+      - `stages` - per pipeline stage [done, total, failed]
+      - `eta_s` / `elapsed_s` - estimated remaining and elapsed seconds
+      - `message` / `error` - status text of the last update
+      - `updated_at` - time of the last update
+*/
+
+ALTER TABLE searches ADD COLUMN IF NOT EXISTS progress jsonb;
@@ -0,0 +1,11 @@
+/*
+  # Cancelled searches
+
+  1. Changes
+    - Allow status 'cancelled' on `searches` - a search stopped through DELETE /api/jobs/{job_id};
+      its `results` and `search_candidates` hold the candidates qualified until then
+*/
+
+ALTER TABLE searches DROP CONSTRAINT IF EXISTS searches_status_check;
+ALTER TABLE searches ADD CONSTRAINT searches_status_check
+  CHECK (status IN ('pending', 'processing', 'completed', 'failed', 'cancelled'));
@@ -0,0 +1,15 @@
+/*
+  # Search budgets
+
+  1. Changes
+    - Add per-search budgets to `searches` (NULL = backend default):
+      - `max_wall_time_s` (integer) - maximum run time in seconds
+      - `max_llm_tokens` (integer) - maximum LLM tokens (prompt + completion)
+      - `max_page_loads` (integer) - maximum CV pages loaded in the browser
+    - A search that exhausts a budget stops early and completes with its partial results;
+      `results.budget_exhausted` names the budget ('wall_time', 'llm_tokens' or 'page_loads')
+*/
+
+ALTER TABLE searches ADD COLUMN IF NOT EXISTS max_wall_time_s integer;
+ALTER TABLE searches ADD COLUMN IF NOT EXISTS max_llm_tokens integer;
+ALTER TABLE searches ADD COLUMN IF NOT EXISTS max_page_loads integer;
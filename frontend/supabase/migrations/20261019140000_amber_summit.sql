@@ -0,0 +1,12 @@
+/*
+  # Quota mode
+
+  1. Changes
+    - Add quota mode settings to `searches` (NULL = quota mode off):
+      - `qualified_target` (integer) - stop once this many candidates qualified
+      - `max_downloads` (integer) - hard cap on CV downloads in quota mode
+        (NULL = qualified_target x QUOTA_MAX_DOWNLOADS_FACTOR)
+*/
+
+ALTER TABLE searches ADD COLUMN IF NOT EXISTS qualified_target integer;
+ALTER TABLE searches ADD COLUMN IF NOT EXISTS max_downloads integer;
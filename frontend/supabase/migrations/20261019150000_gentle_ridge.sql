@@ -0,0 +1,10 @@
+/*
+  # Hard criteria
+
+  1. Changes
+    - Add `hard_criteria` (jsonb) to `searches` - deterministic rules checked before the LLM
+      evaluation, e.g. {"min_total_experience_years": 4, "max_short_positions": 1}
+      (NULL = no rules; see backend/hard_criteria.py for the supported keys)
+*/
+
+ALTER TABLE searches ADD COLUMN IF NOT EXISTS hard_criteria jsonb;
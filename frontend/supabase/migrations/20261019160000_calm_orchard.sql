@@ -0,0 +1,12 @@
+/*
+  # Shortlist sizing
+
+  1. Changes
+    - Add shortlist sizing to `searches` (NULL = use `target_candidates` as given):
+      - `shortlist_size` (integer) - qualified candidates wanted; the backend sizes
+        `target_candidates` from the historical accept rate of similar searches
+      - `shortlist_confidence` (real) - probability of reaching `shortlist_size` (NULL = 0.8)
+*/
+
+ALTER TABLE searches ADD COLUMN IF NOT EXISTS shortlist_size integer;
+ALTER TABLE searches ADD COLUMN IF NOT EXISTS shortlist_confidence real;